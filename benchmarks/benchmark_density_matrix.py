@@ -0,0 +1,59 @@
+import time
+
+import numpy as np
+import pytest
+
+from qunetsim.backends import DensityMatrixBackend
+from qunetsim.components import Host
+from qunetsim.objects import Qubit
+
+try:
+    from qunetsim.backends import QuTipBackend
+except ImportError:
+    QuTipBackend = None
+
+ROUNDS = 3
+
+
+def noisy_ghz(backend, num_qubits, noisy=True):
+    """
+    Prepares a GHZ state of *num_qubits* qubits and applies ROUNDS rounds of
+    noise, Hadamard gates and a CNOT chain to it.
+
+    Returns:
+        (float): The amount of operations per second.
+    """
+    host = Host('A', backend)
+    qubits = [Qubit(host) for _ in range(num_qubits)]
+    qubits[0].H()
+    for q in qubits[1:]:
+        qubits[0].cnot(q)
+    operations = 0
+    start = time.time()
+    for _ in range(ROUNDS):
+        for q in qubits:
+            if noisy:
+                backend.depolarize(q, 0.01)
+                operations += 1
+            q.H()
+            operations += 1
+        for q1, q2 in zip(qubits, qubits[1:]):
+            q1.cnot(q2)
+            operations += 1
+    return operations / (time.time() - start)
+
+
+@pytest.mark.density_matrix
+@pytest.mark.parametrize('num_qubits', [4, 8, 10])
+def test_density_matrix_throughput(benchmark, num_qubits):
+    rate = benchmark.pedantic(noisy_ghz, args=(DensityMatrixBackend(), num_qubits), rounds=1)
+    benchmark.extra_info['operations_per_second'] = rate
+
+
+if __name__ == '__main__':
+    print('qubits  density matrix [ops/s]  QuTiP [ops/s]')
+    for n in [4, 8, 10, 12]:
+        qutip_rate = np.nan
+        if QuTipBackend is not None and n <= 10:
+            qutip_rate = noisy_ghz(QuTipBackend(), n, noisy=False)
+        print('%6d  %22.1f  %13.1f' % (n, noisy_ghz(DensityMatrixBackend(), n), qutip_rate))
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from qunetsim.backends import EQSNBackend
+from qunetsim.components import Host
+from qunetsim.components import Network
+
+PACKETS_PER_PAIR = 20
+NETWORK_DELAY = 0.01
+
+backend = EQSNBackend()
+network = Network.get_instance()
+network.start(backend=backend)
+
+
+def setup_pairs(num_pairs, use_link_dispatch):
+    network.delay = NETWORK_DELAY
+    network.use_link_dispatch = use_link_dispatch
+
+    pairs = []
+    for i in range(num_pairs):
+        sender = Host('S%d' % i, backend=backend)
+        receiver = Host('R%d' % i, backend=backend)
+        sender.add_c_connection(receiver.host_id)
+        receiver.add_c_connection(sender.host_id)
+        sender.delay = 0
+        receiver.delay = 0
+        sender.start()
+        receiver.start()
+        network.add_hosts([sender, receiver])
+        pairs.append((sender, receiver))
+    return pairs
+
+
+def teardown_pairs(pairs):
+    for sender, receiver in pairs:
+        for host in (sender, receiver):
+            network.remove_host(host)
+            host.stop()
+
+
+def send_messages(pairs):
+    """
+    Sends PACKETS_PER_PAIR messages over each pair and waits until all of
+    them arrived.
+
+    Returns:
+        (float): The aggregate amount of packets per second.
+    """
+    start = time.time()
+    for i in range(PACKETS_PER_PAIR):
+        for sender, receiver in pairs:
+            sender.send_classical(receiver.host_id, str(i), await_ack=False, no_ack=True)
+    for sender, receiver in pairs:
+        while len(receiver.get_classical(sender.host_id, wait=0)) < PACKETS_PER_PAIR:
+            time.sleep(0.001)
+    return len(pairs) * PACKETS_PER_PAIR / (time.time() - start)
+
+
+def run(num_pairs, use_link_dispatch):
+    pairs = setup_pairs(num_pairs, use_link_dispatch)
+    try:
+        return send_messages(pairs)
+    finally:
+        teardown_pairs(pairs)
+
+
+@pytest.mark.dispatch
+@pytest.mark.parametrize('num_pairs', [1, 2, 4, 8])
+@pytest.mark.parametrize('use_link_dispatch', [False, True])
+def test_dispatch_throughput(benchmark, num_pairs, use_link_dispatch):
+    pairs = setup_pairs(num_pairs, use_link_dispatch)
+    try:
+        rate = benchmark.pedantic(send_messages, args=(pairs,), rounds=1)
+        benchmark.extra_info['packets_per_second'] = rate
+    finally:
+        teardown_pairs(pairs)
+
+
+if __name__ == '__main__':
+    print('pairs  global [packets/s]  link [packets/s]')
+    for n in [1, 2, 4, 8, 16]:
+        print('%5d  %19.1f  %16.1f' % (n, run(n, False), run(n, True)))
+    network.stop(True)
@@ -0,0 +1,46 @@
+import time
+
+import pytest
+
+from qunetsim.backends import EQSNBackend
+from qunetsim.components import Host
+from qunetsim.components import Network
+
+PAIRS = 500
+
+backend = EQSNBackend()
+network = Network.get_instance()
+network.start(nodes=['Alice', 'Bob'], backend=backend)
+alice = Host('Alice', backend=backend)
+bob = Host('Bob', backend=backend)
+network.add_hosts([alice, bob])
+
+
+def create_and_measure(analytic_epr):
+    """
+    Creates PAIRS EPR pairs between Alice and Bob and measures both qubits of
+    each pair.
+
+    Returns:
+        (float): The amount of EPR pairs per second.
+    """
+    backend.analytic_epr = analytic_epr
+    start = time.time()
+    for _ in range(PAIRS):
+        q1 = backend.create_EPR(alice.host_id, bob.host_id)
+        q2 = backend.receive_epr(bob.host_id, alice.host_id, q_id=q1.id)
+        assert q1.measure() == q2.measure()
+    return PAIRS / (time.time() - start)
+
+
+@pytest.mark.epr_throughput
+@pytest.mark.parametrize('analytic_epr', [False, True])
+def test_epr_throughput(benchmark, analytic_epr):
+    rate = benchmark.pedantic(create_and_measure, args=(analytic_epr,), rounds=1)
+    benchmark.extra_info['pairs_per_second'] = rate
+
+
+if __name__ == '__main__':
+    print('simulated [pairs/s]  analytic [pairs/s]')
+    print('%19.1f  %18.1f' % (create_and_measure(False), create_and_measure(True)))
+    network.stop(True)
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from qunetsim.backends import ProjectQBackend
+from qunetsim.components import Host
+from qunetsim.components import Network
+from qunetsim.objects import Qubit
+
+TELEPORTS_PER_PAIR = 10
+
+backend = ProjectQBackend()
+network = Network.get_instance()
+network.start(backend=backend)
+
+
+def setup_pairs(num_pairs, deferred_flush):
+    network.delay = 0
+    backend.deferred_flush = deferred_flush
+
+    pairs = []
+    for i in range(num_pairs):
+        sender = Host('S%d' % i, backend=backend)
+        receiver = Host('R%d' % i, backend=backend)
+        sender.add_connection(receiver.host_id)
+        receiver.add_connection(sender.host_id)
+        sender.delay = 0
+        receiver.delay = 0
+        sender.start()
+        receiver.start()
+        network.add_hosts([sender, receiver])
+        pairs.append((sender, receiver))
+    return pairs
+
+
+def teardown_pairs(pairs):
+    for sender, receiver in pairs:
+        for host in (sender, receiver):
+            network.remove_host(host)
+            host.stop()
+
+
+def teleport(sender, receiver):
+    for _ in range(TELEPORTS_PER_PAIR):
+        q = Qubit(sender)
+        q.X()
+        sender.send_teleport(receiver.host_id, q, await_ack=False, no_ack=True)
+        q = receiver.get_qubit(sender.host_id, q.id, wait=-1)
+        assert q.measure() == 1
+
+
+def teleport_concurrently(pairs):
+    """
+    Teleports TELEPORTS_PER_PAIR qubits over each pair, with one thread per
+    pair, and waits until all of them are measured.
+
+    Returns:
+        (float): The aggregate amount of teleports per second.
+    """
+    threads = [threading.Thread(target=teleport, args=pair) for pair in pairs]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    backend.flush()
+    return len(pairs) * TELEPORTS_PER_PAIR / (time.time() - start)
+
+
+def run(num_pairs, deferred_flush):
+    pairs = setup_pairs(num_pairs, deferred_flush)
+    try:
+        return teleport_concurrently(pairs)
+    finally:
+        teardown_pairs(pairs)
+
+
+@pytest.mark.projectq_concurrent
+@pytest.mark.parametrize('num_pairs', [1, 2, 4, 8])
+@pytest.mark.parametrize('deferred_flush', [False, True])
+def test_concurrent_teleport_throughput(benchmark, num_pairs, deferred_flush):
+    pairs = setup_pairs(num_pairs, deferred_flush)
+    try:
+        rate = benchmark.pedantic(teleport_concurrently, args=(pairs,), rounds=1)
+        benchmark.extra_info['teleports_per_second'] = rate
+    finally:
+        teardown_pairs(pairs)
+
+
+if __name__ == '__main__':
+    print('pairs  flush per qubit [teleports/s]  deferred flush [teleports/s]')
+    for n in [1, 2, 4, 8]:
+        print('%5d  %30.1f  %28.1f' % (n, run(n, False), run(n, True)))
+    network.stop(True)
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from qunetsim.objects import QuantumStorage
+from qunetsim.objects import Qubit
+from qunetsim.utils.handles import new_handle
+
+PAIRS = 100000
+
+
+class StoredQubit(object):
+    """
+    A qubit which only has an id and a handle, so that only the storage is
+    measured.
+    """
+
+    def __init__(self, id):
+        self.id = id
+        self.handle = new_handle()
+        self.named = True
+
+    def release(self):
+        pass
+
+
+def store_and_retrieve(pairs):
+    """
+    Stores *pairs* EPR halves from two hosts, interleaved with data qubits,
+    and retrieves them again by purpose, by id and in order.
+
+    Returns:
+        (tuple): The stored and the retrieved qubits per second.
+    """
+    storage = QuantumStorage()
+    qubits = [StoredQubit(str(i)) for i in range(pairs)]
+
+    start = time.time()
+    for i, q in enumerate(qubits):
+        purpose = Qubit.DATA_QUBIT if i % 10 == 0 else Qubit.EPR_QUBIT
+        storage.add_qubit_from_host(q, purpose, 'Bob' if i % 2 else 'Alice')
+    stored = pairs / (time.time() - start)
+
+    start = time.time()
+    for i in range(0, pairs, 4):
+        storage.get_qubit_from_host('Alice' if i % 2 else 'Bob', q_id=str(i + 1))
+    for host in ('Alice', 'Bob'):
+        while storage.get_qubit_from_host(host, purpose=Qubit.EPR_QUBIT) is not None:
+            pass
+        while storage.get_qubit_from_host(host) is not None:
+            pass
+    retrieved = pairs / (time.time() - start)
+    assert storage.amount_qubits_stored == 0
+    return stored, retrieved
+
+
+@pytest.mark.quantum_storage
+def test_quantum_storage(benchmark):
+    stored, retrieved = benchmark.pedantic(store_and_retrieve, args=(PAIRS,), rounds=1)
+    benchmark.extra_info['stored_per_second'] = stored
+    benchmark.extra_info['retrieved_per_second'] = retrieved
+
+
+if __name__ == '__main__':
+    print('stored [qubits/s]  retrieved [qubits/s]')
+    print('%17.1f  %20.1f' % store_and_retrieve(PAIRS))
@@ -1,14 +1,29 @@
+import threading
 import unittest
 import numpy as np
 from qunetsim.components.host import Host
 from qunetsim.components.network import Network
 from qunetsim.objects import Qubit
+from qunetsim.objects import Circuit
+from qunetsim.objects import BellPair
 
 from qunetsim.backends import EQSNBackend
+from qunetsim.backends import NumpyBackend
+from qunetsim.backends import StabilizerBackend
+from qunetsim.backends import DensityMatrixBackend
+from qunetsim.backends import EPRStore
+from qunetsim.objects.connections.channel_models import AmplitudeDamping, Dephasing, Depolarizing
 from qunetsim.backends import CQCBackend
 
+try:
+    from qunetsim.backends import QuTipBackend
+except ImportError:
+    QuTipBackend = None
+try:
+    from qunetsim.backends import ProjectQBackend
+except ImportError:
+    ProjectQBackend = None
 
-# from qunetsim.backends import QuTipBackend
 
 # @unittest.skip('')
 class TestBackend(unittest.TestCase):
@@ -17,6 +32,9 @@ class TestBackend(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         TestBackend.backends.append(EQSNBackend)
+        TestBackend.backends.append(NumpyBackend)
+        TestBackend.backends.append(StabilizerBackend)
+        TestBackend.backends.append(DensityMatrixBackend)
         # TestBackend.backends.append(CQCBackend)
         # TestBackend.backends.append(QuTipBackend)
         # TestBackend.backends.append(projectQ)
@@ -49,6 +67,44 @@ class TestBackend(unittest.TestCase):
 
             network.stop(True)
 
+    # @unittest.skip('')
+    def test_receive_eprs(self):
+        for b in TestBackend.backends:
+            backend = b()
+            network = Network.get_instance()
+            network.start(["Alice", "Bob"], backend)
+            alice = Host('Alice', backend)
+            bob = Host('Bob', backend)
+            alice.start()
+            bob.start()
+            network.add_host(alice)
+            network.add_host(bob)
+
+            qubits = [backend.create_EPR(alice.host_id, bob.host_id) for _ in range(5)]
+            received = backend.receive_eprs(bob.host_id, alice.host_id, 5)
+            self.assertEqual([q.id for q in qubits], [q.id for q in received])
+            for q1, q2 in zip(qubits, received):
+                self.assertEqual(backend.measure(q1, False),
+                                 backend.measure(q2, False))
+
+            network.stop(True)
+
+    # @unittest.skip('')
+    def test_epr_store_timeout(self):
+        store = EPRStore()
+        store.put('Alice', 'Bob', 'q1')
+        with self.assertRaises(IndexError):
+            store.get_many('Alice', 'Bob', 2, timeout=0.1)
+        self.assertEqual(store.get('Alice', 'Bob', timeout=0), 'q1')
+        with self.assertRaises(IndexError):
+            store.get('Alice', 'Bob', timeout=0)
+
+        # The first pair of a sender and receiver can be waited for
+        with self.assertRaises(IndexError):
+            store.get('Alice', 'Eve', timeout=0.1)
+        threading.Timer(0.1, store.put, ('Bob', 'Alice', 'q2')).start()
+        self.assertEqual(store.get('Bob', 'Alice', timeout=5), 'q2')
+
     # @unittest.skip('')
     def test_single_gates(self):
         for b in TestBackend.backends:
@@ -130,6 +186,462 @@ class TestBackend(unittest.TestCase):
 
         network.stop(True)
 
+    # @unittest.skip('')
+    def test_entanglement_groups_numpy(self):
+        backend = NumpyBackend()
+        network = Network.get_instance()
+        network.start(["Alice", "Bob"], backend)
+        alice = Host('Alice', backend)
+        alice.start()
+        network.add_host(alice)
+
+        qubits = [Qubit(alice) for _ in range(3)]
+        qubits[0].H()
+        qubits[0].cnot(qubits[1])
+        self.assertEqual(len(backend.statevector(qubits[0])[0]), 2)
+        self.assertEqual(len(backend.statevector(qubits[2])[0]), 1)
+        self.assertTrue(np.allclose(backend.density_operator(qubits[1]),
+                                    np.diag([0.5, 0.5])))
+
+        qubits[1].cnot(qubits[2])
+        names, statevector = backend.statevector(qubits[2])
+        self.assertEqual(len(names), 3)
+        expected = np.zeros(8)
+        expected[0] = expected[7] = 1 / np.sqrt(2)
+        self.assertTrue(np.allclose(statevector, expected))
+
+        # a measured qubit is split out of its group
+        result = qubits[0].measure(non_destructive=True)
+        self.assertEqual(len(backend.statevector(qubits[0])[0]), 1)
+        self.assertEqual(len(backend.statevector(qubits[1])[0]), 2)
+        self.assertEqual(qubits[1].measure(), result)
+        self.assertEqual(qubits[2].measure(), result)
+
+        network.stop(True)
+
+    # @unittest.skip('')
+    def test_stabilizer(self):
+        backend = StabilizerBackend()
+        network = Network.get_instance()
+        network.start(["Alice", "Bob"], backend)
+        alice = Host('Alice', backend)
+        bob = Host('Bob', backend)
+        alice.start()
+        bob.start()
+        network.add_host(alice)
+        network.add_host(bob)
+
+        pairs = [backend.create_EPR(alice.host_id, bob.host_id) for _ in range(1000)]
+        others = [backend.receive_epr(bob.host_id, alice.host_id, q_id=q.id) for q in pairs]
+        self.assertTrue(np.allclose(backend.density_operator(pairs[0]),
+                                    np.diag([0.5, 0.5])))
+        for q1, q2 in zip(pairs, others):
+            self.assertEqual(q1.measure(), q2.measure())
+
+        q = Qubit(alice)
+        q.H()
+        q.rz(np.pi / 2)
+        self.assertTrue(np.allclose(backend.density_operator(q),
+                                    np.array([[0.5, -0.5j], [0.5j, 0.5]])))
+        with self.assertRaises(EnvironmentError):
+            q.T()
+        with self.assertRaises(EnvironmentError):
+            q.rx(0.1)
+        with self.assertRaises(EnvironmentError):
+            q.custom_gate(np.array([[1, 0], [0, np.exp(0.1j)]]))
+
+        network.stop(True)
+
+    # @unittest.skip('')
+    def test_noise_density_matrix(self):
+        backend = DensityMatrixBackend()
+        network = Network.get_instance()
+        network.start(["Alice", "Bob"], backend)
+        alice = Host('Alice', backend)
+        alice.start()
+        network.add_host(alice)
+
+        q = Qubit(alice)
+        q.X()
+        q = AmplitudeDamping(gamma=0.25).qubit_func(q)
+        self.assertTrue(np.allclose(backend.density_operator(q), np.diag([0.25, 0.75])))
+
+        q1 = backend.create_EPR(alice.host_id, alice.host_id)
+        q2 = backend.receive_epr(alice.host_id, alice.host_id, q_id=q1.id)
+        Depolarizing(probability=0.5).qubit_func(q1)
+        _, density_operator = backend.group_density_operator(q2)
+        bell = np.zeros((4, 4))
+        bell[0, 0] = bell[0, 3] = bell[3, 0] = bell[3, 3] = 0.5
+        self.assertTrue(np.allclose(density_operator, 0.5 * bell + 0.5 * np.eye(4) / 4))
+
+        backend.dephase(q2, 1.0)
+        _, density_operator = backend.group_density_operator(q2)
+        self.assertAlmostEqual(density_operator[0, 3].real, -0.25)
+
+        network.stop(True)
+
+    # @unittest.skip('')
+    def test_circuit(self):
+        for b in TestBackend.backends:
+            backend = b()
+            network = Network.get_instance()
+            network.start(["Alice", "Bob"], backend)
+            alice = Host('Alice', backend)
+            alice.start()
+            network.add_host(alice)
+
+            for _ in range(5):
+                q1 = Qubit(alice)
+                q2 = Qubit(alice)
+                q3 = Qubit(alice)
+                with Circuit() as circuit:
+                    q1.H()
+                    q1.cnot(q2)
+                    q2.cnot(q3)
+                    q3.X()
+                    q3.X()
+                    self.assertEqual(len(circuit.ops), 5)
+                    m1 = q1.measure()
+                    self.assertEqual(circuit.ops, [])
+                    q2.X()
+                self.assertEqual(q2.measure(), 1 - m1)
+                self.assertEqual(q3.measure(), m1)
+
+            network.stop(True)
+
+    # @unittest.skip('')
+    def test_lazy_gates(self):
+        for b in TestBackend.backends:
+            backend = b()
+            network = Network.get_instance()
+            network.start(["Alice", "Bob"], backend)
+            alice = Host('Alice', backend)
+            alice.lazy_gates = True
+            alice.start()
+            network.add_host(alice)
+
+            q = Qubit(alice)
+            q.X()
+            q.H()
+            q.Z()
+            q.H()
+            self.assertEqual(len(q._pending_gates), 4)
+            self.assertEqual(q.measure(), 0)
+
+            q = Qubit(alice)
+            q.X()
+            q.X()
+            self.assertTrue(np.allclose(q.density_operator(), np.diag([1, 0])))
+            self.assertEqual(q._pending_gates, [])
+
+            for _ in range(5):
+                q1 = Qubit(alice)
+                q2 = Qubit(alice)
+                q1.H()
+                q1.Z()
+                q1.H()
+                q2.X()
+                q1.cnot(q2)
+                self.assertEqual(q1._pending_gates, [])
+                self.assertEqual(q2._pending_gates, [])
+                q1.H()
+                q1.H()
+                self.assertEqual(q1.measure(), 1)
+                self.assertEqual(q2.measure(), 0)
+
+            network.stop(True)
+
+    # @unittest.skip('')
+    def test_lazy_gates_noise(self):
+        backend = DensityMatrixBackend()
+        network = Network.get_instance()
+        network.start(["Alice", "Bob"], backend)
+        alice = Host('Alice', backend)
+        alice.lazy_gates = True
+        alice.start()
+        network.add_host(alice)
+
+        # The pending gates are applied before the channel acts on the qubit
+        q = Qubit(alice)
+        q.H()
+        Dephasing(probability=1.0).qubit_func(q)
+        self.assertEqual(q._pending_gates, [])
+        self.assertTrue(np.allclose(q.density_operator(), 0.5 * np.array([[1, -1], [-1, 1]])))
+
+        # Flushing the gates of all qubits from another thread loses no gate
+        q = Qubit(alice)
+        done = threading.Event()
+
+        def flush():
+            while not done.is_set():
+                Qubit.flush_all_gates()
+
+        thread = threading.Thread(target=flush)
+        thread.start()
+        for _ in range(501):
+            q.X()
+        done.set()
+        thread.join()
+        self.assertEqual(q.measure(), 1)
+
+        network.stop(True)
+
+    # @unittest.skip('')
+    def test_statevector_flush(self):
+        backend = NumpyBackend()
+        other_backend = DensityMatrixBackend()
+        alice = Host('Alice', backend, network=Network())
+        bob = Host('Bob', other_backend, network=Network())
+        alice.lazy_gates = True
+        bob.lazy_gates = True
+
+        q_alice = Qubit(alice)
+        q_bob = Qubit(bob)
+        q_alice.X()
+        q_bob.X()
+        # Only the pending gates of the qubits of the same backend are applied
+        q_alice.statevector()
+        self.assertEqual(q_alice._pending_gates, [])
+        self.assertEqual(len(q_bob._pending_gates), 1)
+
+        with self.assertRaises(EnvironmentError):
+            q_bob.statevector()
+        self.assertEqual(q_alice.measure(), 1)
+        self.assertEqual(q_bob.measure(), 1)
+
+    # @unittest.skip('')
+    def test_pauli_frame(self):
+        for b in TestBackend.backends:
+            backend = b()
+            network = Network.get_instance()
+            network.start(["Alice", "Bob"], backend)
+            alice = Host('Alice', backend)
+            alice.pauli_frame = True
+            alice.start()
+            network.add_host(alice)
+
+            q = Qubit(alice)
+            q.H()
+            q.Z()
+            q.H()
+            self.assertEqual(q._frame, (1, 0))
+            self.assertEqual(q.measure(non_destructive=True), 1)
+            self.assertEqual(q.measure(), 1)
+
+            for _ in range(5):
+                q1 = Qubit(alice)
+                q2 = Qubit(alice)
+                q1.X()
+                q1.cnot(q2)
+                self.assertEqual(q1._frame, (1, 0))
+                self.assertEqual(q2._frame, (1, 0))
+                self.assertEqual(q1.measure(), 1)
+                self.assertEqual(q2.measure(), 1)
+
+            q = Qubit(alice)
+            q.Y()
+            self.assertTrue(np.allclose(q.density_operator(), np.diag([0, 1])))
+            self.assertEqual(q._frame, (0, 0))
+            q.measure()
+
+            network.stop(True)
+
+    # @unittest.skip('')
+    def test_pauli_frame_noise(self):
+        backend = DensityMatrixBackend()
+        network = Network.get_instance()
+        network.start(["Alice", "Bob"], backend)
+        alice = Host('Alice', backend)
+        alice.pauli_frame = True
+        alice.start()
+        network.add_host(alice)
+
+        # The frame is applied before the channel acts on the qubit
+        q = Qubit(alice)
+        q.X()
+        AmplitudeDamping(gamma=1.0).qubit_func(q)
+        self.assertEqual(q._frame, (0, 0))
+        self.assertTrue(np.allclose(q.density_operator(), np.diag([1, 0])))
+
+        network.stop(True)
+
+    # @unittest.skip('')
+    def test_analytic_epr(self):
+        backend = EQSNBackend(analytic_epr=True)
+        network = Network.get_instance()
+        network.start(["Alice", "Bob"], backend)
+        alice = Host('Alice', backend)
+        bob = Host('Bob', backend)
+        alice.add_connection('Bob')
+        bob.add_connection('Alice')
+        alice.start()
+        bob.start()
+        network.add_host(alice)
+        network.add_host(bob)
+        network.delay = 0
+
+        for _ in range(5):
+            q1 = backend.create_EPR(alice.host_id, bob.host_id)
+            q2 = backend.receive_epr(bob.host_id, alice.host_id, q_id=q1.id)
+            self.assertIsInstance(q1._qubit, BellPair)
+            q1.X()
+            self.assertEqual(q1.measure(), 1 - q2.measure())
+            self.assertFalse(q1._qubit.materialized)
+
+        # Other gates create the pair in the simulator
+        q1 = backend.create_EPR(alice.host_id, bob.host_id)
+        q2 = backend.receive_epr(bob.host_id, alice.host_id, q_id=q1.id)
+        q1.Z()
+        q1.H()
+        q2.H()
+        self.assertNotIsInstance(q1._qubit, BellPair)
+        self.assertEqual(q1.measure(), 1 - q2.measure())
+
+        for _ in range(3):
+            q = Qubit(alice)
+            q.X()
+            alice.send_teleport(bob.host_id, q, await_ack=True)
+            q_rec = bob.get_data_qubit(alice.host_id, q.id, wait=5)
+            self.assertIsNotNone(q_rec)
+            self.assertEqual(q_rec.measure(), 1)
+
+        network.stop(True)
+
+    # @unittest.skip('')
+    def test_analytic_entanglement_swap(self):
+        backend = EQSNBackend(analytic_epr=True, werner=0.5)
+        network = Network.get_instance()
+        network.start(["Alice", "Bob", "Eve"], backend)
+        hosts = [Host(name, backend) for name in ["Alice", "Bob", "Eve"]]
+        for host in hosts:
+            host.start()
+        network.add_hosts(hosts)
+        alice, bob, eve = hosts
+
+        for teleport in (False, True):
+            for _ in range(5):
+                qa = backend.create_EPR(alice.host_id, bob.host_id)
+                qb1 = backend.receive_epr(bob.host_id, alice.host_id, q_id=qa.id)
+                qb2 = backend.create_EPR(bob.host_id, eve.host_id)
+                qe = backend.receive_epr(eve.host_id, bob.host_id, q_id=qb2.id)
+                self.assertEqual(qa._qubit.werner, 0.5)
+                x = qa._qubit.bell_index[0] ^ qe._qubit.bell_index[0]
+                z = qa._qubit.bell_index[1] ^ qe._qubit.bell_index[1]
+                if teleport:
+                    m1, m2 = BellPair.teleport(qb1, qb2)
+                else:
+                    m1, m2 = BellPair.swap(qb1, qb2)
+                self.assertIs(qa._qubit, qe._qubit)
+                self.assertEqual(qa._qubit.werner, 0.25)
+                self.assertEqual(qa._qubit.bell_index, (x ^ m2, z ^ m1))
+                self.assertIsNone(qb1._qubit)
+                # Correct the pair to |Phi+>, and undo the noise of the pairs
+                if m2 ^ x:
+                    qe.X()
+                if m1 ^ z:
+                    qe.Z()
+                self.assertFalse(qa._qubit.materialized)
+                qa.H()
+                qe.H()
+                self.assertEqual(qa.measure(), qe.measure())
+
+        network.stop(True)
+
+    @unittest.skipUnless(ProjectQBackend, 'projectq is not installed')
+    def test_projectq_deferred_flush(self):
+        backend = ProjectQBackend(isolated=True, deferred_flush=True)
+        network = Network.get_instance()
+        network.start(["Alice"], backend)
+        alice = Host('Alice', backend)
+        alice.start()
+        network.add_host(alice)
+
+        flushes = []
+        flush = backend.engine.flush
+
+        def counting_flush(*args, **kwargs):
+            flushes.append(args)
+            return flush(*args, **kwargs)
+
+        backend.engine.flush = counting_flush
+        for q in [Qubit(alice) for _ in range(5)]:
+            q.release()
+        # The released qubits are only deallocated with the next flush
+        self.assertEqual(len(flushes), 0)
+        backend.flush()
+        self.assertEqual(len(flushes), 1)
+
+        q = Qubit(alice)
+        q.X()
+        self.assertEqual(q.measure(), 1)
+
+        backend.deferred_flush = False
+        flushes.clear()
+        Qubit(alice).release()
+        self.assertEqual(len(flushes), 1)
+
+        network.stop(True)
+
+    @unittest.skipUnless(QuTipBackend, 'qutip is not installed')
+    def test_density_operator_qutip_group(self):
+        backend = QuTipBackend()
+        network = Network.get_instance()
+        network.start(["Alice", "Bob"], backend)
+        alice = Host('Alice', backend)
+        alice.start()
+        network.add_host(alice)
+
+        qubits = [Qubit(alice) for _ in range(3)]
+        qubits[0].H()
+        qubits[0].cnot(qubits[1])
+        qubits[1].cnot(qubits[2])
+
+        density_operator = backend.density_operator(qubits[1])
+        self.assertEqual(density_operator.shape, (2, 2))
+        self.assertTrue(np.allclose(density_operator, np.diag([0.5, 0.5])))
+        density_operator = backend.density_operator([qubits[0], qubits[2]])
+        self.assertEqual(density_operator.shape, (4, 4))
+        self.assertTrue(np.allclose(density_operator, np.diag([0.5, 0, 0, 0.5])))
+
+        for q in qubits:
+            q.measure()
+        network.stop(True)
+
+    # @unittest.skip('')
+    def test_reduced_density_operators(self):
+        backends = [EQSNBackend, NumpyBackend]
+        if QuTipBackend is not None:
+            backends.append(QuTipBackend)
+        for b in backends:
+            backend = b()
+            network = Network.get_instance()
+            network.start(["Alice", "Bob"], backend)
+            alice = Host('Alice', backend)
+            alice.start()
+            network.add_host(alice)
+
+            q1 = Qubit(alice)
+            q2 = Qubit(alice)
+            q3 = Qubit(alice)
+            q1.H()
+            q1.cnot(q2)
+            q3.H()
+            q3.rz(np.pi / 2)
+
+            density_operators = backend.density_operators([q1, q3, q2])
+            self.assertTrue(np.allclose(density_operators[0], np.diag([0.5, 0.5])))
+            self.assertTrue(np.allclose(density_operators[1], np.array([[0.5, -0.5j], [0.5j, 0.5]])))
+            self.assertTrue(np.allclose(density_operators[2], np.diag([0.5, 0.5])))
+
+            bell = np.zeros((4, 4))
+            bell[0, 0] = bell[0, 3] = bell[3, 0] = bell[3, 3] = 0.5
+            self.assertTrue(np.allclose(backend.density_operator([q1, q2]), bell))
+            self.assertAlmostEqual(q1.fidelity(q2), 1)
+
+            for q in [q1, q2, q3]:
+                q.measure()
+            network.stop(True)
+
     # @unittest.skip('')
     def test_multiple_backends(self):
         for b in TestBackend.backends:
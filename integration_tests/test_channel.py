@@ -2,7 +2,7 @@ import unittest
 import time
 
 from qunetsim.objects import Qubit, Logger
-from qunetsim.objects.connections.channel_models import BinaryErasure, Fibre
+from qunetsim.objects.connections.channel_models import BinaryErasure, Fibre, Dephasing
 from qunetsim.components import Host, Network
 from qunetsim.backends import EQSNBackend
 
@@ -135,3 +135,23 @@ class TestChannel(unittest.TestCase):
 
         self.assertEqual(hosts['alice'].quantum_connections[hosts['bob'].host_id].model.transmission_p, 0.0)
         self.assertIsNone(rec_q)
+
+    # unittest.skip('')
+    def test_channel_dephasing(self):
+        global hosts
+
+        hosts['alice'].quantum_connections[hosts['bob'].host_id].model = Dephasing(probability=1.0)
+        q = Qubit(hosts['alice'])
+        q.H()
+
+        q_id = hosts['alice'].send_qubit(hosts['bob'].host_id, q)
+        i = 0
+        rec_q = hosts['bob'].get_qubit(hosts['alice'].host_id, q_id)
+        while i < TestChannel.MAX_WAIT and rec_q is None:
+            rec_q = hosts['bob'].get_qubit(hosts['alice'].host_id, q_id)
+            i += 1
+            time.sleep(1)
+
+        self.assertIsNotNone(rec_q)
+        rec_q.H()
+        self.assertEqual(rec_q.measure(), 1)
@@ -1,5 +1,7 @@
+import threading
+import time
 import unittest
-from qunetsim.objects import ClassicalStorage, Message
+from qunetsim.objects import ClassicalStorage, Clock, Message
 from qunetsim.utils.constants import Constants
 
 
@@ -69,3 +71,98 @@ class TestClassicalStorage(unittest.TestCase):
         for c in range(15):
             msg = storage.get_with_seq_num_from_sender("Alice", c)
             self.assertEqual(msg.content, str(c))
+
+    # @unittest.skip('')
+    def test_ring_buffer(self):
+        storage = ClassicalStorage(max_messages_per_sender=5)
+        for c in range(15):
+            storage.add_msg_to_storage(Message("Alice", str(c), c))
+            storage.add_msg_to_storage(Message("Bob", str(c), c))
+
+        self.assertEqual(storage.amount_messages_stored, 10)
+        self.assertEqual(storage.amount_messages_stored_with_host("Alice"), 5)
+        self.assertEqual(storage.amount_messages_removed, 20)
+        self.assertEqual([m.content for m in storage.get_all_from_sender("Alice")],
+                         [str(c) for c in range(10, 15)])
+
+        # Lookups by sequence number only work for retained messages
+        self.assertIsNone(storage.get_with_seq_num_from_sender("Alice", 9))
+        self.assertEqual(storage.get_with_seq_num_from_sender("Alice", 12).content, "12")
+        # Unread messages which were removed are skipped
+        self.assertEqual(storage.get_next_from_sender("Alice").content, "10")
+
+    # @unittest.skip('')
+    def test_compact_read(self):
+        storage = ClassicalStorage(compact_read=True)
+        for c in range(10):
+            storage.add_msg_to_storage(Message("Alice", str(c), c))
+
+        for c in range(4):
+            self.assertEqual(storage.get_next_from_sender("Alice").content, str(c))
+        self.assertEqual(storage.amount_messages_stored, 6)
+        self.assertIsNone(storage.get_with_seq_num_from_sender("Alice", 3))
+        self.assertEqual(storage.get_with_seq_num_from_sender("Alice", 4).content, "4")
+        self.assertEqual(storage.get_next_from_sender("Alice").content, "4")
+
+    # @unittest.skip('')
+    def test_max_age(self):
+        clock = Clock(virtual=True)
+        storage = ClassicalStorage(clock=clock, max_age=10)
+        storage.add_msg_to_storage(Message("Alice", "0", 0))
+        clock.sleep(6)
+        storage.add_msg_to_storage(Message("Alice", "1", 1))
+        self.assertEqual(len(storage.get_all()), 2)
+
+        clock.sleep(6)
+        self.assertEqual([m.content for m in storage.get_all_from_sender("Alice")], ["1"])
+        self.assertEqual(storage.get_with_seq_num_from_sender("Alice", 1).content, "1")
+        self.assertEqual(storage.amount_messages_stored, 1)
+        clock.stop()
+
+    # @unittest.skip('')
+    def test_waiter_index(self):
+        storage = ClassicalStorage()
+        results = {}
+
+        def wait_for(name, getter):
+            results[name] = getter()
+
+        threads = [threading.Thread(target=wait_for, args=('next', lambda: storage.get_next_from_sender("Bob", 5))),
+                   threading.Thread(target=wait_for,
+                                    args=('seq', lambda: storage.get_with_seq_num_from_sender("Alice", 1, 5)))]
+        for t in threads:
+            t.start()
+        while storage._amount_pending_requests < 2:
+            time.sleep(0.01)
+
+        # Only the waiters which can match a message are looked at
+        storage.add_msg_to_storage(Message("Alice", "0", 0))
+        self.assertEqual(storage._amount_pending_requests, 2)
+        storage.add_msg_to_storage(Message("Alice", "1", 1))
+        storage.add_msg_to_storage(Message("Bob", "2", 0))
+        for t in threads:
+            t.join()
+        self.assertEqual(results['seq'].content, "1")
+        self.assertEqual(results['next'].content, "2")
+        self.assertEqual(storage._amount_pending_requests, 0)
+        self.assertEqual(storage._pending_request_dict, {})
+
+    # @unittest.skip('')
+    def test_waiter_timeout(self):
+        storage = ClassicalStorage()
+        self.assertIsNone(storage.get_next_from_sender("Alice", 0.1))
+        self.assertIsNone(storage.get_with_seq_num_from_sender("Alice", 0, 0.1))
+        self.assertEqual(storage._amount_pending_requests, 0)
+        self.assertEqual(storage._pending_request_dict, {})
+
+    # @unittest.skip('')
+    def test_ordered_view(self):
+        storage = ClassicalStorage(max_messages_per_sender=4)
+        for seq_num in [2, 0, 3, 1, 3, 5]:
+            storage.add_msg_to_storage(Message("Alice", str(seq_num), seq_num))
+        messages = storage.get_all_from_sender("Alice")
+        ordered = storage.get_all_from_sender("Alice", ordered=True)
+        self.assertEqual([m.content for m in messages], ["3", "1", "3", "5"])
+        self.assertEqual(ordered, sorted(messages, key=lambda x: x.seq_num, reverse=True))
+        self.assertEqual([m.content for m in storage.get_all_from_any_sender(ordered=True)],
+                         ["5", "3", "3", "1"])
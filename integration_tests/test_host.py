@@ -1,8 +1,10 @@
 import unittest
 
-from qunetsim.objects import Qubit
+from qunetsim.objects import Qubit, WorkerPool, AckTracker
 from qunetsim.components import Host
 from random import randint
+import threading
+import time
 
 
 # @unittest.skip('')
@@ -17,6 +19,79 @@ class TestHost(unittest.TestCase):
     def tearDownClass(cls):
         pass
 
+    def test_worker_pool(self):
+        pool = WorkerPool(max_workers=3)
+        done = []
+        release = threading.Event()
+
+        def task(i):
+            release.wait()
+            done.append(i)
+
+        for i in range(10):
+            pool.submit(task, (i,))
+        time.sleep(0.1)
+        metrics = pool.metrics
+        self.assertEqual(metrics['workers'], 3)
+        self.assertEqual(metrics['busy_workers'], 3)
+        self.assertEqual(metrics['queue_depth'], 7)
+        self.assertEqual(metrics['saturation'], 1.0)
+
+        release.set()
+        i = 0
+        while len(done) < 10 and i < 50:
+            time.sleep(0.1)
+            i += 1
+        self.assertEqual(sorted(done), list(range(10)))
+        self.assertEqual(pool.metrics['completed'], 10)
+        self.assertEqual(pool.metrics['queue_depth'], 0)
+        self.assertGreaterEqual(pool.metrics['peak_queue_depth'], 7)
+        pool.shutdown()
+
+        host = Host('A')
+        self.assertIsInstance(host.worker_pool, WorkerPool)
+        host.backend.stop()
+
+    def test_delay(self):
+        host = Host('A')
+        self.assertEqual(host.delay, 0)
+        host.delay = 0.2
+        # Received packets are delayed on the wall clock as well
+        host.rec_packet('packet')
+        self.assertTrue(host.is_idle())
+        time.sleep(0.4)
+        self.assertFalse(host.is_idle())
+
+    def test_ack_tracker(self):
+        tracker = AckTracker()
+        waiting = tracker.wait_for('B', 2)
+        self.assertTrue(waiting.empty())
+
+        tracker.ack('B', 3)
+        tracker.ack('B', 2)
+        self.assertTrue(waiting.get(timeout=1))
+        self.assertEqual(tracker.pending('B', 5), [0, 1, 4, 5])
+        self.assertTrue(tracker.is_acked('B', 3))
+        self.assertFalse(tracker.is_acked('C', 3))
+
+        tracker.ack('B', 0)
+        tracker.ack('B', 1)
+        self.assertEqual(tracker.pending('B', 5), [4, 5])
+        self.assertTrue(tracker.wait_for('B', 1).get(timeout=1))
+
+        # a sequence number which timed out counts as acknowledged
+        waiting = tracker.wait_for('B', 4, timeout=0.05)
+        time.sleep(0.1)
+        tracker.ack('B', 6)
+        self.assertFalse(waiting.get(timeout=1))
+        self.assertEqual(tracker.pending('B', 6), [5])
+
+        tracker.timeout('B', 5)
+        self.assertEqual(tracker.pending('B', 6), [])
+
+        tracker.reset()
+        self.assertEqual(tracker.pending('B', 1), [0, 1])
+
     def test_get_qubits_by_id(self):
         host = Host('A')
         q1 = Qubit(host)
@@ -43,6 +118,21 @@ class TestHost(unittest.TestCase):
         # Test getting qubits that don't exist
         self.assertIsNone(host.get_qubit_by_id('fake'))
 
+    def test_qubit_handles(self):
+        host = Host('A')
+        q1 = Qubit(host)
+        q2 = Qubit(host)
+        q3 = Qubit(host, q_id='q')
+
+        self.assertLess(q1.handle, q2.handle)
+        self.assertLess(q2.handle, q3.handle)
+        self.assertNotEqual(q1.id, q2.id)
+        self.assertEqual(q1.id, '#%d' % q1.handle)
+        self.assertEqual(q3.id, 'q')
+
+        host.add_qubit('A', q1)
+        self.assertIs(host.get_qubit_by_id(q1.id), q1)
+
     def test_get_data_qubit(self):
         with self.assertWarns(DeprecationWarning):
             host = Host('A')
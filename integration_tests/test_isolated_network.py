@@ -0,0 +1,94 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from qunetsim.backends import EQSNBackend
+from qunetsim.components import Host, Network
+from qunetsim.objects import Qubit
+
+
+def simulate(tag):
+    network = Network()
+    backend = EQSNBackend(isolated=True)
+    network.start(backend=backend)
+    network.delay = 0.0
+
+    alice = Host('Alice', backend, network=network)
+    bob = Host('Bob', backend, network=network)
+    alice.add_connection('Bob')
+    bob.add_connection('Alice')
+    alice.start()
+    bob.start()
+    network.add_hosts([alice, bob])
+
+    try:
+        alice.send_classical('Bob', tag, await_ack=True)
+        q = Qubit(alice)
+        if tag.endswith('1'):
+            q.X()
+        alice.send_teleport('Bob', q, await_ack=True)
+        q_rec = bob.get_qubit('Alice', q.id, wait=10)
+        msg = bob.get_next_classical('Alice', wait=10)
+        return msg.content, q_rec.measure() if q_rec is not None else None
+    finally:
+        network.stop(stop_hosts=True)
+
+
+# @unittest.skip('')
+class TestIsolatedNetwork(unittest.TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        # The hosts of test_default_instance use backends which are not isolated
+        EQSNBackend().stop()
+
+    def test_default_instance(self):
+        network = Network()
+        self.assertIsNot(network, Network.get_instance())
+        self.assertIs(Network.get_instance(), Network.get_instance())
+
+        host = Host('Alice', network=network)
+        self.assertIs(host.network, network)
+        self.assertIs(host.backend, network.backend)
+        self.assertIs(Host('Bob', network=network).backend, host.backend)
+        self.assertIs(Host('Alice').network, Network.get_instance())
+        self.assertIsNot(Host('Alice').backend, host.backend)
+
+    def test_isolated_backends(self):
+        backend_1 = EQSNBackend(isolated=True)
+        backend_2 = EQSNBackend(isolated=True)
+        Host('Alice', backend_1, network=Network())
+        self.assertNotEqual(str(backend_1._hosts), str(backend_2._hosts))
+        backend_1.stop()
+        backend_2.stop()
+
+    def test_concurrent_networks(self):
+        tags = ['network_%d' % (i % 2) for i in range(4)]
+        with ThreadPoolExecutor(max_workers=len(tags)) as executor:
+            results = list(executor.map(simulate, tags))
+
+        for tag, (content, measurement) in zip(tags, results):
+            self.assertEqual(content, tag)
+            self.assertEqual(measurement, int(tag[-1]))
+
+    def test_stop_default_network(self):
+        network = Network()
+        backend = EQSNBackend(isolated=True)
+        network.start(backend=backend)
+        alice = Host('Alice', backend, network=network)
+        q = Qubit(alice)
+        q.X()
+
+        default = Network.get_instance()
+        default.start(backend=EQSNBackend())
+        Host('Bob', network=default)
+        default.stop(stop_hosts=True)
+
+        # The simulator keeps running for the isolated network
+        q.H()
+        q.H()
+        self.assertEqual(q.measure(), 1)
+        network.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
 import unittest
 
 from qunetsim.components import Network, Host
+from qunetsim.objects import ForwardingTable
 from eqsn import EQSN
 from math import floor
+import networkx as nx
+import random
 
 
 # @unittest.skip('')
@@ -61,6 +64,65 @@ class TestNetwork(unittest.TestCase):
         self.assertEqual(network.num_hosts, 0)
         network.stop(True)
 
+    def test_route_cache(self):
+        network = Network.get_instance()
+        network.generate_topology(['A', 'B', 'C'], 'linear')
+
+        self.assertEqual(network.get_classical_route('A', 'C'), ['A', 'B', 'C'])
+        self.assertEqual(network.get_classical_route('A', 'C'), ['A', 'B', 'C'])
+        self.assertEqual(network.route_cache_info['misses'], 1)
+        self.assertEqual(network.route_cache_info['hits'], 1)
+        self.assertEqual(network.route_cache_info['classical_routes'], 1)
+
+        a = network.get_host('A')
+        a.add_connection('C')
+        network.update_host(a)
+        self.assertEqual(network.route_cache_info['classical_routes'], 0)
+        self.assertEqual(network.get_classical_route('A', 'C'), ['A', 'C'])
+        self.assertEqual(network.get_quantum_route('A', 'C'), ['A', 'C'])
+
+        network.remove_q_connection('A', 'C')
+        self.assertEqual(network.route_cache_info['classical_routes'], 1)
+        self.assertEqual(network.route_cache_info['quantum_routes'], 0)
+        self.assertEqual(network.get_quantum_route('A', 'C'), ['A', 'B', 'C'])
+
+        network.stop(stop_hosts=True)
+
+    def test_forwarding_table(self):
+        random.seed(1)
+        graph = nx.gnp_random_graph(30, 0.1, seed=1, directed=True)
+        table = ForwardingTable(graph)
+
+        def check():
+            lengths = dict(nx.all_pairs_shortest_path_length(graph))
+            for s in graph.nodes:
+                for d in graph.nodes:
+                    if s == d:
+                        continue
+                    route = table.route(s, d)
+                    if d not in lengths[s]:
+                        self.assertIsNone(route)
+                        self.assertIsNone(table.next_hop(s, d))
+                    else:
+                        self.assertEqual(len(route) - 1, lengths[s][d])
+                        self.assertEqual(route[1], table.next_hop(s, d))
+                        for u, v in zip(route, route[1:]):
+                            self.assertTrue(graph.has_edge(u, v))
+
+        check()
+        for _ in range(20):
+            u, v = random.sample(list(graph.nodes), 2)
+            if graph.has_edge(u, v):
+                graph.remove_edge(u, v)
+                table.edge_removed(u, v)
+            else:
+                graph.add_edge(u, v)
+                table.edge_added(u, v)
+            check()
+        graph.remove_node(0)
+        table.node_removed(0)
+        check()
+
     def test_generate_topology_star(self):
         network = Network.get_instance()
         non_center_nodes = self.sample_list.copy()
@@ -1,8 +1,15 @@
+import queue
+import threading
 import unittest
 import uuid
 
-from qunetsim.objects import QuantumStorage
+from qunetsim.backends import DensityMatrixBackend
+from qunetsim.components import Host
+from qunetsim.objects import QuantumStorage, Clock, Qubit
+from qunetsim.objects.storage.memory_models import Coherence, Cutoff
+from qunetsim.objects.storage.timing_wheel import TimingWheel
 from qunetsim.utils.constants import Constants
+from qunetsim.utils.handles import new_handle
 
 
 class FakeQubit(object):
@@ -15,9 +22,12 @@ class FakeQubit(object):
             self.id = str(id)
         else:
             self.id = str(uuid.uuid4())
+        self.handle = new_handle()
+        self.named = True
+        self.released = False
 
     def release(self):
-        pass
+        self.released = True
 
     def set_new_id(self, id):
         self.id = id
@@ -247,3 +257,217 @@ class TestQuantumStorage(unittest.TestCase):
         self.assertEqual(len(qubits), 3)
         qubits = storage.get_all_qubits_from_host('S', remove=True)
         self.assertEqual(len(qubits), 0)
+
+    def test_get_qubit_by_id_index(self):
+        storage = QuantumStorage()
+        q1 = FakeQubit()
+        q2 = FakeQubit()
+        storage.add_qubit_from_host(q1, Constants.DATA, 'A')
+        storage.add_qubit_from_host(q2, Constants.EPR, 'B')
+
+        self.assertEqual(storage.get_qubit_by_id(q1.id), q1)
+        self.assertEqual(storage.get_qubit_by_id(q2.id), q2)
+        storage.get_qubit_from_host('B', q2.id)
+        self.assertIsNone(storage.get_qubit_by_id(q2.id))
+
+        storage.change_qubit_id('A', 'new', q1.id)
+        self.assertEqual(storage.get_qubit_by_id('new'), q1)
+
+    def test_handle_ids(self):
+        host = Host('A', backend=DensityMatrixBackend())
+        storage = QuantumStorage()
+        q1 = Qubit(host)
+        q2 = Qubit(host)
+        q3 = Qubit(host, q_id='#%d' % q2.handle)
+        storage.add_qubit_from_host(q1, Constants.EPR, 'B')
+        storage.add_qubit_from_host(q2, Constants.EPR, 'B')
+        storage.add_qubit_from_host(q3, Constants.EPR, 'C')
+        # Storing the qubits does not create their IDs
+        self.assertFalse(q1.named)
+        self.assertFalse(q2.named)
+        self.assertIsNone(q1._id)
+
+        self.assertIs(storage.get_qubit_by_id(q1.id), q1)
+        self.assertIsNone(storage.get_qubit_by_id('#0%d' % q1.handle))
+        # The ID given to a qubit is found before the one of a handle
+        self.assertIs(storage.get_qubit_by_id(q3.id), q3)
+        # A qubit with an ID of its own is not found by the ID of its handle
+        self.assertIsNone(storage.get_qubit_from_host('C', '#%d' % q3.handle))
+        self.assertIs(storage.get_qubit_from_host('C', q3.id), q3)
+
+        storage.change_qubit_id('B', 'new', q1.id)
+        self.assertTrue(q1.named)
+        self.assertIsNone(storage.get_qubit_from_host('B', '#%d' % q1.handle))
+        self.assertIs(storage.get_qubit_from_host('B', 'new'), q1)
+        with self.assertRaises(ValueError):
+            storage.add_qubit_from_host(q2, Constants.EPR, 'B')
+        self.assertIs(storage.get_qubit_from_host('B'), q2)
+        self.assertIsNone(storage.get_qubit_by_id(q2.id))
+
+    def test_waiter_index(self):
+        storage = QuantumStorage()
+        # Many requests which the arriving qubit does not match
+        for i in range(100):
+            storage._add_request(queue.Queue(), 'B', None, Constants.DATA)
+            storage._add_request(queue.Queue(), 'A', str(i), None)
+        q_a = queue.Queue()
+        storage._add_request(q_a, 'A', None, Constants.EPR)
+
+        calls = []
+        get_qubit = storage._get_qubit_from_host
+
+        def counting_get_qubit(*args):
+            calls.append(args)
+            return get_qubit(*args)
+
+        storage._get_qubit_from_host = counting_get_qubit
+        q = FakeQubit()
+        storage.add_qubit_from_host(q, Constants.EPR, 'A')
+
+        # Only the matching request is looked at
+        self.assertEqual(calls, [('A', None, Constants.EPR)])
+        self.assertEqual(q_a.get_nowait(), q)
+        self.assertEqual(storage._amount_pending_requests, 200)
+        self.assertEqual(storage.amount_qubits_stored, 0)
+
+    def test_waiting_for_qubit(self):
+        storage = QuantumStorage()
+        q = FakeQubit()
+        results = []
+        t = threading.Thread(target=lambda: results.append(
+            storage.get_qubit_from_host('A', purpose=Constants.EPR, wait=5)))
+        t.start()
+        while storage._amount_pending_requests == 0:
+            pass
+        storage.add_qubit_from_host(FakeQubit(), Constants.DATA, 'A')
+        storage.add_qubit_from_host(q, Constants.EPR, 'A')
+        t.join(5)
+        self.assertEqual(results, [q])
+        self.assertEqual(storage._amount_pending_requests, 0)
+
+    def test_host_locks(self):
+        storage = QuantumStorage()
+        lock_a = storage._host_lock('A')
+        self.assertIsNot(lock_a, storage._host_lock('B'))
+
+        # The qubits from B can be used while the lock of A is held
+        lock_a.acquire_write()
+        q = FakeQubit()
+        results = []
+
+        def use_b():
+            storage.add_qubit_from_host(q, Constants.DATA, 'B')
+            results.append(storage.get_qubit_from_host('B', q.id))
+
+        t = threading.Thread(target=use_b)
+        t.start()
+        t.join(5)
+        lock_a.release_write()
+        self.assertFalse(t.is_alive())
+        self.assertEqual(results, [q])
+
+    def test_order_of_qubits(self):
+        storage = QuantumStorage()
+        qubits = [FakeQubit(i) for i in range(6)]
+        for i, q in enumerate(qubits):
+            storage.add_qubit_from_host(q, Constants.EPR if i % 2 else Constants.DATA, 'A')
+
+        self.assertTrue(storage.check_qubit_from_host_exists('A', Constants.EPR))
+        self.assertFalse(storage.check_qubit_from_host_exists('A', Constants.GHZ))
+
+        # A qubit keeps its place when its id changes
+        storage.change_qubit_id('A', 'new', '1')
+        self.assertEqual(storage.get_qubit_from_host('A', purpose=Constants.EPR), qubits[1])
+        self.assertEqual(qubits[1].id, 'new')
+        self.assertEqual(storage.get_qubit_from_host('A', q_id='4'), qubits[4])
+        self.assertEqual(storage.get_qubit_from_host('A'), qubits[0])
+        self.assertEqual(storage.get_qubit_from_host('A', purpose=Constants.DATA), qubits[2])
+        self.assertEqual(storage.get_qubit_from_host('A', purpose=Constants.EPR), qubits[3])
+        self.assertEqual(storage.get_all_qubits_from_host('A'), [qubits[5]])
+        self.assertEqual(storage.amount_qubits_stored, 1)
+
+    # @unittest.skip('')
+    def test_timing_wheel(self):
+        wheel = TimingWheel(1, num_slots=4)
+        self.assertEqual(wheel.advance(0), [])
+        wheel.add('a', 2.5)
+        wheel.add('b', 1.5)
+        wheel.add('c', 9.5)
+        wheel.add('d', 3)
+        self.assertTrue(wheel.remove('d'))
+        self.assertFalse(wheel.remove('d'))
+        self.assertEqual(wheel.advance(1), [])
+        self.assertEqual(wheel.advance(3), ['b', 'a'])
+        # 'c' is in a slot which is visited before it expires
+        self.assertEqual(wheel.advance(7), [])
+        self.assertEqual(len(wheel), 1)
+        self.assertEqual(wheel.advance(100), ['c'])
+        self.assertEqual(len(wheel), 0)
+        # expired entries are found with the next advance
+        wheel.add('e', 50)
+        self.assertEqual(wheel.advance(100), ['e'])
+
+    # @unittest.skip('')
+    def test_memory_cutoff(self):
+        clock = Clock(virtual=True)
+        # The test drives the simulation
+        clock.attach()
+        storage = QuantumStorage(clock=clock, memory_model=Cutoff(10))
+        q1 = FakeQubit()
+        q2 = FakeQubit()
+        storage.add_qubit_from_host(q1, Constants.EPR, "Alice")
+        clock.sleep(6)
+        storage.add_qubit_from_host(q2, Constants.EPR, "Alice")
+        clock.sleep(6)
+
+        # The first qubit is released without accessing the storage
+        self.assertTrue(q1.released)
+        self.assertFalse(q2.released)
+        self.assertEqual(storage.amount_qubits_stored, 1)
+        self.assertEqual(storage.amount_qubits_expired, 1)
+        self.assertIsNone(storage.get_qubit_by_id(q1.id))
+        self.assertEqual(storage.get_qubit_from_host("Alice"), q2)
+        self.assertEqual(len(storage._stored_at["Alice"]), 0)
+        self.assertEqual(len(storage._wheel), 0)
+        clock.detach()
+        clock.stop()
+
+    # @unittest.skip('')
+    def test_set_memory_model(self):
+        clock = Clock(virtual=True)
+        # The test drives the simulation
+        clock.attach()
+        storage = QuantumStorage(clock=clock)
+        q1 = FakeQubit()
+        storage.add_qubit_from_host(q1, Constants.EPR, "Alice")
+        clock.sleep(6)
+        # The cutoff also applies to qubits which are already stored
+        storage.memory_model = Cutoff(5)
+        self.assertTrue(q1.released)
+        self.assertEqual(storage.amount_qubits_stored, 0)
+        storage.memory_model = None
+        q2 = FakeQubit()
+        storage.add_qubit_from_host(q2, Constants.EPR, "Alice")
+        clock.sleep(6)
+        self.assertEqual(storage.get_qubit_from_host("Alice"), q2)
+        clock.detach()
+        clock.stop()
+
+    # @unittest.skip('')
+    def test_memory_coherence(self):
+        clock = Clock(virtual=True)
+        # The test drives the simulation
+        clock.attach()
+        host = Host('Alice', backend=DensityMatrixBackend())
+        host.set_memory_model(Coherence(t1=1, t2=1))
+        self.assertEqual(host.qubit_storage.memory_model.t2, 1)
+        storage = QuantumStorage(clock=clock, memory_model=Coherence(t1=1))
+        q = Qubit(host)
+        q.X()
+        storage.add_qubit_from_host(q, Constants.EPR, "Bob")
+        clock.sleep(100)
+        # The qubit relaxed to |0>
+        q = storage.get_qubit_from_host("Bob")
+        self.assertEqual(q.measure(), 0)
+        clock.detach()
+        clock.stop()
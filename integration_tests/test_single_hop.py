@@ -140,6 +140,20 @@ class TestOneHop(unittest.TestCase):
         hosts['bob'].empty_classical()
         self.assertTrue(len(hosts['bob'].classical) == 0)
 
+    # @unittest.skip('')
+    def test_send_classical_link_dispatch(self):
+        network.use_link_dispatch = True
+        network.delay = 0.05
+        try:
+            ack_bob = hosts['alice'].send_classical(hosts['bob'].host_id, 'hello bob', await_ack=True)
+            ack_alice = hosts['bob'].send_classical(hosts['alice'].host_id, 'hello alice', await_ack=True)
+            self.assertTrue(ack_bob)
+            self.assertTrue(ack_alice)
+            self.assertEqual(hosts['bob'].get_next_classical(hosts['alice'].host_id).content, 'hello bob')
+            self.assertEqual(hosts['alice'].get_next_classical(hosts['bob'].host_id).content, 'hello alice')
+        finally:
+            network.use_link_dispatch = False
+
     # @unittest.skip('')
     def test_max_wait_for_ack(self):
         global hosts
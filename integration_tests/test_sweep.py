@@ -0,0 +1,108 @@
+import unittest
+import os
+import random
+import threading
+import time
+
+from qunetsim import sweep
+from qunetsim.backends import EQSNBackend
+from qunetsim.components import Host, Network
+from qunetsim.sweep import run_sweep, grid_points
+
+
+def send_messages(amount, drop_rate):
+    network = Network.get_instance()
+    backend = EQSNBackend()
+    network.start(backend=backend)
+    network.delay = 0.0
+    network.packet_drop_rate = drop_rate
+
+    alice = Host('Alice', backend)
+    bob = Host('Bob', backend)
+    alice.add_connection('Bob')
+    bob.add_connection('Alice')
+    alice.start()
+    bob.start()
+    network.add_hosts([alice, bob])
+
+    for i in range(amount):
+        alice.send_classical('Bob', str(i))
+    i = 0
+    while len(bob.get_classical('Alice')) < amount and i < 20:
+        time.sleep(0.1)
+        i += 1
+    received = len(bob.get_classical('Alice'))
+    return {'received': received, 'random': random.random()}
+
+
+def slow(duration):
+    time.sleep(duration)
+    return duration
+
+
+def failing():
+    raise ValueError('trial failed')
+
+
+def lingering(exit_code):
+    # Keeps the process alive after the trial, and exits it with the exit code
+    def linger():
+        time.sleep(0.5 if exit_code else 60)
+        os._exit(exit_code)
+
+    threading.Thread(target=linger).start()
+    return exit_code
+
+
+# @unittest.skip('')
+class TestSweep(unittest.TestCase):
+
+    def test_grid_points(self):
+        points = grid_points({'a': [1, 2], 'b': ['x', 'y', 'z']})
+        self.assertEqual(len(points), 6)
+        self.assertIn({'a': 2, 'b': 'y'}, points)
+        self.assertEqual(grid_points([{'a': 1}]), [{'a': 1}])
+
+    def test_sweep(self):
+        grid = {'amount': [3], 'drop_rate': [0.0, 1.0]}
+        rows = list(run_sweep(send_messages, grid, processes=2, timeout=60, seed=5, repetitions=2))
+        self.assertEqual(len(rows), 4)
+        rows.sort(key=lambda r: r['trial'])
+        self.assertEqual([r['seed'] for r in rows], [5, 6, 7, 8])
+        for row in rows:
+            self.assertIsNone(row['error'])
+            self.assertEqual(row['received'], 3 if row['drop_rate'] == 0.0 else 0)
+
+        # Trials are reproducible with their seed
+        again = list(run_sweep(send_messages, [{'amount': 3, 'drop_rate': 0.0}], processes=1, seed=5))
+        self.assertEqual(again[0]['random'], rows[0]['random'])
+
+    def test_timeout_and_errors(self):
+        rows = list(run_sweep(slow, {'duration': [0.0, 30]}, processes=2, timeout=2))
+        rows.sort(key=lambda r: r['trial'])
+        self.assertEqual(rows[0]['result'], 0.0)
+        self.assertEqual(rows[1]['error'], 'timeout')
+
+        rows = list(run_sweep(failing, [{}], processes=1))
+        self.assertIn('trial failed', rows[0]['error'])
+
+    def test_exit_after_trial(self):
+        # The row is kept if the process exits with an error after delivering it
+        rows = list(run_sweep(lingering, [{'exit_code': 3}], processes=1))
+        self.assertEqual(rows[0]['result'], 3)
+        self.assertIsNone(rows[0]['error'])
+
+        join_timeout = sweep.JOIN_TIMEOUT
+        sweep.JOIN_TIMEOUT = 1
+        try:
+            start = time.time()
+            rows = list(run_sweep(lingering, [{'exit_code': 0}], processes=1))
+        finally:
+            sweep.JOIN_TIMEOUT = join_timeout
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual(rows[0]['result'], 0)
+        self.assertEqual(rows[0]['error'], 'process did not exit after the trial')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+import unittest
+import time
+from queue import Empty, Queue
+
+from qunetsim.components import Host, Network
+from qunetsim.objects import Clock, Qubit
+from eqsn import EQSN
+
+
+# @unittest.skip('')
+class TestClock(unittest.TestCase):
+
+    def test_wall_clock(self):
+        clock = Clock()
+        self.assertFalse(clock.virtual)
+        self.assertAlmostEqual(clock.time(), time.time(), delta=1)
+
+    def test_virtual_events_in_order(self):
+        clock = Clock(virtual=True)
+        # The test drives the simulation
+        clock.attach()
+        calls = []
+        clock.call_later(3, calls.append, (3,))
+        clock.call_later(1, calls.append, (1,))
+        clock.call_later(2, calls.append, (2,))
+        clock.sleep(5)
+        self.assertEqual(calls, [1, 2, 3])
+        self.assertEqual(clock.time(), 5)
+        clock.detach()
+        clock.stop()
+
+    def test_stale_timeout(self):
+        clock = Clock(virtual=True)
+        q = Queue()
+        # The timeout of an earlier call fired while its item arrived
+        q.put(Clock._Timeout())
+        q.put('item')
+        self.assertEqual(clock.get(q, 5), 'item')
+        with self.assertRaises(Empty):
+            clock.get(q, 5)
+        self.assertEqual(clock.time(), 5)
+        q.put(Clock._Timeout())
+        with self.assertRaises(Empty):
+            clock.get(q, 0)
+        clock.stop()
+
+    def test_slow_producer(self):
+        clock = Clock(virtual=True)
+        q = Queue()
+
+        def produce():
+            time.sleep(0.1)
+            q.put('item')
+
+        clock.attach()
+        try:
+            clock.start_thread(produce)
+            self.assertEqual(clock.get(q, timeout=10), 'item')
+            self.assertEqual(clock.time(), 0)
+        finally:
+            clock.detach()
+        clock.stop()
+
+    def test_join(self):
+        clock = Clock(virtual=True)
+        clock.attach()
+        try:
+            thread = clock.start_thread(clock.sleep, (5,))
+            clock.join(thread)
+            self.assertEqual(clock.time(), 5)
+            self.assertFalse(thread.is_alive())
+        finally:
+            clock.detach()
+        clock.stop()
+
+    def test_virtual_sleep(self):
+        clock = Clock(virtual=True)
+        start = time.time()
+        clock.sleep(1000)
+        self.assertEqual(clock.time(), 1000)
+        self.assertLess(time.time() - start, 5)
+        clock.stop()
+
+
+# @unittest.skip('')
+class TestVirtualTime(unittest.TestCase):
+    network = None
+    hosts = None
+
+    @classmethod
+    def setUpClass(cls):
+        cls.network = Network.get_instance()
+        cls.network.use_virtual_time = True
+        cls.network.delay = 1.0
+        cls.hosts = []
+        for name in ['A', 'B', 'C', 'D']:
+            cls.hosts.append(Host(name))
+        for left, right in zip(cls.hosts, cls.hosts[1:]):
+            left.add_connection(right.host_id)
+            right.add_connection(left.host_id)
+        for host in cls.hosts:
+            host.delay = 0.5
+            host.start()
+        cls.network.add_hosts(cls.hosts)
+        cls.network.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.network.stop(True)
+        cls.network.use_virtual_time = False
+        EQSN.get_instance().stop_all()
+
+    def test_send_classical_multi_hop(self):
+        a, d = self.hosts[0], self.hosts[-1]
+        start = time.time()
+        sim_start = self.network.clock.time()
+        self.assertTrue(a.send_classical(d.host_id, 'hello', await_ack=True))
+        # Three hops with a network delay of 1 and a host delay of 0.5 in each
+        # direction.
+        self.assertAlmostEqual(self.network.clock.time() - sim_start, 9.0)
+        self.assertLess(time.time() - start, 5)
+
+        msg = d.get_next_classical(a.host_id, wait=1)
+        self.assertEqual(msg.content, 'hello')
+
+    def test_wait_timeout(self):
+        a, d = self.hosts[0], self.hosts[-1]
+        start = time.time()
+        sim_start = self.network.clock.time()
+        self.assertIsNone(d.get_next_classical(a.host_id, wait=100))
+        self.assertGreaterEqual(self.network.clock.time() - sim_start, 100)
+        self.assertIsNone(d.get_qubit(a.host_id, wait=100))
+        self.assertGreaterEqual(self.network.clock.time() - sim_start, 200)
+        self.assertLess(time.time() - start, 5)
+
+    def test_send_qubit(self):
+        a, b = self.hosts[0], self.hosts[1]
+        q = Qubit(a)
+        q.X()
+        q_id, ack = a.send_qubit(b.host_id, q, await_ack=True)
+        self.assertTrue(ack)
+        q_rec = b.get_qubit(a.host_id, q_id, wait=10)
+        self.assertIsNotNone(q_rec)
+        self.assertEqual(q_rec.measure(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
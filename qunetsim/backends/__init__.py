@@ -1,5 +1,8 @@
 # Default backend
 from .eqsn_backend import EQSNBackend
+from .numpy_backend import NumpyBackend
+from .stabilizer_backend import StabilizerBackend
+from .density_matrix_backend import DensityMatrixBackend
 
 # Optional backends
 try:
@@ -23,3 +26,4 @@ except RuntimeError:
 
 from .rw_lock import RWLock
 from .safe_dict import SafeDict
+from .epr_store import EPRStore
@@ -88,6 +88,22 @@ class Backend(object):
         raise (EnvironmentError("This is only an interface, not \
                         an actual implementation!"))
 
+    def receive_eprs(self, host_id, sender_id, n, block=False):
+        """
+        Receives the qubits of the next *n* EPR pairs the sender created with
+        the host at once.
+
+        Args:
+            host_id (str): ID of the host who receives the EPR qubits.
+            sender_id (str): ID of the sender of the EPR pairs.
+            n (int): The amount of EPR qubits.
+            block (bool): Determines if the created pairs should be blocked or not.
+        Returns:
+            (list): The EPR qubits, in the order the pairs were created.
+        """
+        raise (EnvironmentError("This is only an interface, not \
+                        an actual implementation!"))
+
     ##########################
     #   Gate definitions    #
     #########################
@@ -255,6 +271,18 @@ class Backend(object):
         raise (EnvironmentError("This is only an interface, not \
                         an actual implementation!"))
 
+    def run_circuit(self, ops):
+        """
+        Applies a list of gates at once. Each operation is a tuple of the name
+        of a gate method of the backend and its arguments, e.g. ('H', qubit) or
+        ('cnot', control, target).
+
+        Args:
+            ops (list): The operations in the order they should be applied.
+        """
+        raise (EnvironmentError("This is only an interface, not \
+                        an actual implementation!"))
+
     def density_operator(self, qubit):
         """
         Returns the density operator of this qubit. If the qubit is entangled,
@@ -269,6 +297,20 @@ class Backend(object):
         raise (EnvironmentError("This is only an interface, not \
                         an actual implementation!"))
 
+    def statevector(self, qubit):
+        """
+        Returns the statevector of the passed qubit. If the qubit is entangled to others,
+        the statevector of the whole entangled system is returned
+
+        Args:
+            qubit (Qubit): Qubit of the statevector.
+
+        Returns:
+            The statevector in the format of the backend.
+        """
+        raise (EnvironmentError("This is only an interface, not \
+                        an actual implementation!"))
+
     def measure(self, qubit, non_destructive):
         """
         Perform a measurement on a qubit.
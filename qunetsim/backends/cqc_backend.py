@@ -4,6 +4,7 @@ from simulaqron.network import Network as SimulaNetwork
 
 from qunetsim.backends.rw_lock import RWLock
 from qunetsim.backends.safe_dict import SafeDict
+from qunetsim.backends.epr_store import EPRStore
 from qunetsim.objects.qubit import Qubit
 
 
@@ -12,6 +13,10 @@ class CQCBackend(object):
     The SimulaQron CQC backend
     """
 
+    # Time in seconds receive_epr waits for the sender to store the ID of a
+    # received EPR pair.
+    EPR_ID_TIMEOUT = 5
+
     class Hosts(SafeDict):
         # There only should be one instance of Hosts
         __instance = None
@@ -46,7 +51,7 @@ class CQCBackend(object):
             CQCBackend.CQCConnections.__instance = self
             SafeDict.__init__(self)
 
-    class EntanglementIDs(SafeDict):
+    class EntanglementIDs(EPRStore):
         # There only should be one instance of Hosts
         __instance = None
 
@@ -61,7 +66,7 @@ class CQCBackend(object):
             if CQCBackend.EntanglementIDs.__instance is not None:
                 raise Exception("Call get instance to get this class!")
             CQCBackend.EntanglementIDs.__instance = self
-            SafeDict.__init__(self)
+            EPRStore.__init__(self)
 
     # SimulaQron comes with an own network simulator
     # has to be kept in sync with QuNetSim network
@@ -71,7 +76,7 @@ class CQCBackend(object):
     def __init__(self):
         self._hosts = CQCBackend.Hosts.get_instance()
         self._cqc_connections = CQCBackend.CQCConnections.get_instance()
-        # keys are from : to, where from is the host calling create EPR
+        # keys are (from, to), where from is the host calling create EPR
         self._entaglement_ids = CQCBackend.EntanglementIDs.get_instance()
         self._stopped = False
 
@@ -163,13 +168,7 @@ class CQCBackend(object):
         return qubit
 
     def store_ent_id(self, cqc_host_a, cqc_host_b, qubit):
-        key = cqc_host_a.name + ':' + cqc_host_b.name
-        ent_list = self._entaglement_ids.get_from_dict(key)
-        if ent_list is not None:
-            ent_list.append(qubit.id)
-        else:
-            ent_list = [qubit.id]
-        self._entaglement_ids.add_to_dict(key, ent_list)
+        self._entaglement_ids.put(cqc_host_a.name, cqc_host_b.name, qubit.id)
 
     def receive_epr(self, host_id, sender_id, q_id=None, block=False):
         """
@@ -186,17 +185,32 @@ class CQCBackend(object):
         cqc_host = self._cqc_connections.get_from_dict(host_id)
         host = self._hosts.get_from_dict(host_id)
         q = cqc_host.recvEPR()
-        key = sender_id + ':' + cqc_host.name
-        ent_list = self._entaglement_ids.get_from_dict(key)
-        if ent_list is None:
-            raise Exception("Internal Error!")
-        id = None
-        id = ent_list.pop(0)
+        # The sender stores the ID right after the pair is created, the wait
+        # only covers this gap. Like before, a missing ID raises an IndexError.
+        id = self._entaglement_ids.get(sender_id, cqc_host.name, CQCBackend.EPR_ID_TIMEOUT)
         if q_id is not None and q_id != id:
             raise ValueError("q_id doesn't match id!")
-        self._entaglement_ids.add_to_dict(key, ent_list)
         return Qubit(host, qubit=q, q_id=id, blocked=block)
 
+    def receive_eprs(self, host_id, sender_id, n, block=False):
+        """
+        Receives the qubits of the next *n* EPR pairs the sender created with
+        the host at once.
+
+        Args:
+            host_id (str): ID of the host who receives the EPR qubits.
+            sender_id (str): ID of the sender of the EPR pairs.
+            n (int): The amount of EPR qubits.
+            block (bool): Determines if the created pairs should be blocked or not.
+        Returns:
+            (list): The EPR qubits, in the order the pairs were created.
+        """
+        cqc_host = self._cqc_connections.get_from_dict(host_id)
+        host = self._hosts.get_from_dict(host_id)
+        qubits = [cqc_host.recvEPR() for _ in range(n)]
+        ids = self._entaglement_ids.get_many(sender_id, cqc_host.name, n, CQCBackend.EPR_ID_TIMEOUT)
+        return [Qubit(host, qubit=q, q_id=id, blocked=block) for q, id in zip(qubits, ids)]
+
     def flush(self, host_id):
         """
         CQC specific function.
@@ -375,6 +389,29 @@ class CQCBackend(object):
         """
         raise (EnvironmentError("Not implemented for this backend!"))
 
+    def run_circuit(self, ops):
+        """
+        Applies a list of gates. The CQC connections of the qubits are put into
+        pending mode, so that the gates are sent to SimulaQron with one message
+        per connection instead of one round trip per gate.
+
+        Args:
+            ops (list): The operations, tuples of the name of a gate method and
+                        its arguments, e.g. ('cnot', control, target).
+        """
+        connections = []
+        try:
+            for op in ops:
+                connection = op[1].qubit._cqc
+                if connection not in connections:
+                    connection.set_pending(True)
+                    connections.append(connection)
+                getattr(self, op[0])(*op[1:])
+        finally:
+            for connection in connections:
+                connection.flush()
+                connection.set_pending(False)
+
     def density_operator(self, qubit):
         """
         Returns the density operator of this qubit. If the qubit is entangled,
@@ -388,6 +425,19 @@ class CQCBackend(object):
         """
         raise (EnvironmentError("Not implemented for this backend!"))
 
+    def statevector(self, qubit):
+        """
+        Returns the statevector of the passed qubit. If the qubit is entangled to others,
+        the statevector of the whole entangled system is returned
+
+        Args:
+            qubit (Qubit): Qubit of the statevector.
+
+        Returns:
+            The statevector in the format of the backend.
+        """
+        raise (EnvironmentError("Not implemented for this backend!"))
+
     def measure(self, qubit, non_destructive):
         """
         Perform a measurement on a qubit.
@@ -0,0 +1,78 @@
+import threading
+from collections import deque
+
+
+class EPRStore(object):
+    """
+    Buffers the second qubits of EPR pairs between *create_EPR* and
+    *receive_epr*. The qubits are kept in a deque per (sender, receiver) pair
+    and every operation takes a single lock.
+    """
+
+    def __init__(self):
+        self._pairs = {}
+        self._cond = threading.Condition()
+
+    def __str__(self):
+        with self._cond:
+            return str({key: list(pairs) for key, pairs in self._pairs.items()})
+
+    def put(self, sender_id, receiver_id, qubit):
+        """
+        Stores the qubit of the receiver of an EPR pair.
+
+        Args:
+            sender_id (str): ID of the host which created the pair.
+            receiver_id (str): ID of the host which receives the qubit.
+            qubit (object): The qubit, or whatever the backend has to buffer.
+        """
+        with self._cond:
+            pairs = self._pairs.get((sender_id, receiver_id))
+            if pairs is None:
+                pairs = self._pairs[(sender_id, receiver_id)] = deque()
+            pairs.append(qubit)
+            self._cond.notify_all()
+
+    def get(self, sender_id, receiver_id, timeout=None):
+        """
+        Takes the oldest qubit the sender stored for the receiver, waits if
+        there is none at the moment.
+
+        Args:
+            sender_id (str): ID of the host which created the pair.
+            receiver_id (str): ID of the host which receives the qubit.
+            timeout (float): The maximum waiting time in seconds, None to wait
+                             forever.
+        Returns:
+            (object): The qubit.
+        Raises:
+            IndexError: If no qubit was stored in time.
+        """
+        return self.get_many(sender_id, receiver_id, 1, timeout)[0]
+
+    def get_many(self, sender_id, receiver_id, n, timeout=None):
+        """
+        Takes the *n* oldest qubits the sender stored for the receiver, waits
+        until there are enough of them, also if the sender did not store any
+        qubit for the receiver yet.
+
+        Args:
+            sender_id (str): ID of the host which created the pairs.
+            receiver_id (str): ID of the host which receives the qubits.
+            n (int): The amount of qubits.
+            timeout (float): The maximum waiting time in seconds, None to wait
+                             forever.
+        Returns:
+            (list): The qubits, in the order they were stored.
+        Raises:
+            IndexError: If not enough qubits were stored in time.
+        """
+        with self._cond:
+            # The receiver can ask for the first pair before it is stored
+            pairs = self._pairs.get((sender_id, receiver_id))
+            if pairs is None:
+                pairs = self._pairs[(sender_id, receiver_id)] = deque()
+            if not self._cond.wait_for(lambda: len(pairs) >= n, timeout):
+                raise IndexError("Only %d of %d EPR qubits stored from %s for %s"
+                                 % (len(pairs), n, sender_id, receiver_id))
+            return [pairs.popleft() for _ in range(n)]
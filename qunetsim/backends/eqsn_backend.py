@@ -1,9 +1,11 @@
 from eqsn import EQSN
-import uuid
-from qunetsim.objects.qubit import Qubit
+from qunetsim.backends.epr_store import EPRStore
+from qunetsim.objects.bell_pair import BellPair
+from qunetsim.objects.qubit import Qubit, SINGLE_QUBIT_GATES
+from qunetsim.utils.handles import new_handle
 import threading
+import weakref
 import numpy as np
-from queue import Queue
 
 
 # From O'Reilly Python Cookbook by David Ascher, Alex Martelli
@@ -77,11 +79,40 @@ class SafeDict(object):
         return ret
 
 
+def _reduced_density_operator(statevector, num_qubits, indices):
+    """
+    Calculates the reduced density operator of some qubits of a pure state by
+    contracting the statevector with itself over the axes of the other qubits.
+
+    Args:
+        statevector (np.ndarray): The statevector, the first qubit being the most
+                                  significant one.
+        num_qubits (int): The amount of qubits of the statevector.
+        indices (list): The positions of the qubits to keep.
+    Returns:
+        (np.ndarray): The reduced density operator of the qubits, in the order of
+        *indices*.
+    """
+    state = np.asarray(statevector).reshape([2] * num_qubits)
+    state = np.moveaxis(state, indices, list(range(len(indices))))
+    state = state.reshape(2 ** len(indices), -1)
+    return np.tensordot(state, state.conj(), axes=(1, 1))
+
+
 class EQSNBackend(object):
     """
     Definition of how a backend has to look and behave like.
     """
 
+    # EQSN.get_instance is not thread safe, backends can be created concurrently
+    # by simulations running side by side.
+    _eqsn_lock = threading.Lock()
+    # The simulator is shared by all backends, and only stopped when none of
+    # them uses it anymore. The backends which are not isolated are one user,
+    # since they share their hosts and EPR pairs.
+    _isolated_users = weakref.WeakSet()
+    _default_in_use = False
+
     class Hosts(SafeDict):
         # There only should be one instance of Hosts
         __instance = None
@@ -99,7 +130,7 @@ class EQSNBackend(object):
             EQSNBackend.Hosts.__instance = self
             SafeDict.__init__(self)
 
-    class EntanglementIDs(SafeDict):
+    class EntanglementIDs(EPRStore):
         # There only should be one instance of Hosts
         __instance = None
 
@@ -114,13 +145,81 @@ class EQSNBackend(object):
             if EQSNBackend.EntanglementIDs.__instance is not None:
                 raise Exception("Call get instance to get this class!")
             EQSNBackend.EntanglementIDs.__instance = self
-            SafeDict.__init__(self)
+            EPRStore.__init__(self)
 
-    def __init__(self):
-        self._hosts = EQSNBackend.Hosts.get_instance()
-        # keys are from : to, where from is the host calling create EPR
-        self._entaglement_qubits = EQSNBackend.EntanglementIDs.get_instance()
-        self.eqsn = EQSN.get_instance()
+    def __init__(self, isolated=False, analytic_epr=False, werner=1.0):
+        """
+        Args:
+            isolated (bool): If the backend should use its own host and
+                             entanglement registries instead of the ones shared by
+                             all EQSN backends, e.g. for a simulation running next
+                             to others in the same process.
+            analytic_epr (bool): If EPR pairs should be created as Bell pairs,
+                                 which measurements and teleportations handle
+                                 in closed form without the simulator.
+            werner (float): The Werner parameter of the Bell pairs. With
+                            probability 1 - *werner*, a new pair is in a
+                            uniformly random Bell state instead.
+        """
+        self._isolated = isolated
+        self._analytic_epr = analytic_epr
+        self.werner = werner
+        if isolated:
+            self._hosts = SafeDict()
+            self._entaglement_qubits = EPRStore()
+        else:
+            self._hosts = EQSNBackend.Hosts.get_instance()
+            # keys are (from, to), where from is the host calling create EPR
+            self._entaglement_qubits = EQSNBackend.EntanglementIDs.get_instance()
+        with EQSNBackend._eqsn_lock:
+            self.eqsn = EQSN.get_instance()
+            if isolated:
+                EQSNBackend._isolated_users.add(self)
+            else:
+                EQSNBackend._default_in_use = True
+
+    @property
+    def analytic_epr(self):
+        """
+        Get if EPR pairs are created as Bell pairs, which are only stored in the
+        simulator when a gate other than a Pauli gate is applied to them.
+
+        Returns:
+            (bool): If EPR pairs are created as Bell pairs.
+        """
+        return self._analytic_epr
+
+    @analytic_epr.setter
+    def analytic_epr(self, analytic_epr):
+        """
+        Set if EPR pairs are created as Bell pairs.
+
+        Args:
+            analytic_epr (bool): If EPR pairs are created as Bell pairs.
+        """
+        self._analytic_epr = analytic_epr
+
+    @property
+    def werner(self):
+        """
+        Get the Werner parameter of the Bell pairs created with analytic_epr.
+
+        Returns:
+            (float): The Werner parameter of new Bell pairs.
+        """
+        return self._werner
+
+    @werner.setter
+    def werner(self, werner):
+        """
+        Set the Werner parameter of the Bell pairs created with analytic_epr.
+
+        Args:
+            werner (float): The Werner parameter of new Bell pairs.
+        """
+        if not 0 <= werner <= 1:
+            raise ValueError('werner should be between 0 and 1')
+        self._werner = werner
 
     def start(self, **kwargs):
         """
@@ -131,9 +230,17 @@ class EQSNBackend(object):
 
     def stop(self):
         """
-        Stops Backends which are running in an own thread or process.
+        Stops Backends which are running in an own thread or process. The
+        simulator is shared with the other backends, and keeps running until
+        the last of them is stopped.
         """
-        self.eqsn.stop_all()
+        with EQSNBackend._eqsn_lock:
+            if self._isolated:
+                EQSNBackend._isolated_users.discard(self)
+            else:
+                EQSNBackend._default_in_use = False
+            if not EQSNBackend._default_in_use and not EQSNBackend._isolated_users:
+                self.eqsn.stop_all()
 
     def add_host(self, host):
         """
@@ -154,7 +261,7 @@ class EQSNBackend(object):
         Returns:
             Qubit of backend type.
         """
-        id = str(uuid.uuid4())
+        id = new_handle()
         self.eqsn.new_qubit(id)
         return id
 
@@ -183,10 +290,15 @@ class EQSNBackend(object):
             Returns a qubit. The qubit belongs to host a. To get the second
             qubit of host b, the receive_epr function has to be called.
         """
-        uid1 = uuid.uuid4()
-        uid2 = uuid.uuid4()
         host_a = self._hosts.get_from_dict(host_a_id)
         host_b = self._hosts.get_from_dict(host_b_id)
+        if self._analytic_epr:
+            q1, q2 = BellPair.create(host_a, host_b, q_id=q_id, block=block,
+                                     werner=self._werner)
+            self.store_ent_pair(host_a.host_id, host_b.host_id, q2)
+            return q1
+        uid1 = new_handle()
+        uid2 = new_handle()
         self.eqsn.new_qubit(uid1)
         self.eqsn.new_qubit(uid2)
         self.eqsn.H_gate(uid1)
@@ -197,15 +309,7 @@ class EQSNBackend(object):
         return q1
 
     def store_ent_pair(self, host_a, host_b, qubit):
-        key = host_a + ':' + host_b
-        ent_queue = self._entaglement_qubits.get_from_dict(key)
-
-        if ent_queue is not None:
-            ent_queue.put(qubit)
-        else:
-            ent_queue = Queue()
-            ent_queue.put(qubit)
-        self._entaglement_qubits.add_to_dict(key, ent_queue)
+        self._entaglement_qubits.put(host_a, host_b, qubit)
 
     def receive_epr(self, host_id, sender_id, q_id=None, block=False):
         """
@@ -219,16 +323,26 @@ class EQSNBackend(object):
         Returns:
             Returns an EPR qubit with the other Host.
         """
-        key = sender_id + ':' + host_id
-        ent_queue = self._entaglement_qubits.get_from_dict(key)
-        if ent_queue is None:
-            raise Exception("Internal Error!")
-        q = ent_queue.get()
-        self._entaglement_qubits.add_to_dict(key, ent_queue)
+        q = self._entaglement_qubits.get(sender_id, host_id)
         if q_id is not None and q_id != q.id:
             raise ValueError("Qid doesent match id!")
         return q
 
+    def receive_eprs(self, host_id, sender_id, n, block=False):
+        """
+        Receives the qubits of the next *n* EPR pairs the sender created with
+        the host at once.
+
+        Args:
+            host_id (str): ID of the host who receives the EPR qubits.
+            sender_id (str): ID of the sender of the EPR pairs.
+            n (int): The amount of EPR qubits.
+            block (bool): Determines if the created pairs should be blocked or not.
+        Returns:
+            (list): The EPR qubits, in the order the pairs were created.
+        """
+        return self._entaglement_qubits.get_many(sender_id, host_id, n)
+
     ##########################
     #   Gate definitions    #
     #########################
@@ -399,30 +513,73 @@ class EQSNBackend(object):
         """
         self.eqsn.custom_two_qubit_gate(qubit1.qubit, qubit2.qubit, gate)
 
+    def run_circuit(self, ops):
+        """
+        Applies a list of gates. Consecutive single qubit gates on a qubit are
+        multiplied into one matrix and sent to EQSN as one gate, they are only
+        sent when the qubit is used by a gate on multiple qubits or at the end
+        of the circuit.
+
+        Args:
+            ops (list): The operations, tuples of the name of a gate method and
+                        its arguments, e.g. ('cnot', control, target).
+        """
+        # qubit id -> product of its pending single qubit gates
+        pending = {}
+        for op in ops:
+            name, qubit, args = op[0], op[1], op[2:]
+            if name in SINGLE_QUBIT_GATES:
+                gate = SINGLE_QUBIT_GATES[name](*args)
+                if qubit.qubit in pending:
+                    gate = np.dot(gate, pending[qubit.qubit])
+                pending[qubit.qubit] = gate
+                continue
+            for q in [qubit] + [a for a in args if isinstance(a, Qubit)]:
+                if q.qubit in pending:
+                    self.eqsn.custom_gate(q.qubit, pending.pop(q.qubit))
+            getattr(self, name)(qubit, *args)
+        for q_id, gate in pending.items():
+            self.eqsn.custom_gate(q_id, gate)
+
     def density_operator(self, qubit):
         """
         Returns the density operator of this qubit. If the qubit is entangled,
         the density operator will be in a mixed state.
 
         Args:
-            qubit (Qubit): Qubit of the density operator.
+            qubit (Qubit or list): Qubit of the density operator, or a list of
+                                   qubits of the same entangled system for their
+                                   joint density operator.
 
         Returns:
             np.ndarray: The density operator of the qubit.
         """
-        qubits, statevector = self.eqsn.give_statevector_for(qubit.qubit)
-        index = qubits.index(qubit.qubit)
-        density_operator = np.outer(statevector, statevector)
-        before = 2**index
-        if before > 0:
-            other = 2**(len(qubits) - index)
-            density_operator = density_operator.reshape([before, other, before, other])
-            density_operator = np.trace(density_operator, axis1=0, axis2=2)
-        after = 2**(len(qubits) - index - 1)
-        if after > 0:
-            density_operator = density_operator.reshape([2, after, 2, after])
-            density_operator = np.trace(density_operator, axis1=1, axis2=3)
-        return density_operator
+        qubits = qubit if isinstance(qubit, list) else [qubit]
+        ids, statevector = self.eqsn.give_statevector_for(qubits[0].qubit)
+        return _reduced_density_operator(statevector, len(ids),
+                                         [ids.index(q.qubit) for q in qubits])
+
+    def density_operators(self, qubits):
+        """
+        Returns the density operators of many qubits. The statevector of each
+        entangled system is only fetched once.
+
+        Args:
+            qubits (list): The qubits of the density operators.
+
+        Returns:
+            (list): The density operator of each qubit.
+        """
+        density_operators = [None] * len(qubits)
+        for i, qubit in enumerate(qubits):
+            if density_operators[i] is not None:
+                continue
+            ids, statevector = self.eqsn.give_statevector_for(qubit.qubit)
+            for j in range(i, len(qubits)):
+                if density_operators[j] is None and qubits[j].qubit in ids:
+                    density_operators[j] = _reduced_density_operator(
+                        statevector, len(ids), [ids.index(qubits[j].qubit)])
+        return density_operators
 
     def statevector(self, qubit):
         """
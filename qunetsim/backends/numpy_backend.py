@@ -0,0 +1,526 @@
+from .safe_dict import SafeDict
+from .epr_store import EPRStore
+from qunetsim.objects.qubit import Qubit
+import numpy as np
+import threading
+
+
+class NumpyBackend(object):
+    """
+    A state vector backend which only depends on NumPy.
+
+    Each group of entangled qubits is stored as its own state tensor with one
+    axis per qubit. Gates are applied by contracting the gate with the axes of
+    the qubits they act on, groups are merged when a gate acts on qubits of
+    different groups and a measured qubit is split out of its group again. The
+    memory needed therefore grows with the largest group of entangled qubits
+    instead of with all qubits of the network.
+    """
+
+    # Groups can be changed by the backends of several hosts at once.
+    _lock = threading.RLock()
+
+    class EntanglementGroup(object):
+        """
+        The state of a group of entangled qubits.
+        """
+
+        def __init__(self, qubit):
+            # qubit i of the group belongs to axis i of the state tensor
+            self.qubits = [qubit]
+            self.state = np.array([1, 0], dtype=np.complex128)
+            qubit.group = self
+
+        def axis(self, qubit):
+            return self.qubits.index(qubit)
+
+        def merge(self, other):
+            """
+            Adds the qubits of the group *other* to this group.
+            """
+            if other is self:
+                return
+            self.state = np.tensordot(self.state, other.state, axes=0)
+            self.qubits = self.qubits + other.qubits
+            for qubit in other.qubits:
+                qubit.group = self
+
+        def apply(self, gate, qubits):
+            """
+            Applies the unitary *gate* to the *qubits*, the first qubit is the
+            most significant one of the gate.
+            """
+            k = len(qubits)
+            axes = [self.axis(q) for q in qubits]
+            gate = np.asarray(gate, dtype=np.complex128).reshape([2] * (2 * k))
+            state = np.tensordot(gate, self.state, axes=(list(range(k, 2 * k)), axes))
+            self.state = np.moveaxis(state, list(range(k)), axes)
+
+        def measure(self, qubit):
+            """
+            Measures *qubit* in the computational basis and splits it out of the
+            group.
+
+            Returns:
+                (int): The measurement outcome.
+            """
+            axis = self.axis(qubit)
+            state = np.moveaxis(self.state, axis, 0)
+            pr_1 = np.sum(np.abs(state[1]) ** 2)
+            outcome = int(np.random.random() < pr_1)
+            rest = state[outcome]
+            rest = rest / np.sqrt(pr_1 if outcome == 1 else 1 - pr_1)
+
+            del self.qubits[axis]
+            self.state = rest
+            NumpyBackend.EntanglementGroup(qubit)
+            if outcome == 1:
+                qubit.group.state = np.array([0, 1], dtype=np.complex128)
+            return outcome
+
+        def reduced_density_matrix(self, qubits):
+            axes = [self.axis(q) for q in qubits]
+            state = np.moveaxis(self.state, axes, list(range(len(axes))))
+            state = state.reshape(2 ** len(axes), -1)
+            return np.tensordot(state, state.conj(), axes=(1, 1))
+
+        def statevector(self):
+            return self.state.reshape(-1)
+
+    class QubitReference(object):
+        """
+        The backend information stored in the *Qubit* objects.
+        """
+        __slots__ = ['group']
+
+        def __init__(self):
+            self.group = None
+
+    class Hosts(SafeDict):
+        # There only should be one instance of Hosts
+        __instance = None
+
+        @staticmethod
+        def get_instance():
+            if NumpyBackend.Hosts.__instance is not None:
+                return NumpyBackend.Hosts.__instance
+            else:
+                return NumpyBackend.Hosts()
+
+        def __init__(self):
+            if NumpyBackend.Hosts.__instance is not None:
+                raise Exception("Call get instance to get this class!")
+            NumpyBackend.Hosts.__instance = self
+            SafeDict.__init__(self)
+
+    class EntanglementIDs(EPRStore):
+        # There only should be one instance of Hosts
+        __instance = None
+
+        @staticmethod
+        def get_instance():
+            if NumpyBackend.EntanglementIDs.__instance is not None:
+                return NumpyBackend.EntanglementIDs.__instance
+            else:
+                return NumpyBackend.EntanglementIDs()
+
+        def __init__(self):
+            if NumpyBackend.EntanglementIDs.__instance is not None:
+                raise Exception("Call get instance to get this class!")
+            NumpyBackend.EntanglementIDs.__instance = self
+            EPRStore.__init__(self)
+
+    def __init__(self, isolated=False):
+        """
+        Args:
+            isolated (bool): If the backend should use its own host and
+                             entanglement registries instead of the ones shared by
+                             all NumPy backends.
+        """
+        if isolated:
+            self._hosts = SafeDict()
+            self._entaglement_qubits = EPRStore()
+        else:
+            self._hosts = NumpyBackend.Hosts.get_instance()
+            # keys are (from, to), where from is the host calling create EPR
+            self._entaglement_qubits = NumpyBackend.EntanglementIDs.get_instance()
+
+    def start(self, **kwargs):
+        """
+        Starts Backends which have to run in an own thread or process before they
+        can be used.
+        """
+        pass
+
+    def stop(self):
+        """
+        Stops Backends which are running in an own thread or process.
+        """
+        pass
+
+    def add_host(self, host):
+        """
+        Adds a host to the backend.
+
+        Args:
+            host (Host): New Host which should be added.
+        """
+        self._hosts.add_to_dict(host.host_id, host)
+
+    def create_qubit(self, host_id):
+        """
+        Creates a new Qubit of the type of the backend.
+
+        Args:
+            host_id (str): Id of the host to whom the qubit belongs.
+
+        Returns:
+            Qubit of backend type.
+        """
+        qubit = NumpyBackend.QubitReference()
+        NumpyBackend.EntanglementGroup(qubit)
+        return qubit
+
+    def send_qubit_to(self, qubit, from_host_id, to_host_id):
+        """
+        Sends a qubit to a new host.
+
+        Args:
+            qubit (Qubit): Qubit to be send.
+            from_host_id (str): From the starting host.
+            to_host_id (str): New host of the qubit.
+        """
+        new_host = self._hosts.get_from_dict(to_host_id)
+        qubit.host = new_host
+
+    def create_EPR(self, host_a_id, host_b_id, q_id=None, block=False):
+        """
+        Creates an EPR pair for two qubits and returns one of the qubits.
+
+        Args:
+            host_a_id (str): ID of the first host who gets the EPR state.
+            host_b_id (str): ID of the second host who gets the EPR state.
+            q_id (str): Optional id which both qubits should have.
+            block (bool): Determines if the created pair should be blocked or not.
+        Returns:
+            Returns a qubit. The qubit belongs to host a. To get the second
+            qubit of host b, the receive_epr function has to be called.
+        """
+        host_a = self._hosts.get_from_dict(host_a_id)
+        host_b = self._hosts.get_from_dict(host_b_id)
+        qubit1 = NumpyBackend.QubitReference()
+        qubit2 = NumpyBackend.QubitReference()
+        group = NumpyBackend.EntanglementGroup(qubit1)
+        group.qubits.append(qubit2)
+        qubit2.group = group
+        group.state = np.array([[1, 0], [0, 1]], dtype=np.complex128) / np.sqrt(2)
+        q1 = Qubit(host_a, qubit=qubit1, q_id=q_id, blocked=block)
+        q2 = Qubit(host_b, qubit=qubit2, q_id=q1.id, blocked=block)
+        self.store_ent_pair(host_a.host_id, host_b.host_id, q2)
+        return q1
+
+    def store_ent_pair(self, host_a, host_b, qubit):
+        self._entaglement_qubits.put(host_a, host_b, qubit)
+
+    def receive_epr(self, host_id, sender_id, q_id=None, block=False):
+        """
+        Called after create EPR in the receiver, to receive the other EPR pair.
+
+        Args:
+            host_id (str): ID of the first host who gets the EPR state.
+            sender_id (str): ID of the sender of the EPR pair.
+            q_id (str): Optional id which both qubits should have.
+            block (bool): Determines if the created pair should be blocked or not.
+        Returns:
+            Returns an EPR qubit with the other Host.
+        """
+        q = self._entaglement_qubits.get(sender_id, host_id)
+        if q_id is not None and q_id != q.id:
+            raise ValueError("Qid doesent match id!")
+        return q
+
+    def receive_eprs(self, host_id, sender_id, n, block=False):
+        """
+        Receives the qubits of the next *n* EPR pairs the sender created with
+        the host at once.
+
+        Args:
+            host_id (str): ID of the host who receives the EPR qubits.
+            sender_id (str): ID of the sender of the EPR pairs.
+            n (int): The amount of EPR qubits.
+            block (bool): Determines if the created pairs should be blocked or not.
+        Returns:
+            (list): The EPR qubits, in the order the pairs were created.
+        """
+        return self._entaglement_qubits.get_many(sender_id, host_id, n)
+
+    def _apply(self, gate, *qubits):
+        """
+        Applies *gate* to the *qubits* and merges their groups if necessary.
+        """
+        references = [q.qubit for q in qubits]
+        with NumpyBackend._lock:
+            group = references[0].group
+            for reference in references[1:]:
+                group.merge(reference.group)
+            group.apply(gate, references)
+
+    ##########################
+    #   Gate definitions    #
+    #########################
+
+    def I(self, qubit):
+        """
+        Perform Identity gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        pass
+
+    def X(self, qubit):
+        """
+        Perform pauli X gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[0, 1], [1, 0]]), qubit)
+
+    def Y(self, qubit):
+        """
+        Perform pauli Y gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[0, -1j], [1j, 0]]), qubit)
+
+    def Z(self, qubit):
+        """
+        Perform pauli Z gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[1, 0], [0, -1]]), qubit)
+
+    def H(self, qubit):
+        """
+        Perform Hadamard gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[1, 1], [1, -1]]) / np.sqrt(2), qubit)
+
+    def K(self, qubit):
+        """
+        Perform K gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(0.5 * np.array([[1 + 1j, 1 - 1j], [-1 + 1j, -1 - 1j]]), qubit)
+
+    def S(self, qubit):
+        """
+        Perform S gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[1, 0], [0, 1j]]), qubit)
+
+    def T(self, qubit):
+        """
+        Perform T gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]]), qubit)
+
+    def rx(self, qubit, phi):
+        """
+        Perform a rotation pauli x gate with an angle of phi.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+            phi (float): Amount of rotation in Rad.
+        """
+        cos, sin = np.cos(phi / 2), np.sin(phi / 2)
+        self._apply(np.array([[cos, -1j * sin], [-1j * sin, cos]]), qubit)
+
+    def ry(self, qubit, phi):
+        """
+        Perform a rotation pauli y gate with an angle of phi.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+            phi (float): Amount of rotation in Rad.
+        """
+        cos, sin = np.cos(phi / 2), np.sin(phi / 2)
+        self._apply(np.array([[cos, -sin], [sin, cos]]), qubit)
+
+    def rz(self, qubit, phi):
+        """
+        Perform a rotation pauli z gate with an angle of phi.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+            phi (float): Amount of rotation in Rad.
+        """
+        self._apply(np.diag([np.exp(-0.5j * phi), np.exp(0.5j * phi)]), qubit)
+
+    def cnot(self, qubit, target):
+        """
+        Applies a controlled x gate to the target qubit.
+
+        Args:
+            qubit (Qubit): Qubit to control cnot.
+            target (Qubit): Qubit on which the cnot gate should be applied.
+        """
+        self.custom_controlled_gate(qubit, target, np.array([[0, 1], [1, 0]]))
+
+    def cphase(self, qubit, target):
+        """
+        Applies a controlled z gate to the target qubit.
+
+        Args:
+            qubit (Qubit): Qubit to control cphase.
+            target (Qubit): Qubit on which the cphase gate should be applied.
+        """
+        self._apply(np.diag([1, 1, 1, -1]), qubit, target)
+
+    def custom_gate(self, qubit, gate):
+        """
+        Applies a custom gate to the qubit.
+
+        Args:
+            qubit(Qubit): Qubit to which the gate is applied.
+            gate(np.ndarray): 2x2 array of the gate.
+        """
+        self._apply(gate, qubit)
+
+    def custom_controlled_gate(self, qubit, target, gate):
+        """
+        Applies a custom gate to the target qubit, controlled by the qubit.
+
+        Args:
+            qubit(Qubit): Qubit to control the gate.
+            target(Qubit): Qubit on which the gate is applied.
+            gate(nd.array): 2x2 array for the gate applied to target.
+        """
+        controlled = np.eye(4, dtype=np.complex128)
+        controlled[2:, 2:] = gate
+        self._apply(controlled, qubit, target)
+
+    def custom_controlled_two_qubit_gate(self, qubit, target_1, target_2, gate):
+        """
+        Applies a custom gate to the target qubit, controlled by the qubit.
+
+        Args:
+            qubit (Qubit): Qubit to control the gate.
+            target_1 (Qubit): Qubit on which the gate is applied.
+            target_2 (Qubit): Qubit on which the gate is applied.
+            gate (nd.array): 4x4 array for the gate applied to target.
+        """
+        controlled = np.eye(8, dtype=np.complex128)
+        controlled[4:, 4:] = gate
+        self._apply(controlled, qubit, target_1, target_2)
+
+    def custom_two_qubit_gate(self, qubit1, qubit2, gate):
+        """
+        Applies a custom two qubit gate to qubit1 \\otimes qubit2.
+
+        Args:
+            qubit1(Qubit): First qubit of the gate.
+            qubit2(Qubit): Second qubit of the gate.
+            gate(np.ndarray): 4x4 array for the gate applied.
+        """
+        self._apply(gate, qubit1, qubit2)
+
+    def run_circuit(self, ops):
+        """
+        Applies a list of gates while holding the lock of the backend once.
+
+        Args:
+            ops (list): The operations, tuples of the name of a gate method and
+                        its arguments, e.g. ('cnot', control, target).
+        """
+        with NumpyBackend._lock:
+            for op in ops:
+                getattr(self, op[0])(*op[1:])
+
+    def density_operator(self, qubit):
+        """
+        Returns the density operator of this qubit. If the qubit is entangled,
+        the density operator will be in a mixed state.
+
+        Args:
+            qubit (Qubit or list): Qubit of the density operator, or a list of
+                                   qubits of the same entangled group for their
+                                   joint density operator.
+
+        Returns:
+            np.ndarray: The density operator of the qubit.
+        """
+        qubits = qubit if isinstance(qubit, list) else [qubit]
+        with NumpyBackend._lock:
+            return qubits[0].qubit.group.reduced_density_matrix([q.qubit for q in qubits])
+
+    def density_operators(self, qubits):
+        """
+        Returns the density operators of many qubits.
+
+        Args:
+            qubits (list): The qubits of the density operators.
+
+        Returns:
+            (list): The density operator of each qubit.
+        """
+        with NumpyBackend._lock:
+            return [q.qubit.group.reduced_density_matrix([q.qubit]) for q in qubits]
+
+    def statevector(self, qubit):
+        """
+        Returns the statevector of the passed qubit. If the qubit is entangled to others,
+        the statevector of the whole entangled system is returned
+
+        Args:
+            qubit (Qubit): Qubit of the statevector.
+
+        Returns:
+            (tuple): The backend references of the qubits of the system, the first
+            one being the most significant, and the statevector of the system.
+        """
+        with NumpyBackend._lock:
+            group = qubit.qubit.group
+            return list(group.qubits), group.statevector().copy()
+
+    def measure(self, qubit, non_destructive):
+        """
+        Perform a measurement on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit which should be measured.
+            non_destructive (bool): If the qubit should be destroyed after measuring.
+
+        Returns:
+            The value which has been measured.
+        """
+        with NumpyBackend._lock:
+            outcome = qubit.qubit.group.measure(qubit.qubit)
+            if not non_destructive:
+                qubit.qubit.group = None
+            return outcome
+
+    def release(self, qubit):
+        """
+        Releases the qubit.
+
+        Args:
+            qubit (Qubit): The qubit which should be released.
+        """
+        self.measure(qubit, False)
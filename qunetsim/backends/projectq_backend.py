@@ -1,8 +1,9 @@
-import time
+import threading
 
 from qunetsim.backends.safe_dict import SafeDict
+from qunetsim.backends.epr_store import EPRStore
+from qunetsim.objects.bell_pair import BellPair
 from qunetsim.objects.qubit import Qubit
-from queue import Queue
 
 try:
     import projectq
@@ -13,16 +14,122 @@ except ImportError:
 
 
 class ProjectQBackend(object):
-    def __init__(self):
-        self._hosts = ProjectQBackend.Hosts.get_instance()
-        self._entaglement_pairs = ProjectQBackend.EntanglementPairs.get_instance()
+    def __init__(self, isolated=False, deferred_flush=False, analytic_epr=False,
+                 werner=1.0):
+        """
+        Args:
+            isolated (bool): If the backend should use its own host and
+                             entanglement registries instead of the ones shared by
+                             all ProjectQ backends.
+            deferred_flush (bool): If released qubits should only be deallocated
+                                   with the next flush of the engine instead of
+                                   flushing the engine for every released qubit.
+                                   Only releases are deferred: gates are buffered
+                                   by the engine anyway, and measurements need
+                                   their result right away.
+            analytic_epr (bool): If EPR pairs should be created as Bell pairs,
+                                 which measurements and teleportations handle
+                                 in closed form without the simulator.
+            werner (float): The Werner parameter of the Bell pairs. With
+                            probability 1 - *werner*, a new pair is in a
+                            uniformly random Bell state instead.
+        """
+        if isolated:
+            self._hosts = SafeDict()
+            self._entaglement_pairs = EPRStore()
+        else:
+            self._hosts = ProjectQBackend.Hosts.get_instance()
+            self._entaglement_pairs = ProjectQBackend.EntanglementPairs.get_instance()
         self.engine = projectq.MainEngine()
-        self.measuring = False
+        self._deferred_flush = deferred_flush
+        self._analytic_epr = analytic_epr
+        self.werner = werner
+        # The engine is not thread safe, all access to it is serialized.
+        self._lock = threading.RLock()
 
     def __del__(self):
         self.engine.flush(deallocate_qubits=True)
 
-    class EntanglementPairs(SafeDict):
+    @property
+    def deferred_flush(self):
+        """
+        Get if released qubits are only deallocated with the next flush. This
+        only applies to releases, including the release after a destructive
+        measurement.
+
+        Returns:
+            (bool): If the flush of the engine is deferred.
+        """
+        return self._deferred_flush
+
+    @deferred_flush.setter
+    def deferred_flush(self, deferred_flush):
+        """
+        Set if released qubits are only deallocated with the next flush. Pending
+        operations are flushed when the deferred mode is turned off.
+
+        Args:
+            deferred_flush (bool): If the flush of the engine is deferred.
+        """
+        self._deferred_flush = deferred_flush
+        if not deferred_flush:
+            self.flush()
+
+    @property
+    def analytic_epr(self):
+        """
+        Get if EPR pairs are created as Bell pairs, which are only stored in the
+        simulator when a gate other than a Pauli gate is applied to them.
+
+        Returns:
+            (bool): If EPR pairs are created as Bell pairs.
+        """
+        return self._analytic_epr
+
+    @analytic_epr.setter
+    def analytic_epr(self, analytic_epr):
+        """
+        Set if EPR pairs are created as Bell pairs.
+
+        Args:
+            analytic_epr (bool): If EPR pairs are created as Bell pairs.
+        """
+        self._analytic_epr = analytic_epr
+
+    @property
+    def werner(self):
+        """
+        Get the Werner parameter of the Bell pairs created with analytic_epr.
+
+        Returns:
+            (float): The Werner parameter of new Bell pairs.
+        """
+        return self._werner
+
+    @werner.setter
+    def werner(self, werner):
+        """
+        Set the Werner parameter of the Bell pairs created with analytic_epr.
+
+        Args:
+            werner (float): The Werner parameter of new Bell pairs.
+        """
+        if not 0 <= werner <= 1:
+            raise ValueError('werner should be between 0 and 1')
+        self._werner = werner
+
+    def flush(self):
+        """
+        Sends all pending operations of all hosts through the engine at once.
+        """
+        with self._lock:
+            self.engine.flush()
+
+    def _apply(self, gate, qubits):
+        with self._lock:
+            gate | qubits
+
+    class EntanglementPairs(EPRStore):
         # There only should be one instance of Hosts
         __instance = None
 
@@ -37,7 +144,7 @@ class ProjectQBackend(object):
             if ProjectQBackend.EntanglementPairs.__instance is not None:
                 raise Exception("Call get instance to get this class!")
             ProjectQBackend.EntanglementPairs.__instance = self
-            SafeDict.__init__(self)
+            EPRStore.__init__(self)
 
     class Hosts(SafeDict):
         # There only should be one instance of Hosts
@@ -67,8 +174,8 @@ class ProjectQBackend(object):
         """
         Stops Backends which are running in an own thread or process.
         """
-        self.engine.flush(deallocate_qubits=True)
-        pass
+        with self._lock:
+            self.engine.flush(deallocate_qubits=True)
 
     def add_host(self, host):
         """
@@ -89,7 +196,8 @@ class ProjectQBackend(object):
         Returns:
             Qubit of backend type.
         """
-        return self.engine.allocate_qubit()
+        with self._lock:
+            return self.engine.allocate_qubit()
 
     def send_qubit_to(self, qubit, from_host_id, to_host_id):
         """
@@ -115,29 +223,28 @@ class ProjectQBackend(object):
             Returns a qubit. The qubit belongs to host a. To get the second
             qubit of host b, the receive_epr function has to be called.
         """
+        host_a = self._hosts.get_from_dict(host_a_id)
+        host_b = self._hosts.get_from_dict(host_b_id)
+        if self._analytic_epr:
+            qubit, qubit_b = BellPair.create(host_a, host_b, q_id=q_id, block=block,
+                                             werner=self._werner)
+            self.store_ent_pair(host_a.host_id, host_b.host_id, qubit_b)
+            return qubit
+
         q1 = self.create_qubit(host_a_id)
         q2 = self.create_qubit(host_b_id)
 
-        projectq.ops.H | q1
-        projectq.ops.CNOT | (q1, q2)
+        with self._lock:
+            projectq.ops.H | q1
+            projectq.ops.CNOT | (q1, q2)
 
-        host_a = self._hosts.get_from_dict(host_a_id)
-        host_b = self._hosts.get_from_dict(host_b_id)
         qubit_b = Qubit(host_b, qubit=q2, q_id=q_id, blocked=block)
         qubit = Qubit(host_a, qubit=q1, q_id=q_id, blocked=block)
         self.store_ent_pair(host_a.host_id, host_b.host_id, qubit_b)
         return qubit
 
     def store_ent_pair(self, host_a, host_b, qubit):
-        key = host_a + ':' + host_b
-        ent_queue = self._entaglement_pairs.get_from_dict(key)
-
-        if ent_queue is not None:
-            ent_queue.put(qubit)
-        else:
-            ent_queue = Queue()
-            ent_queue.put(qubit)
-        self._entaglement_pairs.add_to_dict(key, ent_queue)
+        self._entaglement_pairs.put(host_a, host_b, qubit)
 
     def receive_epr(self, host_id, sender_id, q_id=None, block=False):
         """
@@ -151,15 +258,26 @@ class ProjectQBackend(object):
         Returns:
             Returns an EPR qubit with the other Host.
         """
-        key = sender_id + ':' + host_id
-        ent_queue = self._entaglement_pairs.get_from_dict(key)
-        if ent_queue is None:
-            raise Exception("Internal Error!")
-        qubit = ent_queue.get()
+        qubit = self._entaglement_pairs.get(sender_id, host_id)
         if q_id is not None and q_id != qubit.id:
             raise ValueError("Qid doesn't match id!")
         return qubit
 
+    def receive_eprs(self, host_id, sender_id, n, block=False):
+        """
+        Receives the qubits of the next *n* EPR pairs the sender created with
+        the host at once.
+
+        Args:
+            host_id (str): ID of the host who receives the EPR qubits.
+            sender_id (str): ID of the sender of the EPR pairs.
+            n (int): The amount of EPR qubits.
+            block (bool): Determines if the created pairs should be blocked or not.
+        Returns:
+            (list): The EPR qubits, in the order the pairs were created.
+        """
+        return self._entaglement_pairs.get_many(sender_id, host_id, n)
+
     ##########################
     #   Gate definitions    #
     #########################
@@ -180,7 +298,7 @@ class ProjectQBackend(object):
         Args:
             qubit (Qubit): Qubit on which gate should be applied to.
         """
-        projectq.ops.X | qubit.qubit
+        self._apply(projectq.ops.X, qubit.qubit)
 
     def Y(self, qubit):
         """
@@ -189,7 +307,7 @@ class ProjectQBackend(object):
         Args:
             qubit (Qubit): Qubit on which gate should be applied to.
         """
-        projectq.ops.Y | qubit.qubit
+        self._apply(projectq.ops.Y, qubit.qubit)
 
     def Z(self, qubit):
         """
@@ -198,7 +316,7 @@ class ProjectQBackend(object):
         Args:
             qubit (Qubit): Qubit on which gate should be applied to.
         """
-        projectq.ops.Z | qubit.qubit
+        self._apply(projectq.ops.Z, qubit.qubit)
 
     def H(self, qubit):
         """
@@ -207,7 +325,7 @@ class ProjectQBackend(object):
         Args:
             qubit (Qubit): Qubit on which gate should be applied to.
         """
-        projectq.ops.H | qubit.qubit
+        self._apply(projectq.ops.H, qubit.qubit)
 
     def T(self, qubit):
         """
@@ -216,7 +334,7 @@ class ProjectQBackend(object):
         Args:
             qubit (Qubit): Qubit on which gate should be applied to.
         """
-        projectq.ops.T | qubit.qubit
+        self._apply(projectq.ops.T, qubit.qubit)
 
     def K(self, qubit):
         """
@@ -225,10 +343,11 @@ class ProjectQBackend(object):
         Args:
             qubit (Qubit): Qubit on which gate should be applied to.
         """
-        projectq.ops.H | qubit.qubit
-        projectq.ops.S | qubit.qubit
-        projectq.ops.H | qubit.qubit
-        projectq.ops.Z | qubit.qubit
+        with self._lock:
+            projectq.ops.H | qubit.qubit
+            projectq.ops.S | qubit.qubit
+            projectq.ops.H | qubit.qubit
+            projectq.ops.Z | qubit.qubit
 
     def rx(self, qubit, phi):
         """
@@ -238,7 +357,7 @@ class ProjectQBackend(object):
             qubit (Qubit): Qubit on which gate should be applied to.
             phi (float): Amount of roation in Rad.
         """
-        projectq.ops.Rx(phi) | qubit.qubit
+        self._apply(projectq.ops.Rx(phi), qubit.qubit)
 
     def ry(self, qubit, phi):
         """
@@ -248,7 +367,7 @@ class ProjectQBackend(object):
             qubit (Qubit): Qubit on which gate should be applied to.
             phi (float): Amount of roation in Rad.
         """
-        projectq.ops.Ry(phi) | qubit.qubit
+        self._apply(projectq.ops.Ry(phi), qubit.qubit)
 
     def rz(self, qubit, phi):
         """
@@ -258,7 +377,7 @@ class ProjectQBackend(object):
             qubit (Qubit): Qubit on which gate should be applied to.
             phi (float): Amount of roation in Rad.
         """
-        projectq.ops.Rz(phi) | qubit.qubit
+        self._apply(projectq.ops.Rz(phi), qubit.qubit)
 
     def cnot(self, control, target):
         """
@@ -268,7 +387,7 @@ class ProjectQBackend(object):
             control (Qubit): Qubit to control cnot.
             target (Qubit): Qubit on which the cnot gate should be applied.
         """
-        projectq.ops.CNOT | (control.qubit, target.qubit)
+        self._apply(projectq.ops.CNOT, (control.qubit, target.qubit))
 
     def cphase(self, control, target):
         """
@@ -278,7 +397,7 @@ class ProjectQBackend(object):
             control (Qubit): Qubit to control cphase.
             target (Qubit): Qubit on which the cphase gate should be applied.
         """
-        projectq.ops.CZ | (control.qubit, target.qubit)
+        self._apply(projectq.ops.CZ, (control.qubit, target.qubit))
 
     def custom_gate(self, qubit, gate):
         """
@@ -324,6 +443,19 @@ class ProjectQBackend(object):
         """
         raise (EnvironmentError("Not implemented for this backend!"))
 
+    def run_circuit(self, ops):
+        """
+        Sends a list of gates to the engine while holding its lock once, so that
+        the gates of a circuit are not interleaved with the gates of other hosts.
+
+        Args:
+            ops (list): The operations, tuples of the name of a gate method and
+                        its arguments, e.g. ('cnot', control, target).
+        """
+        with self._lock:
+            for op in ops:
+                getattr(self, op[0])(*op[1:])
+
     def density_operator(self, qubit):
         """
         Returns the density operator of this qubit. If the qubit is entangled,
@@ -337,6 +469,19 @@ class ProjectQBackend(object):
         """
         raise (EnvironmentError("Not implemented for this backend!"))
 
+    def statevector(self, qubit):
+        """
+        Returns the statevector of the passed qubit. If the qubit is entangled to others,
+        the statevector of the whole entangled system is returned
+
+        Args:
+            qubit (Qubit): Qubit of the statevector.
+
+        Returns:
+            The statevector in the format of the backend.
+        """
+        raise (EnvironmentError("Not implemented for this backend!"))
+
     def measure(self, qubit, non_destructive):
         """
         Perform a measurement on a qubit.
@@ -349,18 +494,11 @@ class ProjectQBackend(object):
         Returns:
             The value which has been measured.
         """
-        while self.measuring:
-            time.sleep(0.1)
-            pass
-
-        self.measuring = True
-        projectq.ops.Measure | qubit.qubit
-        m = int(qubit.qubit)
-
-        if not non_destructive:
-            self.release(qubit)
-            self.engine.flush()
-        self.measuring = False
+        with self._lock:
+            projectq.ops.Measure | qubit.qubit
+            m = int(qubit.qubit)
+            if not non_destructive:
+                self.release(qubit)
         return m
 
     def release(self, qubit):
@@ -370,5 +508,7 @@ class ProjectQBackend(object):
         Args:
             qubit (Qubit): The qubit which should be released.
         """
-        projectq.ops.Measure | qubit.qubit
-        self.engine.flush()
+        with self._lock:
+            projectq.ops.Measure | qubit.qubit
+            if not self._deferred_flush:
+                self.engine.flush()
@@ -1,14 +1,15 @@
 from .safe_dict import SafeDict
+from .epr_store import EPRStore
 from .rw_lock import RWLock
+from qunetsim.objects.bell_pair import BellPair
 from qunetsim.objects.qubit import Qubit
-from queue import Queue
+from qunetsim.utils.handles import new_handle
 import numpy as np
-import uuid
 
 try:
     import qutip
     from qutip.cy.spmath import zcsr_kron
-    from qutip.qip.operations import cnot, snot, gate_expand_1toN, gate_expand_2toN, \
+    from qutip.qip.operations import cnot, snot, \
         rx, ry, rz, csign
 except ImportError:
     raise RuntimeError(
@@ -22,96 +23,155 @@ class QuTipBackend(object):
     """
 
     class QubitCollection(object):
+        """
+        The density matrix of a group of qubits. It is stored as a tensor with one
+        ket and one bra axis per qubit, so that gates and measurements only
+        contract the axes of the qubits they act on instead of expanding
+        operators to all qubits of the collection.
+        """
 
         def __init__(self, name):
             # initialize as a qubit in state |0>
             self._rwlock = RWLock()
             self.N = 1
             self._qubit_names = [name]
-            self.data = qutip.qutip.fock_dm(2, 0)
+            # name of a qubit -> its axis in the tensor
+            self._axes = {name: 0}
+            self._rho = np.array([[1, 0], [0, 0]], dtype=np.complex128)
+            self._data = None
+            # the collection this one was added to
+            self.merged_into = None
 
         @property
         def qubit_names(self):
             return self._qubit_names
 
+        @property
+        def data(self):
+            """
+            The density matrix of the collection as QuTiP object.
+            """
+            if self._data is None:
+                d = 2 ** self.N
+                self._data = qutip.Qobj(self._rho.reshape(d, d),
+                                        dims=[[2] * self.N, [2] * self.N])
+            return self._data
+
         def add_qubit(self, qubit):
             """
-            Calculates the tensor product using the implementation
-            of QuTip.
-            Modified version of qutip tensor function,
-            See http://qutip.org/docs/4.0.2/modules/qutip/tensor.html
+            Calculates the tensor product with the density matrix of another
+            collection.
             """
             self._lock()
-            self.data = qutip.tensor(self.data, qubit.data)
+            n, m = self.N, qubit.N
+            rho = np.tensordot(self._rho, qubit._rho, axes=0)
+            # ket 1, bra 1, ket 2, bra 2 -> ket 1, ket 2, bra 1, bra 2
+            order = list(range(n)) + list(range(2 * n, 2 * n + m)) \
+                + list(range(n, 2 * n)) + list(range(2 * n + m, 2 * (n + m)))
+            self._rho = rho.transpose(order)
+            self._data = None
             self.N = self.N + qubit.N
+            for i, name in enumerate(qubit._qubit_names):
+                self._axes[name] = n + i
             self._qubit_names = self._qubit_names + qubit._qubit_names
+            qubit.merged_into = self
             self._unlock()
 
+        def _apply(self, gate, targets):
+            """
+            Applies gate * rho * gate.dag() by contracting the gate with the axes
+            of the *targets*.
+            """
+            k = len(targets)
+            gate = gate.full().reshape([2] * (2 * k))
+            ket_axes = list(targets)
+            bra_axes = [self.N + t for t in targets]
+            inputs = list(range(k, 2 * k))
+            rho = np.tensordot(gate, self._rho, axes=(inputs, ket_axes))
+            rho = np.moveaxis(rho, list(range(k)), ket_axes)
+            rho = np.tensordot(rho, gate.conj(), axes=(bra_axes, inputs))
+            rho = np.moveaxis(rho, list(range(2 * self.N - k, 2 * self.N)), bra_axes)
+            self._rho = rho
+            self._data = None
+
         def apply_single_gate(self, gate, qubit_name):
             if not isinstance(gate, qutip.Qobj):
                 raise TypeError("Gate has to be of type Qobject.")
             self._lock()
-            target = self._qubit_names.index(qubit_name)
-            gate = qutip.gate_expand_1toN(gate, self.N, target)
-            self.data = gate * self.data * gate.dag()
+            target = self._axes[qubit_name]
+            self._apply(gate, [target])
             self._unlock()
 
         def apply_double_gate(self, gate, control_name, target_name):
             if not isinstance(gate, qutip.Qobj):
                 raise TypeError("Gate has to be of type Qobject.")
             self._lock()
-            control = self._qubit_names.index(control_name)
-            target = self._qubit_names.index(target_name)
-            gate = qutip.gate_expand_2toN(gate, self.N, control, target)
-            self.data = gate * self.data * gate.dag()
+            control = self._axes[control_name]
+            target = self._axes[target_name]
+            self._apply(gate, [control, target])
+            self._unlock()
+
+        def apply_gates(self, gates):
+            """
+            Applies a list of gates while holding the lock of the collection once.
+
+            Args:
+                gates (list): Tuples of a gate and the names of the qubits it is
+                              applied to.
+            """
+            self._lock()
+            for gate, names in gates:
+                self._apply(gate, [self._axes[name] for name in names])
             self._unlock()
 
         def measure(self, qubit_name, non_destructive):
-            res = None
-            M_0 = qutip.fock(2, 0).proj()
-            M_1 = qutip.fock(2, 1).proj()
             self._lock()
-            target = self._qubit_names.index(qubit_name)
-            if self.N > 1:
-                M_0 = qutip.gate_expand_1toN(M_0, self.N, target)
-                M_1 = qutip.gate_expand_1toN(M_1, self.N, target)
-            pr_0 = qutip.expect(M_0, self.data)
-            pr_1 = qutip.expect(M_1, self.data)
-            outcome = int(np.random.choice([0, 1], 1, p=[pr_0, pr_1]))
-            if outcome == 0:
-                self.data = M_0 * self.data * M_0.dag() / pr_0
-                res = 0
-            else:
-                # M_1 = qutip.gate_expand_1toN(M_1, self.N, target)
-                self.data = M_1 * self.data * M_1.dag() / pr_1
-                res = 1
+            target = self._axes[qubit_name]
+            rho = np.moveaxis(self._rho, [target, self.N + target], [0, 1])
+            d = 2 ** (self.N - 1)
+            pr_1 = min(max(np.real(np.trace(rho[1, 1].reshape(d, d))), 0.0), 1.0)
+            res = int(np.random.choice([0, 1], p=[1 - pr_1, pr_1]))
+            pr = pr_1 if res == 1 else 1 - pr_1
             if non_destructive is False:
-                i_list = [x for x in range(self.N)]
-                i_list.remove(target)
-                self._qubit_names.remove(qubit_name)
+                self._rho = rho[res, res] / pr
+                del self._qubit_names[target]
+                del self._axes[qubit_name]
+                for name in self._qubit_names[target:]:
+                    self._axes[name] -= 1
                 self.N = self.N - 1
-                if len(i_list) > 0:
-                    self.data = self.data.ptrace(i_list)
-                else:
-                    self.data = qutip.Qobj()
+            else:
+                collapsed = np.zeros_like(rho)
+                collapsed[res, res] = rho[res, res] / pr
+                self._rho = np.moveaxis(collapsed, [0, 1], [target, self.N + target])
+            self._data = None
             self._unlock()
             return res
 
         def give_density_matrix(self, qubit_name):
-            ret = None
-            self._lock()
+            """
+            Calculates the reduced density matrix of one or several qubits of
+            the collection, by tracing out the axes of all other qubits.
+            """
             if isinstance(qubit_name, list):
-                indices = []
-                for q_name in qubit_name:
-                    if q_name in self._qubit_names:
-                        indices.append(self._qubit_names.index(q_name))
-                ret = self.data.ptrace(indices)
+                names = qubit_name
             else:
-                if qubit_name in self._qubit_names:
-                    index = self._qubit_names.index(qubit_name)
-                    ret = self.data.ptrace([index])
+                names = [qubit_name]
+            self._lock()
+            targets = {self._axes[name] for name in names if name in self._axes}
+            if not targets:
+                self._unlock()
+                return None
+            rho = self._rho
+            n = self.N
+            # the axes of the kept qubits stay in place if the others are traced
+            # out from the last one on
+            for i in reversed(range(self.N)):
+                if i not in targets:
+                    rho = np.trace(rho, axis1=i, axis2=n + i)
+                    n -= 1
             self._unlock()
-            return self.data #ret
+            d = 2 ** n
+            return qutip.Qobj(rho.reshape(d, d), dims=[[2] * n, [2] * n])
 
         def _lock(self):
             self._rwlock.acquire_write()
@@ -136,7 +196,7 @@ class QuTipBackend(object):
             QuTipBackend.Hosts.__instance = self
             SafeDict.__init__(self)
 
-    class EntanglementIDs(SafeDict):
+    class EntanglementIDs(EPRStore):
         # There only should be one instance of Hosts
         __instance = None
 
@@ -151,11 +211,72 @@ class QuTipBackend(object):
             if QuTipBackend.EntanglementIDs.__instance is not None:
                 raise Exception("Call get instance to get this class!")
             QuTipBackend.EntanglementIDs.__instance = self
-            SafeDict.__init__(self)
+            EPRStore.__init__(self)
+
+    def __init__(self, isolated=False, analytic_epr=False, werner=1.0):
+        """
+        Args:
+            isolated (bool): If the backend should use its own host and
+                             entanglement registries instead of the ones shared by
+                             all QuTiP backends.
+            analytic_epr (bool): If EPR pairs should be created as Bell pairs,
+                                 which measurements and teleportations handle
+                                 in closed form without the simulator.
+            werner (float): The Werner parameter of the Bell pairs. With
+                            probability 1 - *werner*, a new pair is in a
+                            uniformly random Bell state instead.
+        """
+        self._analytic_epr = analytic_epr
+        self.werner = werner
+        if isolated:
+            self._hosts = SafeDict()
+            self._entaglement_qubits = EPRStore()
+        else:
+            self._hosts = QuTipBackend.Hosts.get_instance()
+            self._entaglement_qubits = QuTipBackend.EntanglementIDs.get_instance()
 
-    def __init__(self):
-        self._hosts = QuTipBackend.Hosts.get_instance()
-        self._entaglement_qubits = QuTipBackend.EntanglementIDs.get_instance()
+    @property
+    def analytic_epr(self):
+        """
+        Get if EPR pairs are created as Bell pairs, which are only stored in the
+        simulator when a gate other than a Pauli gate is applied to them.
+
+        Returns:
+            (bool): If EPR pairs are created as Bell pairs.
+        """
+        return self._analytic_epr
+
+    @analytic_epr.setter
+    def analytic_epr(self, analytic_epr):
+        """
+        Set if EPR pairs are created as Bell pairs.
+
+        Args:
+            analytic_epr (bool): If EPR pairs are created as Bell pairs.
+        """
+        self._analytic_epr = analytic_epr
+
+    @property
+    def werner(self):
+        """
+        Get the Werner parameter of the Bell pairs created with analytic_epr.
+
+        Returns:
+            (float): The Werner parameter of new Bell pairs.
+        """
+        return self._werner
+
+    @werner.setter
+    def werner(self, werner):
+        """
+        Set the Werner parameter of the Bell pairs created with analytic_epr.
+
+        Args:
+            werner (float): The Werner parameter of new Bell pairs.
+        """
+        if not 0 <= werner <= 1:
+            raise ValueError('werner should be between 0 and 1')
+        self._werner = werner
 
     def start(self, **kwargs):
         """
@@ -189,7 +310,7 @@ class QuTipBackend(object):
         Reurns:
             Qubit of backend type.
         """
-        name = str(uuid.uuid4())
+        name = new_handle()
         return (QuTipBackend.QubitCollection(name), name)
 
     def send_qubit_to(self, qubit, from_host_id, to_host_id):
@@ -217,10 +338,15 @@ class QuTipBackend(object):
             Returns a qubit. The qubit belongs to host a. To get the second
             qubit of host b, the receive_epr function has to be called.
         """
-        name1 = str(uuid.uuid4())
-        name2 = str(uuid.uuid4())
         host_a = self._hosts.get_from_dict(host_a_id)
         host_b = self._hosts.get_from_dict(host_b_id)
+        if self._analytic_epr:
+            q1, q2 = BellPair.create(host_a, host_b, q_id=q_id, block=block,
+                                     werner=self._werner)
+            self.store_ent_pair(host_a.host_id, host_b.host_id, q2)
+            return q1
+        name1 = new_handle()
+        name2 = new_handle()
         qubit1 = (QuTipBackend.QubitCollection(name1), name1)
         qubit2 = (QuTipBackend.QubitCollection(name2), name2)
         qubit1[0].apply_single_gate(snot(), qubit1[1])
@@ -233,15 +359,7 @@ class QuTipBackend(object):
         return q1
 
     def store_ent_pair(self, host_a, host_b, qubit):
-        key = host_a + ':' + host_b
-        ent_queue = self._entaglement_qubits.get_from_dict(key)
-
-        if ent_queue is not None:
-            ent_queue.put(qubit)
-        else:
-            ent_queue = Queue()
-            ent_queue.put(qubit)
-        self._entaglement_qubits.add_to_dict(key, ent_queue)
+        self._entaglement_qubits.put(host_a, host_b, qubit)
 
     def receive_epr(self, host_id, sender_id, q_id=None, block=False):
         """
@@ -255,16 +373,61 @@ class QuTipBackend(object):
         Returns:
             Returns an EPR qubit with the other Host.
         """
-        key = sender_id + ':' + host_id
-        ent_queue = self._entaglement_qubits.get_from_dict(key)
-        if ent_queue is None:
-            raise Exception("Internal Error!")
-        q = ent_queue.get()
-        self._entaglement_qubits.add_to_dict(key, ent_queue)
+        q = self._entaglement_qubits.get(sender_id, host_id)
         if q_id is not None and q_id != q.id:
             raise ValueError("Qid doesent match id!")
         return q
 
+    def receive_eprs(self, host_id, sender_id, n, block=False):
+        """
+        Receives the qubits of the next *n* EPR pairs the sender created with
+        the host at once.
+
+        Args:
+            host_id (str): ID of the host who receives the EPR qubits.
+            sender_id (str): ID of the sender of the EPR pairs.
+            n (int): The amount of EPR qubits.
+            block (bool): Determines if the created pairs should be blocked or not.
+        Returns:
+            (list): The EPR qubits, in the order the pairs were created.
+        """
+        return self._entaglement_qubits.get_many(sender_id, host_id, n)
+
+    # The gates run_circuit applies itself, as function of the gate arguments and
+    # the amount of qubits they act on.
+    _CIRCUIT_GATES = {
+        'X': (lambda: rx(np.pi), 1),
+        'Y': (lambda: ry(np.pi), 1),
+        'Z': (lambda: rz(np.pi), 1),
+        'H': (lambda: snot(), 1),
+        'T': (lambda: qutip.Qobj(np.array([[1, 0], [0, np.e ** (1j * np.pi / 4)]])), 1),
+        'rx': (lambda phi: rx(phi), 1),
+        'ry': (lambda phi: ry(phi), 1),
+        'rz': (lambda phi: rz(phi), 1),
+        'custom_gate': (lambda gate: qutip.Qobj(gate), 1),
+        'cnot': (lambda: cnot(), 2),
+        'cphase': (lambda: csign(), 2),
+        'custom_two_qubit_gate': (lambda gate: qutip.Qobj(gate), 2),
+    }
+
+    @staticmethod
+    def _collection(qubit):
+        """
+        Gets the collection and the name of a qubit. If the collection of the
+        qubit was added to another collection, the qubit is moved to it.
+
+        Args:
+            qubit (Qubit): The qubit.
+        Returns:
+            (tuple): The collection and the name of the qubit.
+        """
+        qubit_collection, name = qubit.qubit
+        if qubit_collection.merged_into is not None:
+            while qubit_collection.merged_into is not None:
+                qubit_collection = qubit_collection.merged_into
+            qubit.qubit = (qubit_collection, name)
+        return qubit_collection, name
+
     ##########################
     #   Gate definitions    #
     #########################
@@ -286,7 +449,7 @@ class QuTipBackend(object):
             qubit (Qubit): Qubit on which gate should be applied to.
         """
         gate = rx(np.pi)
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def Y(self, qubit):
@@ -297,7 +460,7 @@ class QuTipBackend(object):
             qubit (Qubit): Qubit on which gate should be applied to.
         """
         gate = ry(np.pi)
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def Z(self, qubit):
@@ -308,7 +471,7 @@ class QuTipBackend(object):
             qubit (Qubit): Qubit on which gate should be applied to.
         """
         gate = rz(np.pi)
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def H(self, qubit):
@@ -319,7 +482,7 @@ class QuTipBackend(object):
             qubit (Qubit): Qubit on which gate should be applied to.
         """
         gate = snot()
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def T(self, qubit):
@@ -341,7 +504,7 @@ class QuTipBackend(object):
             phi (float): Amount of rotation in Rad.
         """
         gate = rx(phi)
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def ry(self, qubit, phi):
@@ -353,7 +516,7 @@ class QuTipBackend(object):
             phi (float): Amount of rotation in Rad.
         """
         gate = ry(phi)
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def rz(self, qubit, phi):
@@ -365,7 +528,7 @@ class QuTipBackend(object):
             phi (float): Amount of rotation in Rad.
         """
         gate = rz(phi)
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def cnot(self, qubit, target):
@@ -377,8 +540,8 @@ class QuTipBackend(object):
             target (Qubit): Qubit on which the cnot gate should be applied.
         """
         gate = cnot()
-        qubit_collection, c_name = qubit.qubit
-        qubit_collection2, t_name = target.qubit
+        qubit_collection, c_name = self._collection(qubit)
+        qubit_collection2, t_name = self._collection(target)
         if qubit_collection != qubit_collection2:
             qubit_collection.add_qubit(qubit_collection2)
             target.qubit = (qubit_collection, t_name)
@@ -393,8 +556,8 @@ class QuTipBackend(object):
             target (Qubit): Qubit on which the cphase gate should be applied.
         """
         gate = csign()
-        qubit_collection, c_name = qubit.qubit
-        qubit_collection2, t_name = target.qubit
+        qubit_collection, c_name = self._collection(qubit)
+        qubit_collection2, t_name = self._collection(target)
         if qubit_collection != qubit_collection2:
             qubit_collection.add_qubit(qubit_collection2)
             target.qubit = (qubit_collection, t_name)
@@ -409,7 +572,7 @@ class QuTipBackend(object):
             gate(np.ndarray): 2x2 array of the gate.
         """
         gate = qutip.Qobj(gate)
-        qubit_collection, name = qubit.qubit
+        qubit_collection, name = self._collection(qubit)
         qubit_collection.apply_single_gate(gate, name)
 
     def custom_controlled_gate(self, qubit, target, gate):
@@ -445,13 +608,52 @@ class QuTipBackend(object):
             gate(np.ndarray): 4x4 array for the gate applied.
         """
         gate = qutip.Qobj(gate)
-        qubit_collection, c_name = qubit1.qubit
-        qubit_collection2, t_name = qubit2.qubit
+        qubit_collection, c_name = self._collection(qubit1)
+        qubit_collection2, t_name = self._collection(qubit2)
         if qubit_collection != qubit_collection2:
             qubit_collection.add_qubit(qubit_collection2)
             qubit2.qubit = (qubit_collection, t_name)
         qubit_collection.apply_double_gate(gate, c_name, t_name)
 
+    def run_circuit(self, ops):
+        """
+        Applies a list of gates. Consecutive gates on the same collection of
+        qubits are applied while holding the lock of the collection once.
+
+        Args:
+            ops (list): The operations, tuples of the name of a gate method and
+                        its arguments, e.g. ('cnot', control, target).
+        """
+        batch_collection, batch = None, []
+        for op in ops:
+            name, args = op[0], op[1:]
+            if name == 'I':
+                continue
+            if name not in QuTipBackend._CIRCUIT_GATES:
+                if batch:
+                    batch_collection.apply_gates(batch)
+                batch_collection, batch = None, []
+                getattr(self, name)(*args)
+                continue
+            make_gate, num_qubits = QuTipBackend._CIRCUIT_GATES[name]
+            qubits, gate_args = args[:num_qubits], args[num_qubits:]
+            collections = [self._collection(q) for q in qubits]
+            qubit_collection = collections[0][0]
+            for q, (other, other_name) in zip(qubits[1:], collections[1:]):
+                if other != qubit_collection:
+                    if batch:
+                        batch_collection.apply_gates(batch)
+                        batch_collection, batch = None, []
+                    qubit_collection.add_qubit(other)
+                    q.qubit = (qubit_collection, other_name)
+            if qubit_collection != batch_collection:
+                if batch:
+                    batch_collection.apply_gates(batch)
+                batch_collection, batch = qubit_collection, []
+            batch.append((make_gate(*gate_args), [n for _, n in collections]))
+        if batch:
+            batch_collection.apply_gates(batch)
+
     def density_operator(self, qubit):
         """
         Returns the density operator of this qubit. If the qubit is entangled,
@@ -464,8 +666,8 @@ class QuTipBackend(object):
             np.ndarray: The density operator of the qubit.
         """
         if isinstance(qubit, list):
-            names = [q.qubit[1] for q in qubit]
-            qubit_collections = set([q.qubit[0] for q in qubit])
+            names = [self._collection(q)[1] for q in qubit]
+            qubit_collections = set([self._collection(q)[0] for q in qubit])
             density_matrices = []
             for qubit_collection in qubit_collections:
                 needed_names = [name for name in qubit_collection.qubit_names if name in names]
@@ -474,9 +676,36 @@ class QuTipBackend(object):
                 return density_matrices[0]
             return density_matrices
         else:
-            qubit_collection, q_name = qubit.qubit
+            qubit_collection, q_name = self._collection(qubit)
             return qubit_collection.give_density_matrix(q_name)
 
+    def density_operators(self, qubits):
+        """
+        Returns the density operators of many qubits.
+
+        Args:
+            qubits (list): The qubits of the density operators.
+
+        Returns:
+            (list): The reduced density operator of each qubit, as np.ndarray
+            like the other backends return them.
+        """
+        return [self.density_operator(q).full() for q in qubits]
+
+    def statevector(self, qubit):
+        """
+        Returns the statevector of the passed qubit. If the qubit is entangled to others,
+        the statevector of the whole entangled system is returned
+
+        Args:
+            qubit (Qubit): Qubit of the statevector.
+
+        Returns:
+            The statevector in the format of the backend.
+        """
+        raise EnvironmentError("The QuTiP backend does not store statevectors, "
+                               "use density_operator instead.")
+
     def measure(self, qubit, non_destructive):
         """
         Perform a measurement on a qubit.
@@ -489,7 +718,7 @@ class QuTipBackend(object):
         Returns:
             The value which has been measured.
         """
-        q, name = qubit.qubit
+        q, name = self._collection(qubit)
         return q.measure(name, non_destructive)
 
     def release(self, qubit):
@@ -0,0 +1,690 @@
+from .safe_dict import SafeDict
+from .epr_store import EPRStore
+from qunetsim.objects.qubit import Qubit
+import itertools
+import numpy as np
+import threading
+
+_PAULIS = {(0, 0): np.eye(2),
+           (1, 0): np.array([[0, 1], [1, 0]]),
+           (1, 1): np.array([[0, -1j], [1j, 0]]),
+           (0, 1): np.array([[1, 0], [0, -1]])}
+
+
+def _popcount(v):
+    return bin(v).count('1')
+
+
+def _multiply(x1, z1, r1, x2, z2, r2):
+    """
+    Multiplies the commuting Pauli strings (-1)^r1 P1 and (-1)^r2 P2, given as
+    bit masks, as described by Aaronson and Gottesman.
+
+    Returns:
+        (tuple): The bit masks and the sign bit of P1 * P2.
+    """
+    y1 = x1 & z1
+    only_x1 = x1 & ~z1
+    only_z1 = z1 & ~x1
+    plus = (y1 & z2 & ~x2) | (only_x1 & z2 & x2) | (only_z1 & x2 & ~z2)
+    minus = (y1 & x2 & ~z2) | (only_x1 & z2 & ~x2) | (only_z1 & x2 & z2)
+    phase = (2 * r1 + 2 * r2 + _popcount(plus) - _popcount(minus)) % 4
+    return x1 ^ x2, z1 ^ z2, phase // 2
+
+
+def _pauli_matrix(x, z, k):
+    # qubit 0 of the string is the most significant qubit of the matrix
+    matrix = np.eye(1)
+    for j in range(k):
+        matrix = np.kron(matrix, _PAULIS[((x >> j) & 1, (z >> j) & 1)])
+    return matrix
+
+
+class StabilizerBackend(object):
+    """
+    A stabilizer backend which simulates Clifford gates and measurements in the
+    computational basis with the tableau algorithm of Aaronson and Gottesman.
+
+    Each group of entangled qubits has its own tableau, whose rows are stored as
+    bit masks over the qubits of the group. Gates are applied to the rows, a
+    measured qubit is split out of its group again. Since the memory and the
+    time of the operations only depend on the size of the group of a qubit,
+    networks with thousands of EPR pairs can be simulated. Gates which are not
+    Clifford gates, such as T, raise an error.
+    """
+
+    # Groups can be changed by the backends of several hosts at once.
+    _lock = threading.RLock()
+    # gate matrix -> conjugation table
+    _tables = {}
+
+    class EntanglementGroup(object):
+        """
+        The tableau of a group of entangled qubits. Rows 0 to k-1 are the
+        destabilizers, rows k to 2k-1 the stabilizers, bit j of a row belongs to
+        qubit j of the group.
+        """
+
+        def __init__(self, qubit):
+            self.qubits = [qubit]
+            self.xs = [1, 0]
+            self.zs = [0, 1]
+            self.rs = [0, 0]
+            qubit.group = self
+
+        @property
+        def k(self):
+            return len(self.qubits)
+
+        def axis(self, qubit):
+            return self.qubits.index(qubit)
+
+        def merge(self, other):
+            """
+            Adds the qubits of the group *other* to this group.
+            """
+            if other is self:
+                return
+            k, m = self.k, other.k
+            self.xs = self.xs[:k] + [x << k for x in other.xs[:m]] \
+                + self.xs[k:] + [x << k for x in other.xs[m:]]
+            self.zs = self.zs[:k] + [z << k for z in other.zs[:m]] \
+                + self.zs[k:] + [z << k for z in other.zs[m:]]
+            self.rs = self.rs[:k] + other.rs[:m] + self.rs[k:] + other.rs[m:]
+            self.qubits = self.qubits + other.qubits
+            for qubit in other.qubits:
+                qubit.group = self
+
+        def apply(self, table, qubits):
+            """
+            Conjugates the rows with a Clifford gate, given by its conjugation
+            table, which acts on the *qubits*.
+            """
+            axes = [self.axis(q) for q in qubits]
+            mask = 0
+            for a in axes:
+                mask |= 1 << a
+            for i in range(2 * self.k):
+                x, z = self.xs[i], self.zs[i]
+                if not (x | z) & mask:
+                    continue
+                sub_x = sub_z = 0
+                for j, a in enumerate(axes):
+                    sub_x |= ((x >> a) & 1) << j
+                    sub_z |= ((z >> a) & 1) << j
+                new_x, new_z, flip = table[(sub_x, sub_z)]
+                x &= ~mask
+                z &= ~mask
+                for j, a in enumerate(axes):
+                    x |= ((new_x >> j) & 1) << a
+                    z |= ((new_z >> j) & 1) << a
+                self.xs[i], self.zs[i] = x, z
+                self.rs[i] ^= flip
+
+        def measure(self, qubit):
+            """
+            Measures *qubit* in the computational basis and splits it out of the
+            group.
+
+            Returns:
+                (int): The measurement outcome.
+            """
+            k = self.k
+            a = self.axis(qubit)
+            bit = 1 << a
+            xs, zs, rs = self.xs, self.zs, self.rs
+            p = next((i for i in range(k, 2 * k) if xs[i] & bit), None)
+            if p is not None:
+                # random outcome
+                for i in range(2 * k):
+                    if i != p and xs[i] & bit:
+                        self._rowsum(i, p)
+                xs[p - k], zs[p - k], rs[p - k] = xs[p], zs[p], rs[p]
+                outcome = int(np.random.random() < 0.5)
+                xs[p], zs[p], rs[p] = 0, bit, outcome
+            else:
+                # deterministic outcome
+                x, z, r = 0, 0, 0
+                for i in range(k):
+                    if xs[i] & bit:
+                        x, z, r = _multiply(xs[i + k], zs[i + k], rs[i + k], x, z, r)
+                outcome = r
+            self._split(a)
+            StabilizerBackend.EntanglementGroup(qubit)
+            qubit.group.rs[1] = outcome
+            return outcome
+
+        def expectation(self, qubit, x, z):
+            """
+            Gets the expectation value of a single qubit Pauli operator.
+
+            Returns:
+                (int): -1, 0 or 1.
+            """
+            k = self.k
+            a = self.axis(qubit)
+            px, pz = x << a, z << a
+            for i in range(k, 2 * k):
+                if _popcount((self.xs[i] & pz) ^ (self.zs[i] & px)) % 2:
+                    return 0
+            # the operator is in the stabilizer group up to the sign
+            rx, rz, r = 0, 0, 0
+            for i in range(k):
+                if _popcount((self.xs[i] & pz) ^ (self.zs[i] & px)) % 2:
+                    rx, rz, r = _multiply(self.xs[i + k], self.zs[i + k], self.rs[i + k], rx, rz, r)
+            return -1 if r else 1
+
+        def _rowsum(self, h, i):
+            """
+            Sets row *h* to the product of row *i* and row *h*.
+            """
+            if h < self.k:
+                # the signs of the destabilizers are not needed
+                self.xs[h] ^= self.xs[i]
+                self.zs[h] ^= self.zs[i]
+            else:
+                self.xs[h], self.zs[h], self.rs[h] = _multiply(
+                    self.xs[i], self.zs[i], self.rs[i], self.xs[h], self.zs[h], self.rs[h])
+
+        def _split(self, a):
+            """
+            Removes qubit *a*, which is in an eigenstate of Z, from the tableau.
+            """
+            k = self.k
+            bit = 1 << a
+            xs, zs = self.xs, self.zs
+            # A stabilizer s = Z_a P, all others without support on qubit a.
+            s = next(i for i in range(k, 2 * k) if zs[i] & bit)
+            for t in range(k, 2 * k):
+                if t != s and zs[t] & bit:
+                    self._rowsum(t, s)
+                    self._rowsum(s - k, t - k)
+            # s = Z_a, by multiplying the stabilizers of P into it.
+            for t in range(k, 2 * k):
+                if t != s and xs[t - k] & bit:
+                    self._rowsum(s, t)
+                    self._rowsum(t - k, s - k)
+            # The other destabilizers commute with Z_a, drop their Z_a part.
+            low = bit - 1
+            rows = [i for i in range(2 * k) if i != s and i != s - k]
+            self.xs = [(xs[i] & low) | ((xs[i] >> (a + 1)) << a) for i in rows]
+            self.zs = [(zs[i] & low) | ((zs[i] >> (a + 1)) << a) for i in rows]
+            self.rs = [self.rs[i] for i in rows]
+            del self.qubits[a]
+
+    class QubitReference(object):
+        """
+        The backend information stored in the *Qubit* objects.
+        """
+        __slots__ = ['group']
+
+        def __init__(self):
+            self.group = None
+
+    class Hosts(SafeDict):
+        # There only should be one instance of Hosts
+        __instance = None
+
+        @staticmethod
+        def get_instance():
+            if StabilizerBackend.Hosts.__instance is not None:
+                return StabilizerBackend.Hosts.__instance
+            else:
+                return StabilizerBackend.Hosts()
+
+        def __init__(self):
+            if StabilizerBackend.Hosts.__instance is not None:
+                raise Exception("Call get instance to get this class!")
+            StabilizerBackend.Hosts.__instance = self
+            SafeDict.__init__(self)
+
+    class EntanglementIDs(EPRStore):
+        # There only should be one instance of Hosts
+        __instance = None
+
+        @staticmethod
+        def get_instance():
+            if StabilizerBackend.EntanglementIDs.__instance is not None:
+                return StabilizerBackend.EntanglementIDs.__instance
+            else:
+                return StabilizerBackend.EntanglementIDs()
+
+        def __init__(self):
+            if StabilizerBackend.EntanglementIDs.__instance is not None:
+                raise Exception("Call get instance to get this class!")
+            StabilizerBackend.EntanglementIDs.__instance = self
+            EPRStore.__init__(self)
+
+    def __init__(self, isolated=False):
+        """
+        Args:
+            isolated (bool): If the backend should use its own host and
+                             entanglement registries instead of the ones shared by
+                             all stabilizer backends.
+        """
+        if isolated:
+            self._hosts = SafeDict()
+            self._entaglement_qubits = EPRStore()
+        else:
+            self._hosts = StabilizerBackend.Hosts.get_instance()
+            # keys are (from, to), where from is the host calling create EPR
+            self._entaglement_qubits = StabilizerBackend.EntanglementIDs.get_instance()
+
+    def start(self, **kwargs):
+        """
+        Starts Backends which have to run in an own thread or process before they
+        can be used.
+        """
+        pass
+
+    def stop(self):
+        """
+        Stops Backends which are running in an own thread or process.
+        """
+        pass
+
+    def add_host(self, host):
+        """
+        Adds a host to the backend.
+
+        Args:
+            host (Host): New Host which should be added.
+        """
+        self._hosts.add_to_dict(host.host_id, host)
+
+    def create_qubit(self, host_id):
+        """
+        Creates a new Qubit of the type of the backend.
+
+        Args:
+            host_id (str): Id of the host to whom the qubit belongs.
+
+        Returns:
+            Qubit of backend type.
+        """
+        qubit = StabilizerBackend.QubitReference()
+        StabilizerBackend.EntanglementGroup(qubit)
+        return qubit
+
+    def send_qubit_to(self, qubit, from_host_id, to_host_id):
+        """
+        Sends a qubit to a new host.
+
+        Args:
+            qubit (Qubit): Qubit to be send.
+            from_host_id (str): From the starting host.
+            to_host_id (str): New host of the qubit.
+        """
+        new_host = self._hosts.get_from_dict(to_host_id)
+        qubit.host = new_host
+
+    def create_EPR(self, host_a_id, host_b_id, q_id=None, block=False):
+        """
+        Creates an EPR pair for two qubits and returns one of the qubits.
+
+        Args:
+            host_a_id (str): ID of the first host who gets the EPR state.
+            host_b_id (str): ID of the second host who gets the EPR state.
+            q_id (str): Optional id which both qubits should have.
+            block (bool): Determines if the created pair should be blocked or not.
+        Returns:
+            Returns a qubit. The qubit belongs to host a. To get the second
+            qubit of host b, the receive_epr function has to be called.
+        """
+        host_a = self._hosts.get_from_dict(host_a_id)
+        host_b = self._hosts.get_from_dict(host_b_id)
+        q1 = Qubit(host_a, qubit=self.create_qubit(host_a_id), q_id=q_id, blocked=block)
+        q2 = Qubit(host_b, qubit=self.create_qubit(host_b_id), q_id=q1.id, blocked=block)
+        self.H(q1)
+        self.cnot(q1, q2)
+        self.store_ent_pair(host_a.host_id, host_b.host_id, q2)
+        return q1
+
+    def store_ent_pair(self, host_a, host_b, qubit):
+        self._entaglement_qubits.put(host_a, host_b, qubit)
+
+    def receive_epr(self, host_id, sender_id, q_id=None, block=False):
+        """
+        Called after create EPR in the receiver, to receive the other EPR pair.
+
+        Args:
+            host_id (str): ID of the first host who gets the EPR state.
+            sender_id (str): ID of the sender of the EPR pair.
+            q_id (str): Optional id which both qubits should have.
+            block (bool): Determines if the created pair should be blocked or not.
+        Returns:
+            Returns an EPR qubit with the other Host.
+        """
+        q = self._entaglement_qubits.get(sender_id, host_id)
+        if q_id is not None and q_id != q.id:
+            raise ValueError("Qid doesent match id!")
+        return q
+
+    def receive_eprs(self, host_id, sender_id, n, block=False):
+        """
+        Receives the qubits of the next *n* EPR pairs the sender created with
+        the host at once.
+
+        Args:
+            host_id (str): ID of the host who receives the EPR qubits.
+            sender_id (str): ID of the sender of the EPR pairs.
+            n (int): The amount of EPR qubits.
+            block (bool): Determines if the created pairs should be blocked or not.
+        Returns:
+            (list): The EPR qubits, in the order the pairs were created.
+        """
+        return self._entaglement_qubits.get_many(sender_id, host_id, n)
+
+    @staticmethod
+    def _conjugation_table(gate):
+        """
+        Calculates how a Clifford gate maps the Pauli strings of its qubits.
+
+        Args:
+            gate (np.ndarray): The unitary of the gate.
+        Returns:
+            (dict): Maps the bit masks of each Pauli string to the bit masks and the
+            sign bit of its image.
+        """
+        gate = np.asarray(gate, dtype=np.complex128)
+        key = (gate.shape, np.round(gate, 10).tobytes())
+        table = StabilizerBackend._tables.get(key)
+        if table is not None:
+            return table
+        k = int(np.log2(gate.shape[0]))
+        strings = list(itertools.product(range(2 ** k), repeat=2))
+        matrices = {(x, z): _pauli_matrix(x, z, k) for x, z in strings}
+        table = {}
+        for x, z in strings:
+            image = gate @ matrices[(x, z)] @ gate.conj().T
+            for (new_x, new_z), matrix in matrices.items():
+                overlap = np.trace(matrix @ image) / 2 ** k
+                if np.isclose(abs(overlap.real), 1):
+                    table[(x, z)] = (new_x, new_z, int(overlap.real < 0))
+                    break
+            else:
+                raise EnvironmentError("The gate is not a Clifford gate, which is "
+                                       "not supported by the stabilizer backend!")
+        StabilizerBackend._tables[key] = table
+        return table
+
+    def _apply(self, gate, *qubits):
+        """
+        Applies the Clifford *gate* to the *qubits* and merges their groups if
+        necessary.
+        """
+        table = StabilizerBackend._conjugation_table(gate)
+        references = [q.qubit for q in qubits]
+        with StabilizerBackend._lock:
+            group = references[0].group
+            for reference in references[1:]:
+                group.merge(reference.group)
+            group.apply(table, references)
+
+    ##########################
+    #   Gate definitions    #
+    #########################
+
+    def I(self, qubit):
+        """
+        Perform Identity gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        pass
+
+    def X(self, qubit):
+        """
+        Perform pauli X gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(_PAULIS[(1, 0)], qubit)
+
+    def Y(self, qubit):
+        """
+        Perform pauli Y gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(_PAULIS[(1, 1)], qubit)
+
+    def Z(self, qubit):
+        """
+        Perform pauli Z gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(_PAULIS[(0, 1)], qubit)
+
+    def H(self, qubit):
+        """
+        Perform Hadamard gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[1, 1], [1, -1]]) / np.sqrt(2), qubit)
+
+    def K(self, qubit):
+        """
+        Perform K gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(0.5 * np.array([[1 + 1j, 1 - 1j], [-1 + 1j, -1 - 1j]]), qubit)
+
+    def S(self, qubit):
+        """
+        Perform S gate on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        self._apply(np.array([[1, 0], [0, 1j]]), qubit)
+
+    def T(self, qubit):
+        """
+        The T gate is not a Clifford gate and can not be simulated.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+        """
+        raise EnvironmentError("The T gate is not a Clifford gate, which is "
+                               "not supported by the stabilizer backend!")
+
+    def rx(self, qubit, phi):
+        """
+        Perform a rotation pauli x gate with an angle of phi. Only multiples of
+        pi/2 are Clifford gates.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+            phi (float): Amount of rotation in Rad.
+        """
+        cos, sin = np.cos(phi / 2), np.sin(phi / 2)
+        self._apply(np.array([[cos, -1j * sin], [-1j * sin, cos]]), qubit)
+
+    def ry(self, qubit, phi):
+        """
+        Perform a rotation pauli y gate with an angle of phi. Only multiples of
+        pi/2 are Clifford gates.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+            phi (float): Amount of rotation in Rad.
+        """
+        cos, sin = np.cos(phi / 2), np.sin(phi / 2)
+        self._apply(np.array([[cos, -sin], [sin, cos]]), qubit)
+
+    def rz(self, qubit, phi):
+        """
+        Perform a rotation pauli z gate with an angle of phi. Only multiples of
+        pi/2 are Clifford gates.
+
+        Args:
+            qubit (Qubit): Qubit on which gate should be applied to.
+            phi (float): Amount of rotation in Rad.
+        """
+        self._apply(np.diag([np.exp(-0.5j * phi), np.exp(0.5j * phi)]), qubit)
+
+    def cnot(self, qubit, target):
+        """
+        Applies a controlled x gate to the target qubit.
+
+        Args:
+            qubit (Qubit): Qubit to control cnot.
+            target (Qubit): Qubit on which the cnot gate should be applied.
+        """
+        self.custom_controlled_gate(qubit, target, _PAULIS[(1, 0)])
+
+    def cphase(self, qubit, target):
+        """
+        Applies a controlled z gate to the target qubit.
+
+        Args:
+            qubit (Qubit): Qubit to control cphase.
+            target (Qubit): Qubit on which the cphase gate should be applied.
+        """
+        self.custom_controlled_gate(qubit, target, _PAULIS[(0, 1)])
+
+    def custom_gate(self, qubit, gate):
+        """
+        Applies a custom gate to the qubit. The gate has to be a Clifford gate.
+
+        Args:
+            qubit(Qubit): Qubit to which the gate is applied.
+            gate(np.ndarray): 2x2 array of the gate.
+        """
+        self._apply(gate, qubit)
+
+    def custom_controlled_gate(self, qubit, target, gate):
+        """
+        Applies a custom gate to the target qubit, controlled by the qubit. The
+        controlled gate has to be a Clifford gate.
+
+        Args:
+            qubit(Qubit): Qubit to control the gate.
+            target(Qubit): Qubit on which the gate is applied.
+            gate(nd.array): 2x2 array for the gate applied to target.
+        """
+        controlled = np.eye(4, dtype=np.complex128)
+        controlled[2:, 2:] = gate
+        self._apply(controlled, qubit, target)
+
+    def custom_controlled_two_qubit_gate(self, qubit, target_1, target_2, gate):
+        """
+        Applies a custom gate to the target qubit, controlled by the qubit. The
+        controlled gate has to be a Clifford gate.
+
+        Args:
+            qubit (Qubit): Qubit to control the gate.
+            target_1 (Qubit): Qubit on which the gate is applied.
+            target_2 (Qubit): Qubit on which the gate is applied.
+            gate (nd.array): 4x4 array for the gate applied to target.
+        """
+        controlled = np.eye(8, dtype=np.complex128)
+        controlled[4:, 4:] = gate
+        self._apply(controlled, qubit, target_1, target_2)
+
+    def custom_two_qubit_gate(self, qubit1, qubit2, gate):
+        """
+        Applies a custom two qubit gate to qubit1 \\otimes qubit2. The gate has to
+        be a Clifford gate.
+
+        Args:
+            qubit1(Qubit): First qubit of the gate.
+            qubit2(Qubit): Second qubit of the gate.
+            gate(np.ndarray): 4x4 array for the gate applied.
+        """
+        self._apply(gate, qubit1, qubit2)
+
+    def run_circuit(self, ops):
+        """
+        Applies a list of gates while holding the lock of the backend once.
+
+        Args:
+            ops (list): The operations, tuples of the name of a gate method and
+                        its arguments, e.g. ('cnot', control, target).
+        """
+        with StabilizerBackend._lock:
+            for op in ops:
+                getattr(self, op[0])(*op[1:])
+
+    def density_operator(self, qubit):
+        """
+        Returns the density operator of this qubit. If the qubit is entangled,
+        the density operator will be in a mixed state.
+
+        Args:
+            qubit (Qubit): Qubit of the density operator.
+
+        Returns:
+            np.ndarray: The density operator of the qubit.
+        """
+        with StabilizerBackend._lock:
+            group = qubit.qubit.group
+            density_operator = _PAULIS[(0, 0)] / 2
+            for (x, z), pauli in _PAULIS.items():
+                if x or z:
+                    density_operator = density_operator + \
+                        group.expectation(qubit.qubit, x, z) * pauli / 2
+            return density_operator
+
+    def density_operators(self, qubits):
+        """
+        Returns the density operators of many qubits.
+
+        Args:
+            qubits (list): The qubits of the density operators.
+
+        Returns:
+            (list): The density operator of each qubit.
+        """
+        with StabilizerBackend._lock:
+            return [self.density_operator(q) for q in qubits]
+
+    def statevector(self, qubit):
+        """
+        Returns the statevector of the passed qubit. If the qubit is entangled to others,
+        the statevector of the whole entangled system is returned
+
+        Args:
+            qubit (Qubit): Qubit of the statevector.
+
+        Returns:
+            The statevector in the format of the backend.
+        """
+        raise EnvironmentError("The stabilizer backend does not store statevectors, "
+                               "use density_operator instead.")
+
+    def measure(self, qubit, non_destructive):
+        """
+        Perform a measurement on a qubit.
+
+        Args:
+            qubit (Qubit): Qubit which should be measured.
+            non_destructive (bool): If the qubit should be destroyed after measuring.
+
+        Returns:
+            The value which has been measured.
+        """
+        with StabilizerBackend._lock:
+            outcome = qubit.qubit.group.measure(qubit.qubit)
+            if not non_destructive:
+                qubit.qubit.group = None
+            return outcome
+
+    def release(self, qubit):
+        """
+        Releases the qubit.
+
+        Args:
+            qubit (Qubit): The qubit which should be released.
+        """
+        self.measure(qubit, False)
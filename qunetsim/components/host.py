@@ -1,15 +1,14 @@
 import math
-import time
-import uuid
 import warnings
 from queue import Queue, Empty
 
 from .network import Network
 from qunetsim.backends import EQSNBackend
 from qunetsim.components import protocols
-from qunetsim.objects import Logger, DaemonThread, Message, Packet, Qubit, QuantumStorage, ClassicalStorage, \
-    QuantumConnection, ClassicalConnection
+from qunetsim.objects import Logger, Message, Packet, Qubit, QuantumStorage, ClassicalStorage, \
+    QuantumConnection, ClassicalConnection, WorkerPool, AckTracker
 from qunetsim.utils.constants import Constants
+from qunetsim.utils.handles import new_id
 
 
 class Host(object):
@@ -17,42 +16,56 @@ class Host(object):
 
     WAIT_TIME = 10
 
-    def __init__(self, host_id, backend=None):
+    # Protocols which block while they wait for other packets. Packets of these
+    # protocols are processed in an own thread instead of the worker pool.
+    BLOCKING_PROTOCOLS = {Constants.SEND_TELEPORT, Constants.REC_TELEPORT,
+                          Constants.SEND_SUPERDENSE, Constants.REC_SUPERDENSE,
+                          Constants.SEND_KEY, Constants.REC_KEY}
+
+    def __init__(self, host_id, backend=None, network=None):
         """
         Return the most important thing about a person.
 
         Args:
             host_id: The ID of the host
             backend: The backend to use for this host
+            network: The network of the host, defaults to the default network instance.
+                     Without a backend, hosts of other networks use the backend of their network.
 
         """
         self._host_id = host_id
         self._packet_queue = Queue()
         self._stop_thread = False
         self._queue_processor_thread = None
-        self._qubit_storage = QuantumStorage()
-        self._classical_messages = ClassicalStorage()
+        self._network = network if network is not None else Network.get_instance()
+        self._clock = self._network.clock
+        self._worker_pool = WorkerPool(clock=self._clock)
+        self._qubit_storage = QuantumStorage(clock=self._clock)
+        self._classical_messages = ClassicalStorage(clock=self._clock)
         self._classical_connections = {}
         self._quantum_connections = {}
         if backend is None:
-            self._backend = EQSNBackend()
+            if network is None:
+                self._backend = EQSNBackend()
+            else:
+                self._backend = network.backend
         else:
             self._backend = backend
         # add this host to the backend
 
         self._backend.add_host(self)
         self._max_ack_wait = None
-        # Frequency of queue processing
-        self._delay = 0.1
+        self._lazy_gates = False
+        self._pauli_frame = False
+        # Delay of received packets
+        self._delay = 0
         self.logger = Logger.get_instance()
         # Packet sequence numbers per connection
         self._max_window = 10
-        # [Queue, sender, seq_num, timeout, start_time]
-        self._ack_receiver_queue = []
+        # ACKs received per sender and the threads waiting for them
+        self._ack_tracker = AckTracker(clock=self._clock)
         # sender: host -> int
         self._seq_number_sender = {}
-        # sender_ack: host->[received_list, low_number]
-        self._seq_number_sender_ack = {}
         # receiver: host->[received_list, low_number]
         self._seq_number_receiver = {}
         self.qkd_keys = {}
@@ -77,6 +90,41 @@ class Host(object):
     def backend(self):
         return self._backend
 
+    @property
+    def worker_pool(self):
+        """
+        Get the worker pool which processes the received packets.
+
+        Returns:
+            (WorkerPool): The worker pool of the host.
+        """
+        return self._worker_pool
+
+    @property
+    def network(self):
+        """
+        Get the network of the host.
+
+        Returns:
+            (Network): The network the host belongs to.
+        """
+        return self._network
+
+    @network.setter
+    def network(self, network):
+        """
+        Set the network of the host. Is set when the host is added to a network.
+
+        Args:
+            network (Network): The network the host belongs to.
+        """
+        self._network = network
+        self._clock = network.clock
+        self._qubit_storage.clock = network.clock
+        self._classical_messages.clock = network.clock
+        self._ack_tracker.clock = network.clock
+        self._worker_pool.clock = network.clock
+
     @property
     def classical_connections(self):
         """
@@ -112,9 +160,8 @@ class Host(object):
         """
         Reset all sequence numbers.
         """
-        self._ack_receiver_queue = []
+        self._ack_tracker.reset()
         self._seq_number_sender = {}
-        self._seq_number_sender_ack = {}
         self._seq_number_receiver = {}
         pass
 
@@ -125,7 +172,8 @@ class Host(object):
     @property
     def delay(self):
         """
-        Get the delay of the queue processor.
+        Get the delay of the queue processor. Received packets are processed
+        after this delay, measured against the clock of the network.
 
         Returns:
             (float): The delay per tick for the queue processor.
@@ -177,6 +225,55 @@ class Host(object):
 
         self._max_ack_wait = max_ack_wait
 
+    @property
+    def lazy_gates(self):
+        """
+        Get if single qubit gates on the qubits of the host are applied lazily.
+
+        Returns:
+            (bool): If single qubit gates are applied lazily.
+        """
+        return self._lazy_gates
+
+    @lazy_gates.setter
+    def lazy_gates(self, lazy_gates):
+        """
+        Set if single qubit gates on the qubits of the host are applied lazily.
+        The gates are then multiplied into one gate per qubit, which is only
+        applied when the state of the qubit is needed.
+
+        Args:
+            lazy_gates (bool): If single qubit gates are applied lazily.
+        """
+        if not isinstance(lazy_gates, bool):
+            raise Exception('lazy gates should be a boolean')
+        self._lazy_gates = lazy_gates
+
+    @property
+    def pauli_frame(self):
+        """
+        Get if Pauli gates on the qubits of the host are tracked in a Pauli frame.
+
+        Returns:
+            (bool): If a Pauli frame is tracked.
+        """
+        return self._pauli_frame
+
+    @pauli_frame.setter
+    def pauli_frame(self, pauli_frame):
+        """
+        Set if Pauli gates on the qubits of the host are tracked in a Pauli frame.
+        They are then recorded classically, moved through H, CNOT and CPHASE
+        gates and folded into the outcome of the next measurement. Other gates
+        apply the frame to the qubit first.
+
+        Args:
+            pauli_frame (bool): If a Pauli frame is tracked.
+        """
+        if not isinstance(pauli_frame, bool):
+            raise Exception('pauli frame should be a boolean')
+        self._pauli_frame = pauli_frame
+
     @property
     def storage_epr_limit(self):
         """
@@ -483,7 +580,7 @@ class Host(object):
                     sender = packet.sender
                     self.relay_sniffing_function(sender, receiver, transport_packet)
 
-        result = protocols.process(packet)
+        result = protocols.process(packet, self._network)
         if result is not None:  # classical message if not None
             msg = result
             if msg.content != Constants.ACK:
@@ -505,53 +602,26 @@ class Host(object):
             seq_num (int): The sequence number of the ack
         """
 
-        def check_task(q, _sender, _seq_num, timeout, start_time):
-            if timeout is not None and time.time() - timeout > start_time:
-                q.put(False)
-                return True
-            if _sender not in self._seq_number_sender_ack:
-                return False
-            if _seq_num < self._seq_number_sender_ack[_sender][1]:
-                q.put(True)
-                return True
-            if _seq_num in self._seq_number_sender_ack[_sender][0]:
-                q.put(True)
-                return True
-            return False
-
-        if sender not in self._seq_number_sender_ack:
-            self._seq_number_sender_ack[sender] = [[], 0]
-        expected_seq = self._seq_number_sender_ack[sender][1]
-        if seq_num == expected_seq:
-            self._seq_number_sender_ack[sender][1] += 1
-            expected_seq = self._seq_number_sender_ack[sender][1]
-            while len(self._seq_number_sender_ack[sender][0]) > 0 \
-                    and expected_seq in self._seq_number_sender_ack[sender][0]:
-                self._seq_number_sender_ack[sender][0].remove(
-                    expected_seq)
-                self._seq_number_sender_ack[sender][1] += 1
-                expected_seq += 1
-        elif seq_num > expected_seq:
-            self._seq_number_sender_ack[sender][0].append(seq_num)
-
-        for t in self._ack_receiver_queue:
-            res = check_task(*t)
-            if res is True:
-                self._ack_receiver_queue.remove(t)
+        self._ack_tracker.ack(sender, seq_num)
 
     def _process_queue(self):
         """
         Runs a thread for processing the packets in the packet queue.
         """
         self.logger.log('Host ' + self.host_id + ' started processing')
+        clock = self._clock
         while True:
-            packet = self._packet_queue.get()
+            packet = clock.get(self._packet_queue)
             if packet is None:
                 # stop thread
                 self._stop_thread = True
+                self._worker_pool.shutdown()
                 break
 
-            DaemonThread(self._process_packet, args=(packet,))
+            if packet.protocol in Host.BLOCKING_PROTOCOLS:
+                clock.start_thread(self._process_packet, (packet,))
+            else:
+                self._worker_pool.submit(self._process_packet, (packet,))
 
     def rec_packet(self, packet):
         """
@@ -560,7 +630,10 @@ class Host(object):
         Args:
             packet: Received packet.
         """
-        self._packet_queue.put(packet)
+        if packet is not None and self._delay > 0:
+            self._clock.call_later(self._delay, self._packet_queue.put, (packet,))
+        else:
+            self._packet_queue.put(packet)
 
     def add_c_connection(self, receiver_id):
         """
@@ -644,8 +717,7 @@ class Host(object):
             (bool): Success status of the removal
         """
         try:
-            network = Network.get_instance()
-            network.remove_c_connection(self.host_id, receiver_id)
+            self._network.remove_c_connection(self.host_id, receiver_id)
             del self.classical_connections[receiver_id]
             return True
         except KeyError:
@@ -665,8 +737,7 @@ class Host(object):
             (bool): Success status of the removal
         """
         try:
-            network = Network.get_instance()
-            network.remove_q_connection(self.host_id, receiver_id)
+            self._network.remove_q_connection(self.host_id, receiver_id)
             del self.quantum_connections[receiver_id]
             return True
         except KeyError:
@@ -734,25 +805,13 @@ class Host(object):
         Returns:
             (bool): The status of the ACK
         """
-
-        def wait():
-            nonlocal did_ack
-            did_ack = False
-            start_time = time.time()
-            q = Queue()
-            task = (q, sender, sequence_number, self._max_ack_wait, start_time)
-            self._ack_receiver_queue.append(task)
-            try:
-                did_ack = q.get(timeout=self._max_ack_wait)
-            except Empty:
-                did_ack = False
-                # remove this ACK from waiting list
-                self._process_ack(sender, sequence_number)
-            return
-
-        did_ack = False
-        wait()
-        return did_ack
+        q = self._ack_tracker.wait_for(sender, sequence_number, self._max_ack_wait)
+        try:
+            return self._clock.get(q, self._max_ack_wait)
+        except Empty:
+            # remove this ACK from waiting list
+            self._ack_tracker.timeout(sender, sequence_number)
+            return False
 
     def await_remaining_acks(self, sender):
         """
@@ -760,33 +819,28 @@ class Host(object):
 
         Args:
             sender (str): sender for which to wait for all acks.
+        Returns:
+            (list): The sequence numbers whose ACK did not arrive in time.
         """
-
-        def wait_multiple_seqs(seq_num_list):
-            queue_list = []
-            start_time = time.time()
-            for sequence_number in seq_num_list:
-                q = Queue()
-                task = (q, sender, sequence_number, self._max_ack_wait, start_time)
-                self._ack_receiver_queue.append(task)
-                queue_list.append(q)
-            ret_list = []
-            for q, seq_num in zip(queue_list, seq_num_list):
-                if q.get() is False:
-                    ret_list.append(seq_num)
-                    # remove this seq_num from waiting list
-                    self._process_ack(sender, seq_num)
-            return ret_list
-
         last_send_seq = self._seq_number_sender[sender]
-        lowest_waiting_seq = 0
-        all_remaining_acks = list(range(lowest_waiting_seq, last_send_seq + 1))
-        if sender in self._seq_number_sender_ack:
-            lowest_waiting_seq = self._seq_number_sender_ack[sender][1]
-            all_remaining_acks = list(range(lowest_waiting_seq, last_send_seq + 1))
-            for received_ack in self._seq_number_sender_ack[sender][0]:
-                all_remaining_acks.remove(received_ack)
-        return wait_multiple_seqs(all_remaining_acks)
+        seq_num_list = self._ack_tracker.pending(sender, last_send_seq)
+        queue_list = [self._ack_tracker.wait_for(sender, seq_num, self._max_ack_wait)
+                      for seq_num in seq_num_list]
+        deadline = None
+        if self._max_ack_wait is not None:
+            deadline = self._clock.time() + self._max_ack_wait
+        ret_list = []
+        for q, seq_num in zip(queue_list, seq_num_list):
+            timeout = None if deadline is None else max(0, deadline - self._clock.time())
+            try:
+                did_ack = self._clock.get(q, timeout)
+            except Empty:
+                did_ack = False
+                # remove this seq_num from waiting list
+                self._ack_tracker.timeout(sender, seq_num)
+            if did_ack is False:
+                ret_list.append(seq_num)
+        return ret_list
 
     def send_broadcast(self, message):
         """
@@ -856,7 +910,7 @@ class Host(object):
             (str, bool): If await_ack=True, return the ID of the EPR pair and the status of the ACK
         """
         if q_id is None:
-            q_id = str(uuid.uuid4())
+            q_id = new_id()
 
         seq_num = -1
         if no_ack:
@@ -1296,6 +1350,35 @@ class Host(object):
         else:
             self._qubit_storage.storage_limit = limit
 
+    def set_memory_model(self, memory_model):
+        """
+        Set the model of the quantum memory of the host, which acts on all stored
+        qubits. The model degrades qubits when they are taken from the memory,
+        and qubits which are stored for longer than its cutoff time are released.
+
+        Args:
+            memory_model (object): The memory model, for example *Coherence* or
+                                   *Cutoff*. None for a perfect memory.
+        """
+        self._qubit_storage.memory_model = memory_model
+
+    def set_classical_retention(self, max_messages_per_sender=None, max_age=None, compact_read=False):
+        """
+        Set which received classical messages are kept. By default, all messages
+        are kept for the whole simulation.
+
+        Args:
+            max_messages_per_sender (int): (optional) Only keep this many of the
+                                           latest messages of each sender.
+            max_age (float): (optional) Remove messages which are stored for longer
+                             than this many seconds.
+            compact_read (bool): Remove messages once they are read with
+                                 *get_next_classical*.
+        """
+        self._classical_messages.max_messages_per_sender = max_messages_per_sender
+        self._classical_messages.max_age = max_age
+        self._classical_messages.compact_read = compact_read
+
     def set_data_qubit_memory_limit(self, limit, host_id=None):
         """
         Set the limit to how many data qubits can be stored from host_id, or if host_id is not set,
@@ -1451,8 +1534,7 @@ class Host(object):
         if seq_num is not None:
             return self._get_message_w_seq_num(host_id, seq_num, wait)
 
-        cla = self._classical_messages.get_all_from_sender(host_id, wait)
-        return sorted(cla, key=lambda x: x.seq_num, reverse=True)
+        return self._classical_messages.get_all_from_sender(host_id, wait, ordered=True)
 
     def get_classical_any_host(self, seq_num=None, wait=0):
         if not isinstance(wait, float) and not isinstance(wait, int):
@@ -1461,8 +1543,7 @@ class Host(object):
         if seq_num is not None:
             return self._classical_messages.get_with_seq_num_from_any_sender(seq_num,wait)
         
-        cla = self._classical_messages.get_all_from_any_sender(wait)
-        return sorted(cla, key=lambda x: x.seq_num, reverse=True)
+        return self._classical_messages.get_all_from_any_sender(wait, ordered=True)
 
     def get_next_classical(self, sender_id, wait=-1):
         """
@@ -1555,7 +1636,7 @@ class Host(object):
         """
         Starts the host.
         """
-        self._queue_processor_thread = DaemonThread(target=self._process_queue)
+        self._queue_processor_thread = self._clock.start_thread(self._process_queue)
 
     def run_protocol(self, protocol, arguments=(), blocking=False):
         """
@@ -1571,9 +1652,9 @@ class Host(object):
         """
         arguments = (self,) + arguments
         if blocking:
-            DaemonThread(protocol, args=arguments).join()
+            self._clock.join(self._clock.start_thread(protocol, arguments))
         else:
-            return DaemonThread(protocol, args=arguments)
+            return self._clock.start_thread(protocol, arguments)
 
     def get_qubit_by_id(self, q_id):
         """
@@ -1629,10 +1710,10 @@ class Host(object):
         """
         if wait < 0:
             while receiver_id not in self.qkd_keys:
-                time.sleep(0.1)
+                self._clock.sleep(0.1)
         else:
             while receiver_id not in self.qkd_keys and wait > 0:
-                time.sleep(0.1)
+                self._clock.sleep(0.1)
                 wait = wait - 0.1
             if wait < 0:
                 return None
@@ -1,4 +1,5 @@
 import random
+import threading
 import time
 from inspect import signature
 from queue import Queue
@@ -7,19 +8,29 @@ import matplotlib.pyplot as plt
 import networkx as nx
 
 from qunetsim.backends import EQSNBackend
-from qunetsim.objects import Qubit, RoutingPacket, Logger, DaemonThread
+from qunetsim.objects import Qubit, RoutingPacket, Logger, DaemonThread, Clock, ForwardingTable
 from qunetsim.utils.constants import Constants
 
 
-# Network singleton
 class Network:
-    """ A network control singleton object. """
+    """
+    A network control object. The default network is shared through
+    *get_instance*. Further networks can be created with *Network()*; they are
+    isolated from the default network and from each other, which allows to run
+    several simulations in one process.
+    """
     __instance = None
 
     @staticmethod
     def get_instance():
+        """
+        Get the default network.
+
+        Returns:
+            (Network): The default network instance.
+        """
         if Network.__instance is None:
-            Network()
+            Network.__instance = Network()
         return Network.__instance
 
     @staticmethod
@@ -27,27 +38,52 @@ class Network:
         if Network.__instance is not None:
             Network.__instance.stop(True)
             Network.__instance = None
-        __instance = Network()
+        Network.__instance = Network()
 
     def __init__(self):
-        if Network.__instance is None:
-            self.ARP = {}
-            # The directed graph for the connections
-            self.classical_network = nx.DiGraph()
-            self.quantum_network = nx.DiGraph()
-            self._quantum_routing_algo = nx.shortest_path
-            self._classical_routing_algo = nx.shortest_path
-            self._use_hop_by_hop = True
-            self._packet_queue = Queue()
-            self._stop_thread = False
-            self._use_ent_swap = False
-            self._queue_processor_thread = None
-            self._delay = 0.1
-            self._packet_drop_rate = 0
-            self._backend = None
-            Network.__instance = self
-        else:
-            raise Exception('this is a singleton class')
+        self.ARP = {}
+        # The directed graph for the connections
+        self.classical_network = nx.DiGraph()
+        self.quantum_network = nx.DiGraph()
+        self._quantum_routing_algo = nx.shortest_path
+        self._classical_routing_algo = nx.shortest_path
+        self._use_hop_by_hop = True
+        self._packet_queue = Queue()
+        self._stop_thread = False
+        self._use_ent_swap = False
+        self._queue_processor_thread = None
+        self._use_link_dispatch = False
+        # (sender, receiver) -> packet queue of the link
+        self._link_queues = {}
+        self._link_queues_lock = threading.Lock()
+        self._delay = 0.1
+        self._packet_drop_rate = 0
+        self._backend = None
+        self._clock = Clock()
+        # Cached routes: (algorithm, source, destination) -> route
+        self._classical_route_cache = {}
+        self._quantum_route_cache = {}
+        self._route_cache_hits = 0
+        self._route_cache_misses = 0
+        # Next hop tables for hop by hop routing with the default algorithm
+        self._classical_forwarding = ForwardingTable(self.classical_network)
+        self._quantum_forwarding = ForwardingTable(self.quantum_network)
+
+    @property
+    def backend(self):
+        """
+        Get the backend of the network. If the network has no backend yet, the
+        default backend is created, which is isolated for networks other than
+        the default network.
+
+        Returns:
+            (Backend): The backend of the network.
+        """
+        if self._backend is None:
+            # Networks other than the default network must not share the
+            # registries of the default backend.
+            self._backend = EQSNBackend(isolated=self is not Network.__instance)
+        return self._backend
 
     @property
     def use_ent_swap(self):
@@ -79,6 +115,32 @@ class Network:
 
         self._use_hop_by_hop = should_use
 
+    @property
+    def use_link_dispatch(self):
+        """
+        Get the dispatch style of the network.
+
+        Returns:
+            If the network processes the packets of each link in parallel.
+        """
+        return self._use_link_dispatch
+
+    @use_link_dispatch.setter
+    def use_link_dispatch(self, should_use):
+        """
+        Set the dispatch style of the network. With link dispatch, the packets of
+        each (sender, receiver) pair are processed in order by their own worker,
+        so that independent links do not wait for each other's delay. Otherwise,
+        all packets are processed in order by one worker.
+
+        Args:
+            should_use (bool): If the network should process links in parallel or not
+        """
+        if not isinstance(should_use, bool):
+            raise Exception('use_link_dispatch should be a boolean value.')
+
+        self._use_link_dispatch = should_use
+
     @property
     def classical_routing_algo(self):
         """
@@ -95,6 +157,7 @@ class Network:
              algorithm (function): The routing function. Should return a list of host_ids which represents the route
         """
         self._classical_routing_algo = algorithm
+        self._classical_route_cache.clear()
 
     @property
     def quantum_routing_algo(self):
@@ -126,6 +189,7 @@ class Network:
                 "receiver address.")
 
         self._quantum_routing_algo = algorithm
+        self._quantum_route_cache.clear()
 
     @property
     def delay(self):
@@ -150,6 +214,43 @@ class Network:
 
         self._delay = delay
 
+    @property
+    def clock(self):
+        """
+        Get the clock of the network.
+
+        Returns:
+            (Clock): The clock which measures the time of the network.
+        """
+        return self._clock
+
+    @property
+    def use_virtual_time(self):
+        """
+        Get if the network runs in virtual time.
+
+        Returns:
+            (bool): If the network uses virtual time.
+        """
+        return self._clock.virtual
+
+    @use_virtual_time.setter
+    def use_virtual_time(self, should_use):
+        """
+        Set if the network runs in virtual time. In virtual time, packets are
+        scheduled with their delivery time and the clock jumps forward instead of
+        sleeping, so the delays of the network and of the hosts, as well as the
+        waiting times of the hosts, cost no real time. Should be set before hosts
+        are added and the network is started.
+
+        Args:
+            should_use (bool): If the network should use virtual time or not
+        """
+        if not isinstance(should_use, bool):
+            raise Exception('use_virtual_time should be a boolean value.')
+
+        self._clock.virtual = should_use
+
     @property
     def packet_drop_rate(self):
         """
@@ -174,6 +275,30 @@ class Network:
 
         self._packet_drop_rate = drop_rate
 
+    @property
+    def route_cache_info(self):
+        """
+        Get the statistics of the route cache.
+
+        Returns:
+            (dict): The amount of cache hits and misses and the amount of cached
+                    classical and quantum routes.
+        """
+        return {'hits': self._route_cache_hits,
+                'misses': self._route_cache_misses,
+                'classical_routes': len(self._classical_route_cache),
+                'quantum_routes': len(self._quantum_route_cache)}
+
+    def clear_route_cache(self):
+        """
+        Removes all cached routes. Has to be called if the graphs of the network
+        are changed directly instead of through the methods of the network.
+        """
+        self._classical_route_cache.clear()
+        self._quantum_route_cache.clear()
+        self._classical_forwarding.clear()
+        self._quantum_forwarding.clear()
+
     @property
     def arp(self):
         return self.ARP
@@ -191,6 +316,8 @@ class Network:
         """
 
         Logger.get_instance().debug('host added: ' + host.host_id)
+        if host.network is not self:
+            host.network = self
         self.ARP[host.host_id] = host
         self._update_network_graph(host)
 
@@ -216,16 +343,24 @@ class Network:
             del self.ARP[host.host_id]
             if self.quantum_network.has_node(host.host_id):
                 self.quantum_network.remove_node(host.host_id)
+                self._quantum_forwarding.node_removed(host.host_id)
             if self.classical_network.has_node(host.host_id):
                 self.classical_network.remove_node(host.host_id)
+                self._classical_forwarding.node_removed(host.host_id)
+            self._classical_route_cache.clear()
+            self._quantum_route_cache.clear()
 
     def remove_c_connection(self, sender, receiver):
         if self.classical_network.has_edge(sender, receiver):
             self.classical_network.remove_edge(sender, receiver)
+            self._classical_route_cache.clear()
+            self._classical_forwarding.edge_removed(sender, receiver)
 
     def remove_q_connection(self, sender, receiver):
         if self.quantum_network.has_edge(sender, receiver):
             self.quantum_network.remove_edge(sender, receiver)
+            self._quantum_route_cache.clear()
+            self._quantum_forwarding.edge_removed(sender, receiver)
 
     def remove_hosts(self, hosts):
         for host in hosts:
@@ -253,6 +388,8 @@ class Network:
 
         try:
             self.classical_network.remove_node(host.host_id)
+            self._classical_route_cache.clear()
+            self._classical_forwarding.node_removed(host.host_id)
         except nx.NetworkXError:
             Logger.get_instance().error(
                 'attempted to remove a non-exiting node from network')
@@ -274,11 +411,16 @@ class Network:
             if not self.classical_network.has_edge(host.host_id, connection):
                 edge = (host.host_id, connection, {'weight': 1})
                 self.classical_network.add_edges_from([edge])
+                self._classical_forwarding.edge_added(host.host_id, connection)
 
         for connection in host.quantum_connections:
             if not self.quantum_network.has_edge(host.host_id, connection):
                 edge = (host.host_id, connection, {'weight': 1})
                 self.quantum_network.add_edges_from([edge])
+                self._quantum_forwarding.edge_added(host.host_id, connection)
+
+        self._classical_route_cache.clear()
+        self._quantum_route_cache.clear()
 
     def shares_epr(self, sender, receiver):
         """
@@ -343,7 +485,8 @@ class Network:
         Returns:
             route (list): An ordered list of ID numbers on the shortest path from source to destination.
         """
-        return self.quantum_routing_algo(self.quantum_network, source, dest)
+        return self._get_route(self._quantum_route_cache, self.quantum_routing_algo,
+                               self.quantum_network, source, dest)
 
     def get_classical_route(self, source, dest):
         """
@@ -356,8 +499,36 @@ class Network:
         Returns:
             route (list): An ordered list of ID numbers on the shortest path from source to destination.
         """
-        return self.classical_routing_algo(self.classical_network, source,
-                                           dest)
+        return self._get_route(self._classical_route_cache, self.classical_routing_algo,
+                               self.classical_network, source, dest)
+
+    def _get_route(self, cache, algorithm, graph, source, dest):
+        """
+        Gets a route from the route cache, or calculates and caches it if it
+        is not cached yet.
+
+        Args:
+            cache (dict): The route cache of the graph
+            algorithm (function): The routing algorithm
+            graph (nx.DiGraph): The graph to route on
+            source (str): ID of the source host
+            dest (str): ID of the destination host
+
+        Returns:
+            route (list): An ordered list of ID numbers from source to destination.
+        """
+        key = (algorithm, source, dest)
+        route = cache.get(key)
+        if route is None:
+            self._route_cache_misses += 1
+            route = algorithm(graph, source, dest)
+            if route is None:
+                return None
+            route = list(route)
+            cache[key] = route
+        else:
+            self._route_cache_hits += 1
+        return list(route)
 
     def _entanglement_swap(self, sender, receiver, route, q_id, o_seq_num,
                            blocked):
@@ -385,11 +556,11 @@ class Network:
         # Create EPR pairs on the route, where all EPR qubits have the id q_id
         threads = []
         for i in range(len(route) - 1):
-            threads.append(DaemonThread(establish_epr,
-                                        args=(self, route[i], route[i + 1])))
+            threads.append(self._clock.start_thread(establish_epr,
+                                                    (self, route[i], route[i + 1])))
 
         for t in threads:
-            t.join()
+            self._clock.join(t)
 
         for i in range(len(route) - 2):
             host = self.get_host(route[i + 1])
@@ -487,7 +658,14 @@ class Network:
                                                         receiver, q)
             return True
 
-        route = self.get_quantum_route(sender, receiver)
+        if self.quantum_routing_algo is nx.shortest_path:
+            route = self._quantum_forwarding.route(sender, receiver)
+            if route is None:
+                Logger.get_instance().error(
+                    'transfer qubits - no quantum route from ' + sender + ' to ' + receiver)
+                return False
+        else:
+            route = self.get_quantum_route(sender, receiver)
         i = 0
         while i < len(route) - 1:
             Logger.get_instance().log(
@@ -516,85 +694,161 @@ class Network:
             if self.delay > 0:
                 time.sleep(self.delay)
 
-            # Simulate packet loss
-            packet_drop_var = random.random()
-            if packet_drop_var > (1 - self.packet_drop_rate):
-                Logger.get_instance().log("PACKET DROPPED")
-                if packet.payload_type == Constants.QUANTUM:
-                    packet.payload.release()
-                continue
+            self._process_packet(packet)
+
+    def _process_link_queue(self, link_queue):
+        """
+        Runs a thread for processing the packets of one link.
+
+        Args:
+            link_queue (Queue): The packet queue of the link
+        """
+
+        while True:
+
+            packet = link_queue.get()
+
+            if packet is None:
+                break
+
+            # Artificially delay the link
+            if self.delay > 0:
+                time.sleep(self.delay)
+
+            self._process_packet(packet)
+
+    def _get_link_queue(self, sender, receiver):
+        """
+        Gets the packet queue of a link and starts its worker if the link
+        has no queue yet.
+
+        Args:
+            sender (str): ID of the sender
+            receiver (str): ID of the receiver
+        Returns:
+            (Queue): The packet queue of the link
+        """
+        link = (sender, receiver)
+        link_queue = self._link_queues.get(link)
+        if link_queue is None:
+            with self._link_queues_lock:
+                link_queue = self._link_queues.get(link)
+                if link_queue is None:
+                    link_queue = Queue()
+                    DaemonThread(self._process_link_queue, args=(link_queue,))
+                    self._link_queues[link] = link_queue
+        return link_queue
+
+    def _stop_link_queues(self):
+        """
+        Stops the workers of all links.
+        """
+        with self._link_queues_lock:
+            for link_queue in self._link_queues.values():
+                link_queue.put(None)
+            self._link_queues = {}
+
+    def _process_packet(self, packet):
+        """
+        Delivers a packet which passed the delay of the network.
 
-            sender, receiver = packet.sender, packet.receiver
+        Args:
+            packet (Packet): The packet to deliver
+        """
 
+        # Simulate packet loss
+        packet_drop_var = random.random()
+        if packet_drop_var > (1 - self.packet_drop_rate):
+            Logger.get_instance().log("PACKET DROPPED")
             if packet.payload_type == Constants.QUANTUM:
-                if not self._route_quantum_info(sender, receiver,
-                                                [packet.payload]):
-                    continue
-
-            try:
-                if packet.protocol == Constants.RELAY and not self.use_hop_by_hop:
-                    full_route = packet.route
-                    route = full_route[full_route.index(sender):]
-                else:
-                    if packet.protocol == Constants.REC_EPR:
-                        route = self.get_classical_route(sender, receiver)
-                    else:
-                        route = self.get_classical_route(sender, receiver)
+                packet.payload.release()
+            return
 
-                if len(route) < 2:
-                    raise Exception('No route exists')
+        sender, receiver = packet.sender, packet.receiver
 
-                elif len(route) == 2:
-                    if packet.protocol != Constants.RELAY:
-                        if packet.protocol == Constants.REC_EPR:
-                            host_sender = self.get_host(sender)
-                            q = host_sender \
-                                .backend \
-                                .create_EPR(host_sender.host_id,
-                                            receiver,
-                                            q_id=packet.payload['q_id'],
-                                            block=packet.payload['blocked'])
-                            host_sender.add_epr(receiver, q)
-                        self.ARP[receiver].rec_packet(packet)
-                    else:
-                        self.ARP[receiver].rec_packet(packet.payload)
+        if packet.payload_type == Constants.QUANTUM:
+            if not self._route_quantum_info(sender, receiver,
+                                            [packet.payload]):
+                return
+
+        try:
+            if packet.protocol == Constants.RELAY and not self.use_hop_by_hop:
+                full_route = packet.route
+                route = full_route[full_route.index(sender):]
+            elif packet.protocol == Constants.RELAY and self.classical_routing_algo is nx.shortest_path:
+                # Hop by hop forwarding only needs the next hop, the rest of
+                # the route is decided by the next node.
+                next_hop = self._classical_forwarding.next_hop(sender, receiver)
+                if next_hop is None:
+                    raise Exception('No route exists')
+                route = [sender, next_hop] if next_hop == receiver else [sender, next_hop, receiver]
+            else:
+                if packet.protocol == Constants.REC_EPR:
+                    route = self.get_classical_route(sender, receiver)
                 else:
-                    if packet.protocol == Constants.REC_EPR:
-                        q_id = packet.payload['q_id']
-                        blocked = packet.payload['blocked']
-                        q_route = self.get_quantum_route(sender, receiver)
-
-                        if self.use_ent_swap:
-                            DaemonThread(self._entanglement_swap,
-                                         args=(sender, receiver, q_route, q_id,
-                                               packet.seq_num, blocked))
-                        else:
-                            DaemonThread(self._establish_epr,
-                                         args=(sender, receiver, q_id,
-                                               packet.seq_num, blocked))
+                    route = self.get_classical_route(sender, receiver)
+
+            if len(route) < 2:
+                raise Exception('No route exists')
 
+            elif len(route) == 2:
+                if packet.protocol != Constants.RELAY:
+                    if packet.protocol == Constants.REC_EPR:
+                        host_sender = self.get_host(sender)
+                        q = host_sender \
+                            .backend \
+                            .create_EPR(host_sender.host_id,
+                                        receiver,
+                                        q_id=packet.payload['q_id'],
+                                        block=packet.payload['blocked'])
+                        host_sender.add_epr(receiver, q)
+                    self.ARP[receiver].rec_packet(packet)
+                else:
+                    self.ARP[receiver].rec_packet(packet.payload)
+            else:
+                if packet.protocol == Constants.REC_EPR:
+                    q_id = packet.payload['q_id']
+                    blocked = packet.payload['blocked']
+                    q_route = self.get_quantum_route(sender, receiver)
+
+                    if self.use_ent_swap:
+                        self._clock.start_thread(self._entanglement_swap,
+                                                 (sender, receiver, q_route, q_id,
+                                                  packet.seq_num, blocked))
                     else:
-                        network_packet = self._encode(route, packet)
-                        self.ARP[route[1]].rec_packet(network_packet)
+                        self._clock.start_thread(self._establish_epr,
+                                                 (sender, receiver, q_id,
+                                                  packet.seq_num, blocked))
 
-            except nx.NodeNotFound:
-                Logger.get_instance().error(
-                    "route couldn't be calculated, node doesn't exist")
-            except ValueError:
-                Logger.get_instance().error(
-                    "route couldn't be calculated, value error")
-            except Exception as e:
-                Logger.get_instance().error('Error in network: ' + str(e))
+                else:
+                    network_packet = self._encode(route, packet)
+                    self.ARP[route[1]].rec_packet(network_packet)
+
+        except nx.NodeNotFound:
+            Logger.get_instance().error(
+                "route couldn't be calculated, node doesn't exist")
+        except ValueError:
+            Logger.get_instance().error(
+                "route couldn't be calculated, value error")
+        except Exception as e:
+            Logger.get_instance().error('Error in network: ' + str(e))
 
     def send(self, packet):
         """
-        Puts the packet to the packet queue of the network.
+        Puts the packet to the packet queue of the network, or of its link with
+        link dispatch. In virtual time, the packet is scheduled for delivery after
+        the delay of the network instead.
 
         Args:
             packet (Packet): Packet to be sent
         """
 
-        self._packet_queue.put(packet)
+        if packet is not None and self._clock.virtual:
+            self._clock.call_later(self.delay, self._process_packet, (packet,))
+        elif packet is not None and self._use_link_dispatch:
+            self._get_link_queue(packet.sender, packet.receiver).put(packet)
+        else:
+            self._packet_queue.put(packet)
 
     def stop(self, stop_hosts=False):
         """
@@ -608,8 +862,11 @@ class Network:
                     self.ARP[host].stop(release_qubits=True)
 
             self.send(None)  # Send None to queue to stop the queue
+            self._stop_link_queues()
+            self._clock.stop()
             if self._backend is not None:
                 self._backend.stop()
+                self._backend = None
         except Exception as e:
             Logger.get_instance().error(e)
 
@@ -619,9 +876,8 @@ class Network:
 
         """
         if backend is None:
-            self._backend = EQSNBackend()
-        else:
-            self._backend = backend
+            backend = self.backend
+        self._backend = backend
         if nodes is not None:
             self._backend.start(nodes=nodes)
         self._queue_processor_thread = DaemonThread(target=self._process_queue)
@@ -1,11 +1,9 @@
-from qunetsim.objects import Logger, Packet, Message, Qubit
+from qunetsim.objects import Logger, Packet, Message, Qubit, BellPair
 from qunetsim.components.network import Network
 from qunetsim.utils.constants import Constants
 import numpy as np
 import random
 
-network = Network.get_instance()
-
 
 def encode(sender, receiver, protocol, payload=None, payload_type='', sequence_num=-1, await_ack=False):
     """
@@ -28,66 +26,72 @@ def encode(sender, receiver, protocol, payload=None, payload_type='', sequence_n
     return packet
 
 
-def process(packet):
+def process(packet, network=None):
     """
     Decodes the packet and processes the packet according to the protocol in the packet header.
 
     Args:
         packet (Packet): Packet to be processed.
+        network (Network): The network in which the packet is processed. Defaults
+                           to the default network instance.
 
     Returns:
         Returns what protocol function returns.
 
     """
 
+    if network is None:
+        network = Network.get_instance()
+
     protocol = packet.protocol
     if protocol == Constants.SEND_TELEPORT:
-        return _send_teleport(packet)
+        return _send_teleport(packet, network)
     elif protocol == Constants.REC_TELEPORT:
-        return _rec_teleport(packet)
+        return _rec_teleport(packet, network)
     elif protocol == Constants.SEND_CLASSICAL:
-        return _send_classical(packet)
+        return _send_classical(packet, network)
     elif protocol == Constants.REC_CLASSICAL:
-        return _rec_classical(packet)
+        return _rec_classical(packet, network)
     elif protocol == Constants.REC_EPR:
-        return _rec_epr(packet)
+        return _rec_epr(packet, network)
     elif protocol == Constants.SEND_EPR:
-        return _send_epr(packet)
+        return _send_epr(packet, network)
     elif protocol == Constants.SEND_SUPERDENSE:
-        return _send_superdense(packet)
+        return _send_superdense(packet, network)
     elif protocol == Constants.REC_SUPERDENSE:
-        return _rec_superdense(packet)
+        return _rec_superdense(packet, network)
     elif protocol == Constants.SEND_QUBIT:
-        return _send_qubit(packet)
+        return _send_qubit(packet, network)
     elif protocol == Constants.REC_QUBIT:
-        return _rec_qubit(packet)
+        return _rec_qubit(packet, network)
     elif protocol == Constants.RELAY:
-        return _relay_message(packet)
+        return _relay_message(packet, network)
     elif protocol == Constants.SEND_KEY:
-        return _send_key(packet)
+        return _send_key(packet, network)
     elif protocol == Constants.REC_KEY:
-        return _rec_key(packet)
+        return _rec_key(packet, network)
     elif protocol == Constants.SEND_GHZ:
-        return _send_ghz(packet)
+        return _send_ghz(packet, network)
     elif protocol == Constants.REC_GHZ:
-        return _rec_ghz(packet)
+        return _rec_ghz(packet, network)
     elif protocol == Constants.SEND_W:
-        return _send_w(packet)
+        return _send_w(packet, network)
     elif protocol == Constants.REC_W:
-        return _rec_w(packet)
+        return _rec_w(packet, network)
     elif protocol == Constants.SEND_BROADCAST:
-        return _send_broadcast(packet)
+        return _send_broadcast(packet, network)
     else:
         Logger.get_instance().error('protocol not defined: ' + str(protocol))
 
 
-def _relay_message(packet):
+def _relay_message(packet, network):
     """
     Reduce TTL of network packet and if TTL > 0, sends the message to be relayed to the next
     node in the network and modifies the header.
 
     Args:
         packet (RoutingPacket): Packet to be relayed
+        network (Network): The network of the host
 
     """
     packet.ttl -= 1
@@ -97,7 +101,7 @@ def _relay_message(packet):
         Logger.get_instance().log('TTL Expired on packet')
 
 
-def _send_broadcast(packet):
+def _send_broadcast(packet, network):
     sender = packet.sender
     message = packet.payload
     host_sender = network.get_host(sender)
@@ -116,25 +120,27 @@ def _send_broadcast(packet):
             network.send(new_packet)
 
 
-def _send_classical(packet):
+def _send_classical(packet, network):
     """
     Sends a classical message to another host.
 
     Args:
        packet (Packet): The packet in which to transmit.
+       network (Network): The network of the host
 
     """
     packet.protocol = Constants.REC_CLASSICAL
     network.send(packet)
 
 
-def _rec_classical(packet):
+def _rec_classical(packet, network):
     """
     Receives a classical message packet , parses it into sequence number and message and sends an
     ACK message to receiver.
 
     Args:
         packet (Packet): The packet in which to receive.
+        network (Network): The network of the host
 
     Returns:
         dict : A dictionary consisting of 'message' and 'sequence number'
@@ -147,27 +153,29 @@ def _rec_classical(packet):
     else:
         # Send an ACK msg if seq_num is not -1, as long as not an ACK msg!
         if packet.seq_num != -1:
-            _send_ack(packet.sender, packet.receiver, packet.seq_num)
+            _send_ack(packet.sender, packet.receiver, packet.seq_num, network)
 
     return message
 
 
-def _send_qubit(packet):
+def _send_qubit(packet, network):
     """
     Transmit the qubit
     Args:
         packet (Packet): The packet in which to transmit.
+        network (Network): The network of the host
     """
     packet.protocol = Constants.REC_QUBIT
     network.send(packet)
 
 
-def _rec_qubit(packet):
+def _rec_qubit(packet, network):
     """
     Receive a packet containing qubit information (qubit is transmitted externally)
 
     Args:
         packet (Packet): The packet in which to receive.
+        network (Network): The network of the host
     """
     from_host = packet.sender
     receiver = packet.receiver
@@ -180,15 +188,16 @@ def _rec_qubit(packet):
     # Send ACK if seq_num is not -1
 
     if packet.seq_num != -1:
-        _send_ack(packet.sender, packet.receiver, packet.seq_num)
+        _send_ack(packet.sender, packet.receiver, packet.seq_num, network)
 
 
-def _send_teleport(packet):
+def _send_teleport(packet, network):
     """
     Does the measurements for teleportation of a qubit and sends the measurement results to another host.
 
     Args:
         packet (Packet): The packet in which to transmit.
+        network (Network): The network of the host
     """
 
     if 'node' in packet.payload:
@@ -216,11 +225,15 @@ def _send_teleport(packet):
         epr_teleport = host_sender.get_epr(packet.receiver, wait=Constants.WAIT_TIME)
 
     assert epr_teleport is not None
-    q.cnot(epr_teleport)
-    q.H()
+    measurements = BellPair.teleport(q, epr_teleport)
+    if measurements is not None:
+        m1, m2 = measurements
+    else:
+        q.cnot(epr_teleport)
+        q.H()
 
-    m1 = q.measure()
-    m2 = epr_teleport.measure()
+        m1 = q.measure()
+        m2 = epr_teleport.measure()
 
     data = {
         'measurements': [m1, m2],
@@ -245,13 +258,14 @@ def _send_teleport(packet):
     network.send(packet)
 
 
-def _rec_teleport(packet):
+def _rec_teleport(packet, network):
     """
     Receives a classical message and applies the required operations to EPR pair entangled with the sender to
     retrieve the teleported qubit.
 
     Args:
         packet (Packet): The packet in which to receive.
+        network (Network): The network of the host
     """
     host_receiver = network.get_host(packet.receiver)
     payload = packet.payload
@@ -280,31 +294,33 @@ def _rec_teleport(packet):
 
     # Always send ACK!
     if 'o_seq_num' in payload and 'ack' in payload:
-        _send_ack(epr_host, packet.receiver, payload['o_seq_num'])
+        _send_ack(epr_host, packet.receiver, payload['o_seq_num'], network)
 
     # Send an ACK if sequence number is not -1
     if packet.seq_num != -1:
-        _send_ack(packet.sender, packet.receiver, packet.seq_num)
+        _send_ack(packet.sender, packet.receiver, packet.seq_num, network)
 
 
-def _send_epr(packet):
+def _send_epr(packet, network):
     """
     Sends an EPR to another host in the network.
 
     Args:
         packet (Packet): The packet in which to transmit.
+        network (Network): The network of the host
     """
     packet.protocol = Constants.REC_EPR
     network.send(packet)
 
 
-def _rec_epr(packet):
+def _rec_epr(packet, network):
     """
     Receives a classical message packet , parses it into sequence number and message and sends an ACK message to
     receiver.
 
     Args:
         packet (Packet): The packet in which to receive.
+        network (Network): The network of the host
 
     Returns:
         dict : A dictionary consisting of 'message' and 'sequence number'
@@ -320,28 +336,30 @@ def _rec_epr(packet):
     host_receiver.add_epr(sender, q)
     # Send an ACK if sequence number is not -1
     if packet.seq_num != -1:
-        _send_ack(sender, receiver, packet.seq_num)
+        _send_ack(sender, receiver, packet.seq_num, network)
 
 
-def _send_ack(sender, receiver, seq_number):
+def _send_ack(sender, receiver, seq_number, network):
     """
     Send an acknowledge message from the sender to the receiver.
     Args:
         sender (str): The sender ID
         receiver (str): The receiver ID
         seq_number (int): The sequence number which to ACK
+        network (Network): The network of the host
     """
     Logger.get_instance().log('sending ACK:' + str(seq_number + 1) + ' from ' + receiver + " to " + sender)
     host_receiver = network.get_host(receiver)
     host_receiver.send_ack(sender, seq_number)
 
 
-def _send_superdense(packet):
+def _send_superdense(packet, network):
     """
     Encodes and sends a qubit to send a superdense message.
 
     Args:
         packet (Packet): The packet in which to transmit.
+        network (Network): The network of the host
     """
     sender = packet.sender
     receiver = packet.receiver
@@ -370,12 +388,13 @@ def _send_superdense(packet):
     network.send(packet)
 
 
-def _rec_superdense(packet):
+def _rec_superdense(packet, network):
     """
     Receives a superdense qubit and decodes it.
 
     Args:
        packet (Packet): The packet in which to receive.
+       network (Network): The network of the host
 
     Returns:
         dict: A dictionary consisting of decoded superdense message and sequence number
@@ -393,12 +412,12 @@ def _rec_superdense(packet):
 
     # Send ACK if seq_num is not -1
     if packet.seq_num != -1:
-        _send_ack(packet.sender, packet.receiver, packet.seq_num)
+        _send_ack(packet.sender, packet.receiver, packet.seq_num, network)
 
     return Message(packet.sender, _decode_superdense(q1, q2), packet.seq_num)
 
 
-def _send_key(packet):
+def _send_key(packet, network):
 
     def helper_recv(host, receive_from_id, buffer, sequence_nr):
         buffer.append(host.get_next_classical(receive_from_id, wait=-1))
@@ -462,12 +481,13 @@ def _send_key(packet):
     sender.qkd_keys[receiver.host_id] = (secret_key, attempt_counter)
 
 
-def _rec_key(packet):
+def _rec_key(packet, network):
     """
     Receive a QKD key.
 
     Args:
         packet (Packet): The incoming packet
+        network (Network): The network of the host
     """
 
     def helper_recv(host, receive_from_id, buffer, sequence_nr):
@@ -487,7 +507,7 @@ def _rec_key(packet):
     # Send ACK if seq_num is not -1
     # For QKD Ack is returned immediatley
     if packet.seq_num != -1:
-        _send_ack(packet.sender, packet.receiver, packet.seq_num)
+        _send_ack(packet.sender, packet.receiver, packet.seq_num, network)
 
     msg_buff = []
 
@@ -526,13 +546,14 @@ def _rec_key(packet):
     receiver.qkd_keys[sender.host_id] = (key_array, attempt_counter)
 
 
-def _send_ghz(packet):
+def _send_ghz(packet, network):
     """
     Gets GHZ qubits and distributes the to all hosts.
     One qubit is stored in own storage.
 
     Args:
         packet (Packet): The incoming packet
+        network (Network): The network of the host
 
     """
     host_list = packet.payload[Constants.HOSTS]
@@ -552,12 +573,13 @@ def _send_ghz(packet):
         network.send(new_packet)
 
 
-def _rec_ghz(packet):
+def _rec_ghz(packet, network):
     """
     Receives a GHZ state and stores it in quantum storage.
 
     Args:
         packet (Packet): The incoming packet
+        network (Network): The network of the host
     """
     from_host = packet.sender
     receiver = packet.receiver
@@ -567,16 +589,17 @@ def _rec_ghz(packet):
 
     # Send ACK if seq_num is not -1
     if packet.seq_num != -1:
-        _send_ack(packet.sender, packet.receiver, packet.seq_num)
+        _send_ack(packet.sender, packet.receiver, packet.seq_num, network)
 
 
-def _send_w(packet):
+def _send_w(packet, network):
     """
     Gets W qubits and distributes the to all hosts.
     One qubit is stored in own storage.
 
     Args:
         packet (Packet): The incoming packet
+        network (Network): The network of the host
 
     """
     host_list = packet.payload[Constants.HOSTS]
@@ -596,12 +619,13 @@ def _send_w(packet):
         network.send(new_packet)
 
 
-def _rec_w(packet):
+def _rec_w(packet, network):
     """
     Receives a W state and stores it in quantum storage.
 
     Args:
         packet (Packet): The incoming packet
+        network (Network): The network of the host
     """
     from_host = packet.sender
     receiver = packet.receiver
@@ -611,7 +635,7 @@ def _rec_w(packet):
 
     # Send ACK if seq_num is not -1
     if packet.seq_num != -1:
-        _send_ack(packet.sender, packet.receiver, packet.seq_num)
+        _send_ack(packet.sender, packet.receiver, packet.seq_num, network)
 
 
 def _encode_superdense(message, q):
@@ -2,6 +2,12 @@ from .storage import ClassicalStorage, QuantumStorage
 from .connections import QuantumConnection, ClassicalConnection
 from .message import Message
 from .qubit import Qubit
+from .bell_pair import BellPair
+from .circuit import Circuit
 from .daemon_thread import DaemonThread
 from .logger import Logger
 from .packets import Packet, RoutingPacket
+from .clock import Clock
+from .forwarding_table import ForwardingTable
+from .worker_pool import WorkerPool
+from .ack_tracker import AckTracker
@@ -0,0 +1,182 @@
+import heapq
+import itertools
+import threading
+from queue import Queue
+
+from qunetsim.objects.clock import Clock
+
+
+class AckTracker(object):
+    """
+    Keeps track of the ACKs a host received and of the threads waiting for them.
+
+    Per sender, the ACKs are stored as the lowest sequence number which is not
+    acknowledged yet and a bitmap of the ACKs which arrived out of order above it.
+    Waiting threads are indexed by sender and sequence number and the deadlines
+    of their timeouts are kept in a heap, so that processing an ACK does not
+    depend on the amount of waiting threads.
+    """
+
+    def __init__(self, clock=None):
+        """
+        Args:
+            clock (Clock): The clock against which timeouts are measured.
+                           Defaults to the wall clock.
+        """
+        self._clock = clock if clock is not None else Clock()
+        # sender -> lowest sequence number without ACK
+        self._low = {}
+        # sender -> bitmap, bit i is set if low + i is acknowledged
+        self._bitmap = {}
+        # (sender, seq_num) -> list of queues
+        self._waiters = {}
+        # (deadline, counter, sender, seq_num, queue)
+        self._deadlines = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def clock(self):
+        """
+        Get the clock against which timeouts are measured.
+
+        Returns:
+            (Clock): The clock of the tracker.
+        """
+        return self._clock
+
+    @clock.setter
+    def clock(self, clock):
+        """
+        Set the clock against which timeouts are measured.
+
+        Args:
+            clock (Clock): The new clock.
+        """
+        self._clock = clock
+
+    def ack(self, sender, seq_num):
+        """
+        Records the ACK of *sender* for *seq_num* and wakes its waiting threads.
+
+        Args:
+            sender (str): The sender of the ACK
+            seq_num (int): The sequence number of the ACK
+        """
+        with self._lock:
+            self._expire()
+            self._set_acked(sender, seq_num)
+            for q in self._waiters.pop((sender, seq_num), ()):
+                q.put(True)
+
+    def is_acked(self, sender, seq_num):
+        """
+        Returns if the ACK of *sender* for *seq_num* arrived.
+
+        Args:
+            sender (str): The sender of the ACK
+            seq_num (int): The sequence number of the ACK
+        Returns:
+            (bool): If the ACK arrived.
+        """
+        with self._lock:
+            return self._is_acked(sender, seq_num)
+
+    def wait_for(self, sender, seq_num, timeout=None):
+        """
+        Registers a waiter for the ACK of *sender* for *seq_num*. True is put into
+        the returned queue when the ACK arrives, False if it did not arrive within
+        *timeout*. A sequence number which timed out counts as acknowledged.
+
+        Args:
+            sender (str): The sender of the ACK
+            seq_num (int): The sequence number of the ACK
+            timeout (float): The maximum time to wait, None to wait forever.
+        Returns:
+            (Queue): The queue of the waiter.
+        """
+        q = Queue()
+        with self._lock:
+            self._expire()
+            if self._is_acked(sender, seq_num):
+                q.put(True)
+                return q
+            self._waiters.setdefault((sender, seq_num), []).append(q)
+            if timeout is not None:
+                heapq.heappush(self._deadlines, (self._clock.time() + timeout,
+                                                 next(self._counter), sender, seq_num, q))
+        return q
+
+    def timeout(self, sender, seq_num):
+        """
+        Gives up waiting for the ACK of *sender* for *seq_num*. The waiting threads
+        get False and the sequence number counts as acknowledged.
+
+        Args:
+            sender (str): The sender of the ACK
+            seq_num (int): The sequence number of the ACK
+        """
+        with self._lock:
+            for q in self._waiters.pop((sender, seq_num), ()):
+                q.put(False)
+            self._set_acked(sender, seq_num)
+
+    def pending(self, sender, last_seq_num):
+        """
+        Gets the sequence numbers up to *last_seq_num* without ACK of *sender*.
+
+        Args:
+            sender (str): The sender of the ACKs
+            last_seq_num (int): The highest sequence number sent
+        Returns:
+            (list): The sequence numbers without ACK in ascending order.
+        """
+        with self._lock:
+            low = self._low.get(sender, 0)
+            bitmap = self._bitmap.get(sender, 0)
+            return [seq_num for seq_num in range(low, last_seq_num + 1)
+                    if not bitmap >> (seq_num - low) & 1]
+
+    def reset(self):
+        """
+        Forgets all ACKs. Waiting threads get False.
+        """
+        with self._lock:
+            for queues in self._waiters.values():
+                for q in queues:
+                    q.put(False)
+            self._low = {}
+            self._bitmap = {}
+            self._waiters = {}
+            self._deadlines = []
+
+    def _is_acked(self, sender, seq_num):
+        low = self._low.get(sender, 0)
+        if seq_num < low:
+            return True
+        return bool(self._bitmap.get(sender, 0) >> (seq_num - low) & 1)
+
+    def _set_acked(self, sender, seq_num):
+        low = self._low.get(sender, 0)
+        if seq_num < low:
+            return
+        bitmap = self._bitmap.get(sender, 0) | (1 << (seq_num - low))
+        # Move the low mark over the run of acknowledged sequence numbers.
+        run = (bitmap ^ (bitmap + 1)).bit_length() - 1
+        self._low[sender] = low + run
+        self._bitmap[sender] = bitmap >> run
+
+    def _expire(self):
+        now = self._clock.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, sender, seq_num, q = heapq.heappop(self._deadlines)
+            queues = self._waiters.get((sender, seq_num))
+            if queues is None or q not in queues:
+                continue
+            queues.remove(q)
+            if not queues:
+                del self._waiters[(sender, seq_num)]
+            q.put(False)
+            self._set_acked(sender, seq_num)
+            for other in self._waiters.pop((sender, seq_num), ()):
+                other.put(True)
@@ -0,0 +1,301 @@
+import random
+import threading
+
+
+class BellPair(object):
+    """
+    An EPR pair which is stored as its Bell state instead of as two qubits of
+    the simulator of a backend. The state of the pair is
+    (X^x Z^z \\otimes I)|Phi+>, given by the Bell index (x, z).
+
+    Measurements, Pauli gates, teleportations over the pair and entanglement
+    swaps with *swap* are calculated in closed form. The pair is only created in
+    the simulator when any other operation needs one of its qubits, e.g. a Bell
+    measurement which is done with gates instead of with *swap*.
+    """
+
+    def __init__(self, x=0, z=0, werner=1.0):
+        """
+        Args:
+            x (int): The x bit of the Bell index.
+            z (int): The z bit of the Bell index.
+            werner (float): The Werner parameter of the pair. With probability
+                            1 - *werner*, the pair is in a uniformly random Bell
+                            state instead.
+        """
+        if not 0 <= werner <= 1:
+            raise ValueError('werner should be between 0 and 1')
+        if werner < 1 and random.random() > werner:
+            x, z = random.randint(0, 1), random.randint(0, 1)
+        self._x = x
+        self._z = z
+        self._werner = werner
+        # The Qubit objects of the two halves, None once a half is measured
+        self._qubits = [None, None]
+        # The values of the halves once one of them is measured
+        self._values = None
+        self._materialized = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def create(host_a, host_b, q_id=None, block=False, werner=1.0):
+        """
+        Creates the two qubits of a new Bell pair.
+
+        Args:
+            host_a (Host): The host of the first qubit.
+            host_b (Host): The host of the second qubit.
+            q_id (str): Optional id which both qubits should have.
+            block (bool): If the qubits should be blocked.
+            werner (float): The Werner parameter of the pair.
+        Returns:
+            (tuple): The qubit of host a and the qubit of host b.
+        """
+        from qunetsim.objects.qubit import Qubit
+
+        pair = BellPair(werner=werner)
+        q1 = Qubit(host_a, qubit=pair, q_id=q_id, blocked=block)
+        q2 = Qubit(host_b, qubit=pair, q_id=q1.id, blocked=block)
+        pair._qubits = [q1, q2]
+        return q1, q2
+
+    @property
+    def bell_index(self):
+        """
+        Get the Bell index of the pair.
+
+        Returns:
+            (tuple): The x and z bit of the Bell state.
+        """
+        return self._x, self._z
+
+    @property
+    def werner(self):
+        """
+        Get the Werner parameter the pair was created with.
+
+        Returns:
+            (float): The Werner parameter.
+        """
+        return self._werner
+
+    @property
+    def materialized(self):
+        """
+        Get if the pair is stored in the simulator of the backend.
+
+        Returns:
+            (bool): If the pair is stored in the simulator.
+        """
+        return self._materialized
+
+    def materialize(self):
+        """
+        Creates the qubits of the pair, which are not measured yet, in the
+        backend and assigns them to their Qubit objects.
+        """
+        with self._lock:
+            if self._materialized:
+                return
+            self._materialized = True
+            qubits = [q for q in self._qubits if q is not None]
+            if not qubits:
+                return
+            backend = qubits[0].host.backend
+            for q in qubits:
+                q.qubit = q.host.backend.create_qubit(q.host.host_id)
+            if self._values is not None:
+                for q in qubits:
+                    if self._values[self._qubits.index(q)]:
+                        backend.X(q)
+                return
+            first, second = self._qubits
+            backend.H(first)
+            backend.cnot(first, second)
+            if self._x:
+                backend.X(first)
+            if self._z:
+                backend.Z(first)
+
+    def apply_pauli(self, qubit, x, z):
+        """
+        Applies X^x Z^z to a qubit of the pair by changing its state.
+
+        Args:
+            qubit (Qubit): The qubit of the pair.
+            x (int): If an X gate is applied.
+            z (int): If a Z gate is applied.
+        Returns:
+            (bool): False if the pair is already stored in the simulator.
+        """
+        with self._lock:
+            if self._materialized:
+                return False
+            if self._values is not None:
+                self._values[self._qubits.index(qubit)] ^= x
+            else:
+                # A Pauli on the second qubit of |Phi+> equals the same Pauli,
+                # up to a phase, on the first one.
+                self._x ^= x
+                self._z ^= z
+            return True
+
+    def measure(self, qubit, non_destructive):
+        """
+        Measures a qubit of the pair in the computational basis.
+
+        Args:
+            qubit (Qubit): The qubit of the pair.
+            non_destructive (bool): If the qubit should stay in the pair.
+        Returns:
+            (int): The outcome, None if the pair is already stored in the
+            simulator.
+        """
+        with self._lock:
+            if self._materialized:
+                return None
+            if self._values is None:
+                value = random.randint(0, 1)
+                self._values = [value ^ self._x, value]
+            i = self._qubits.index(qubit)
+            if not non_destructive:
+                self._qubits[i] = None
+            return self._values[i]
+
+    def replace(self, qubit, other):
+        """
+        Replaces a Qubit object of the pair, e.g. when its state is teleported.
+
+        Args:
+            qubit (Qubit): The qubit of the pair.
+            other (Qubit): The qubit which takes its place.
+        """
+        with self._lock:
+            self._qubits[self._qubits.index(qubit)] = other
+            if self._materialized:
+                other.qubit = qubit._qubit
+
+    def partner(self, qubit):
+        """
+        Get the other qubit of the pair, if the pair is still in its Bell state.
+
+        Args:
+            qubit (Qubit): The qubit of the pair.
+        Returns:
+            (Qubit): The other qubit, None if the pair is stored in the simulator
+            or one of the qubits is measured.
+        """
+        with self._lock:
+            if self._materialized or self._values is not None:
+                return None
+            return self._qubits[1 - self._qubits.index(qubit)]
+
+    @staticmethod
+    def teleport(q, epr):
+        """
+        Teleports the state of qubit *q* over the Bell pair of qubit *epr* in
+        closed form. The other qubit of the pair takes over the state of *q* with
+        the Pauli corrections of the teleportation in its Pauli frame, so the
+        corrections applied by the receiver cancel them out.
+
+        Args:
+            q (Qubit): The qubit to teleport.
+            epr (Qubit): The qubit of the Bell pair of the sender.
+        Returns:
+            (tuple): The two measurement results of the sender, None if the pair
+            is stored in the simulator and the teleportation has to be done with
+            gates.
+        """
+        from qunetsim.objects.circuit import Circuit
+
+        pair = epr._qubit
+        if not isinstance(pair, BellPair) or q._qubit is pair or Circuit.active() is not None:
+            return None
+        if isinstance(q._qubit, BellPair):
+            # Teleporting a qubit of another pair is an entanglement swap
+            measurements = BellPair.swap(q, epr)
+            if measurements is not None:
+                return measurements
+        # The lock of the qubit is taken before the one of the pair, like when
+        # its pending gates are flushed.
+        with q._gate_lock:
+            return BellPair._teleport(q, epr, pair)
+
+    @staticmethod
+    def _teleport(q, epr, pair):
+        with pair._lock:
+            if pair._materialized or pair._values is not None:
+                return None
+            other = pair._qubits[1 - pair._qubits.index(epr)]
+            if epr._pending_gates or other._pending_gates:
+                return None
+            # The Pauli frames of both qubits are part of the Bell state
+            x = pair._x ^ epr._frame[0] ^ other._frame[0]
+            z = pair._z ^ epr._frame[1] ^ other._frame[1]
+            m1, m2 = random.randint(0, 1), random.randint(0, 1)
+            pair._qubits = [None, None]
+            pair._materialized = True
+            state = q._qubit
+            other._qubit = state
+            other._pending_gates = q._pending_gates
+            other._set_frame(q._frame[0] ^ x ^ m2, q._frame[1] ^ z ^ m1)
+        if isinstance(state, BellPair):
+            state.replace(q, other)
+        q._qubit = None
+        q._pending_gates = []
+        q._set_frame(0, 0)
+        epr._set_frame(0, 0)
+        return m1, m2
+
+    @staticmethod
+    def swap(q1, q2):
+        """
+        Does a Bell measurement of the qubits *q1* and *q2* of two different Bell
+        pairs in closed form, which is the entanglement swap of a repeater. The
+        other qubits of the two pairs then form a new Bell pair. Its Bell index
+        combines the indices of both pairs and the measurement results, and its
+        Werner parameter is the product of theirs. The results are the ones of
+        cnot(q1, q2) and H(q1) followed by measuring *q1* and *q2*, so X^m2 Z^m1
+        on either new qubit corrects the pair to |Phi+>.
+
+        Args:
+            q1 (Qubit): The qubit of the first pair.
+            q2 (Qubit): The qubit of the second pair.
+        Returns:
+            (tuple): The two measurement results, None if a pair is stored in the
+            simulator or measured and the swap has to be done with gates.
+        """
+        from qunetsim.objects.circuit import Circuit
+
+        pair_a, pair_b = q1._qubit, q2._qubit
+        if not isinstance(pair_a, BellPair) or not isinstance(pair_b, BellPair) \
+                or pair_a is pair_b or Circuit.active() is not None:
+            return None
+        # Qubit locks are taken before pair locks, both in a fixed order
+        first, second = sorted((q1, q2), key=lambda q: q.handle)
+        lock_a, lock_b = sorted((pair_a._lock, pair_b._lock), key=id)
+        with first._gate_lock, second._gate_lock, lock_a, lock_b:
+            if pair_a._materialized or pair_a._values is not None \
+                    or pair_b._materialized or pair_b._values is not None:
+                return None
+            a = pair_a._qubits[1 - pair_a._qubits.index(q1)]
+            b = pair_b._qubits[1 - pair_b._qubits.index(q2)]
+            if any(q._pending_gates for q in (q1, q2, a, b)):
+                return None
+            # The Pauli frames of the measured qubits are part of the Bell states
+            x = pair_a._x ^ pair_b._x ^ q1._frame[0] ^ q2._frame[0]
+            z = pair_a._z ^ pair_b._z ^ q1._frame[1] ^ q2._frame[1]
+            m1, m2 = random.randint(0, 1), random.randint(0, 1)
+            pair = BellPair(x ^ m2, z ^ m1)
+            # The noise of both pairs is already in their sampled Bell indices
+            pair._werner = pair_a._werner * pair_b._werner
+            pair._qubits = [a, b]
+            for old in (pair_a, pair_b):
+                old._qubits = [None, None]
+                old._materialized = True
+            a._qubit = pair
+            b._qubit = pair
+        for q in (q1, q2):
+            q._qubit = None
+            q._set_frame(0, 0)
+        return m1, m2
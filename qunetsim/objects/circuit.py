@@ -0,0 +1,97 @@
+import threading
+
+
+class Circuit(object):
+    """
+    Records the gates which the current thread applies to qubits and hands them
+    to the backends as one list of operations instead of one call per gate.
+
+    Gates applied to qubits inside of a ``with Circuit():`` block are recorded
+    and run when the block is left. Measurements, density operators and other
+    calls which need the state of the qubits run the recorded gates first.
+
+    An operation is a tuple of the name of the gate method of the backend and
+    its arguments, e.g. ``('H', q)``, ``('cnot', q1, q2)`` or ``('rx', q, phi)``.
+    """
+
+    _local = threading.local()
+
+    def __init__(self):
+        # (backend, operation) in the order the gates were applied
+        self._ops = []
+
+    def __enter__(self):
+        Circuit._stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        stack = Circuit._stack()
+        stack.remove(self)
+        if stack:
+            stack[-1]._ops.extend(self._ops)
+            self._ops = []
+        else:
+            self.run()
+        return False
+
+    @property
+    def ops(self):
+        """
+        Get the operations which are recorded and not run yet.
+
+        Returns:
+            (list): The recorded operations.
+        """
+        return [op for _, op in self._ops]
+
+    def record(self, backend, op):
+        """
+        Records an operation for *backend*.
+
+        Args:
+            backend (Backend): The backend of the qubits of the operation.
+            op (tuple): The name of the gate method and its arguments.
+        """
+        self._ops.append((backend, op))
+
+    def run(self):
+        """
+        Runs the recorded operations. The operations of each backend are passed
+        to its run_circuit method at once, in the order they were recorded.
+        """
+        ops, self._ops = self._ops, []
+        per_backend = {}
+        for backend, op in ops:
+            if id(backend) not in per_backend:
+                per_backend[id(backend)] = (backend, [])
+            per_backend[id(backend)][1].append(op)
+        for backend, backend_ops in per_backend.values():
+            backend.run_circuit(backend_ops)
+
+    @staticmethod
+    def active():
+        """
+        Get the circuit which records the gates of the current thread.
+
+        Returns:
+            (Circuit): The innermost circuit of the thread, None if there is none.
+        """
+        stack = getattr(Circuit._local, 'stack', None)
+        if stack:
+            return stack[-1]
+        return None
+
+    @staticmethod
+    def flush():
+        """
+        Runs the operations recorded by all circuits of the current thread.
+        """
+        for circuit in getattr(Circuit._local, 'stack', ()):
+            circuit.run()
+
+    @staticmethod
+    def _stack():
+        stack = getattr(Circuit._local, 'stack', None)
+        if stack is None:
+            stack = Circuit._local.stack = []
+        return stack
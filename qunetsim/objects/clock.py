@@ -0,0 +1,320 @@
+import heapq
+import itertools
+import threading
+import time
+from queue import Empty, Queue
+
+from qunetsim.objects.daemon_thread import DaemonThread
+
+
+class Clock(object):
+    """
+    The time source of a simulation.
+
+    By default the clock follows the wall clock. In virtual mode it is a
+    discrete-event scheduler: every event is stored in a priority queue with
+    the simulated time at which it happens, and the clock jumps forward to the
+    next event instead of sleeping. Simulated latency then costs no real time.
+
+    The time only moves forward when every simulation thread is blocked in
+    *get*, *sleep* or *join* of the clock. Simulation threads are the threads
+    started with *start_thread* and threads which called *attach*. They should
+    not block in any other way, the simulated time stands still while they do.
+    """
+
+    class _Timeout(object):
+        """
+        Put into the queue of a *get* call by its timer when the time is over.
+        Each call has its own, so that a timeout which fires while the item of
+        the call arrives is skipped by later calls on the same queue.
+        """
+        pass
+
+    class _Event(object):
+
+        def __init__(self, at, fn, args, is_timeout):
+            self.at = at
+            self.fn = fn
+            self.args = args
+            self.is_timeout = is_timeout
+            self.cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+    def __init__(self, virtual=False):
+        self._virtual = virtual
+        self._now = 0.0
+        self._events = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._dispatcher = None
+        self._stopped = False
+        # Simulation threads which are not blocked in the clock, and the queues
+        # the blocked ones are waiting on
+        self._busy = 0
+        self._waiting = []
+        self._local = threading.local()
+
+    @property
+    def virtual(self):
+        """
+        If the clock runs in virtual (simulated) time.
+
+        Returns:
+            (bool): True if the clock is virtual.
+        """
+        return self._virtual
+
+    @virtual.setter
+    def virtual(self, virtual):
+        """
+        Switch between wall clock and virtual time.
+
+        Args:
+            virtual (bool): True to use virtual time.
+        """
+        if not isinstance(virtual, bool):
+            raise ValueError('virtual should be a boolean value.')
+        with self._cond:
+            if self._events:
+                raise ValueError('The clock mode can not be changed while events are pending.')
+            self._virtual = virtual
+
+    def time(self):
+        """
+        The current time of the clock.
+
+        Returns:
+            (float): The current time in seconds.
+        """
+        if self._virtual:
+            return self._now
+        return time.time()
+
+    def call_later(self, delay, fn, args=(), is_timeout=False):
+        """
+        Calls *fn* with *args* after *delay* seconds. In virtual mode the call is
+        executed by the scheduler thread of the clock.
+
+        Args:
+            delay (float): The delay in seconds.
+            fn (function): The function to call.
+            args (tuple): The arguments of the function.
+            is_timeout (bool): If the event is a timeout. Pending timeouts
+                               still fire when the clock is stopped.
+        Returns:
+            An object with a *cancel* method to cancel the call.
+        """
+        if not self._virtual:
+            timer = threading.Timer(delay, fn, args=args)
+            timer.daemon = True
+            timer.start()
+            return timer
+
+        with self._cond:
+            event = Clock._Event(self._now + delay, fn, args, is_timeout)
+            heapq.heappush(self._events, (event.at, next(self._counter), event))
+            self._stopped = False
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = DaemonThread(target=self._dispatch)
+            self._cond.notify_all()
+        return event
+
+    def attach(self):
+        """
+        Makes the calling thread a simulation thread. The time of a virtual clock
+        does not move forward while the thread is working.
+        """
+        with self._cond:
+            self._busy += 1
+        self._local.attached = getattr(self._local, 'attached', 0) + 1
+
+    def detach(self):
+        """
+        Ends a call to *attach* of the calling thread.
+        """
+        self._local.attached -= 1
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify_all()
+
+    def start_thread(self, target, args=()):
+        """
+        Starts a simulation thread which runs *target* with *args*. The thread
+        counts as working as soon as this call returns.
+
+        Args:
+            target (function): The function the thread runs.
+            args (tuple): The arguments of the function.
+        Returns:
+            (DaemonThread): The thread.
+        """
+        done = Queue()
+        with self._cond:
+            self._busy += 1
+
+        def run():
+            self._local.attached = 1
+            try:
+                target(*args)
+            finally:
+                # Joining threads are woken while this one still counts as
+                # working, so the time can not move on in between.
+                done.put(True)
+                self.detach()
+
+        thread = DaemonThread(target=run)
+        thread.clock_done = done
+        return thread
+
+    def join(self, thread):
+        """
+        Waits until *thread* has finished. A thread started with *start_thread*
+        is waited for like in *get*.
+
+        Args:
+            thread (Thread): The thread to wait for.
+        """
+        done = getattr(thread, 'clock_done', None)
+        if done is not None:
+            self.get(done)
+            done.put(True)
+        thread.join()
+
+    def sleep(self, seconds):
+        """
+        Blocks the calling thread for *seconds*.
+
+        Args:
+            seconds (float): The time to sleep in seconds.
+        """
+        if not self._virtual:
+            time.sleep(seconds)
+            return
+        try:
+            self.get(Queue(), seconds)
+        except Empty:
+            pass
+
+    def get(self, q, timeout=None):
+        """
+        Gets an item from the queue *q*, waiting at most *timeout* seconds.
+
+        Args:
+            q (Queue): The queue to get the item from.
+            timeout (float): The maximum waiting time, None to wait forever.
+        Returns:
+            The item of the queue.
+        Raises:
+            Empty: If no item arrived in time.
+        """
+        if not self._virtual or timeout is None or timeout <= 0:
+            block = timeout is None or timeout > 0
+            deadline = None if self._virtual or timeout is None else time.time() + timeout
+            while True:
+                item = self._take(q, block, deadline)
+                if not isinstance(item, Clock._Timeout):
+                    return item
+
+        token = Clock._Timeout()
+        timer = self.call_later(timeout, q.put, (token,), is_timeout=True)
+        while True:
+            item = self._take(q)
+            if item is token:
+                raise Empty
+            if not isinstance(item, Clock._Timeout):
+                timer.cancel()
+                return item
+
+    def _take(self, q, block=True, deadline=None):
+        """
+        Takes the next item of the queue *q*. A simulation thread counts as
+        blocked while it waits, and as working again before the item is removed.
+
+        Args:
+            q (Queue): The queue.
+            block (bool): If the call should wait for an item.
+            deadline (float): The wall clock time until which to wait, None to
+                              wait forever.
+        Returns:
+            The item of the queue.
+        Raises:
+            Empty: If no item arrived in time.
+        """
+        with q.not_empty:
+            blocked = False
+            try:
+                while not q._qsize():
+                    if not block:
+                        raise Empty
+                    if not blocked and getattr(self._local, 'attached', 0):
+                        blocked = True
+                        with self._cond:
+                            self._busy -= 1
+                            self._waiting.append(q)
+                            self._cond.notify_all()
+                    if deadline is None:
+                        q.not_empty.wait()
+                    else:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            raise Empty
+                        q.not_empty.wait(remaining)
+            finally:
+                if blocked:
+                    with self._cond:
+                        self._busy += 1
+                        self._waiting.remove(q)
+            item = q._get()
+            q.not_full.notify()
+            return item
+
+    def _idle(self):
+        """
+        If all simulation threads are blocked and none of them is about to get
+        an item. Called with the lock of the clock.
+
+        Returns:
+            (bool): True if the time can move forward.
+        """
+        return self._busy <= 0 and not any(q._qsize() for q in self._waiting)
+
+    def stop(self):
+        """
+        Stops the scheduler of a virtual clock. Pending timeouts fire
+        immediately, all other pending events are dropped.
+        """
+        with self._cond:
+            events = [e for _, _, e in self._events if e.is_timeout and not e.cancelled]
+            self._events = []
+            self._stopped = True
+            self._cond.notify_all()
+        for event in events:
+            event.fn(*event.args)
+
+    def _dispatch(self):
+        """
+        Runs the events of a virtual clock in the order of their time.
+        """
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        self._dispatcher = None
+                        return
+                    while self._events and self._events[0][2].cancelled:
+                        heapq.heappop(self._events)
+                    if not self._events:
+                        self._cond.wait()
+                        continue
+                    event = self._events[0][2]
+                    if event.at > self._now and not self._idle():
+                        # Time only moves forward once no simulation thread can
+                        # schedule an earlier event anymore.
+                        self._cond.wait()
+                        continue
+                    heapq.heappop(self._events)
+                    self._now = max(self._now, event.at)
+                    break
+            event.fn(*event.args)
@@ -1,2 +1,5 @@
 from .fibre import Fibre
 from .binary_erasure import BinaryErasure
+from .depolarizing import Depolarizing
+from .dephasing import Dephasing
+from .amplitude_damping import AmplitudeDamping
@@ -0,0 +1,69 @@
+import math
+import random
+
+
+class AmplitudeDamping(object):
+    """
+    The model for an amplitude damping quantum channel.
+    """
+
+    def __init__(self, gamma=0.0):
+        if not isinstance(gamma, int) and not isinstance(gamma, float):
+            raise ValueError("Gamma must be float or int")
+        elif gamma < 0 or gamma > 1:
+            raise ValueError("Gamma must lie in the interval [0, 1]")
+        else:
+            self._gamma = gamma
+
+    @property
+    def gamma(self):
+        """
+        Probability that the state |1> of a qubit decays to |0>
+
+        Returns
+            (float) : The decay probability of the channel
+        """
+        return self._gamma
+
+    @gamma.setter
+    def gamma(self, gamma):
+        """
+        Set the decay probability of the channel
+
+        Args
+            gamma (float) : The decay probability of the channel
+        """
+        if not isinstance(gamma, int) and not isinstance(gamma, float):
+            raise ValueError("Gamma must be float or int")
+        elif gamma < 0 or gamma > 1:
+            raise ValueError("Gamma must lie in the interval [0, 1]")
+        else:
+            self._gamma = gamma
+
+    def qubit_func(self, qubit):
+        """
+        Function to modify the qubit based on channel properties
+        In this case - Damps the amplitude of the qubit. Backends without noise channels
+        apply the Pauli twirl of the channel instead, which applies X and Y with
+        probability gamma/4 each and Z with probability (2 - gamma - 2 sqrt(1 - gamma))/4.
+        Required in all channel models
+
+        Returns
+            (object) : Modified qubit
+        """
+        if qubit is None:
+            return None
+        backend = qubit.host.backend
+        if hasattr(backend, 'amplitude_damp'):
+            qubit.apply_noise('amplitude_damp', self._gamma)
+            return qubit
+        p_xy = self._gamma / 4
+        p_z = (2 - self._gamma - 2 * math.sqrt(1 - self._gamma)) / 4
+        r = random.random()
+        if r < p_xy:
+            qubit.X()
+        elif r < 2 * p_xy:
+            qubit.Y()
+        elif r < 2 * p_xy + p_z:
+            qubit.Z()
+        return qubit
@@ -0,0 +1,59 @@
+import random
+
+
+class Dephasing(object):
+    """
+    The model for a dephasing quantum channel.
+    """
+
+    def __init__(self, probability=0.0):
+        if not isinstance(probability, int) and not isinstance(probability, float):
+            raise ValueError("Dephasing probability must be float or int")
+        elif probability < 0 or probability > 1:
+            raise ValueError("Dephasing probability must lie in the interval [0, 1]")
+        else:
+            self._p = probability
+
+    @property
+    def dephasing_probability(self):
+        """
+        Probability of a phase flip of the qubit
+
+        Returns
+            (float) : Probability that a Z gate is applied during transmission
+        """
+        return self._p
+
+    @dephasing_probability.setter
+    def dephasing_probability(self, probability):
+        """
+        Set the dephasing probability of the channel
+
+        Args
+            probability (float) : Probability that a Z gate is applied during transmission
+        """
+        if not isinstance(probability, int) and not isinstance(probability, float):
+            raise ValueError("Dephasing probability must be float or int")
+        elif probability < 0 or probability > 1:
+            raise ValueError("Dephasing probability must lie in the interval [0, 1]")
+        else:
+            self._p = probability
+
+    def qubit_func(self, qubit):
+        """
+        Function to modify the qubit based on channel properties
+        In this case - Dephases the qubit. Backends without noise channels apply a Z
+        gate with the dephasing probability instead.
+        Required in all channel models
+
+        Returns
+            (object) : Modified qubit
+        """
+        if qubit is None:
+            return None
+        backend = qubit.host.backend
+        if hasattr(backend, 'dephase'):
+            qubit.apply_noise('dephase', self._p)
+        elif random.random() < self._p:
+            qubit.Z()
+        return qubit
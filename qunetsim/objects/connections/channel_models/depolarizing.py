@@ -0,0 +1,59 @@
+import random
+
+
+class Depolarizing(object):
+    """
+    The model for a depolarizing quantum channel.
+    """
+
+    def __init__(self, probability=0.0):
+        if not isinstance(probability, int) and not isinstance(probability, float):
+            raise ValueError("Depolarizing probability must be float or int")
+        elif probability < 0 or probability > 1:
+            raise ValueError("Depolarizing probability must lie in the interval [0, 1]")
+        else:
+            self._p = probability
+
+    @property
+    def depolarizing_probability(self):
+        """
+        Probability that the state of a qubit is replaced by the maximally mixed state
+
+        Returns
+            (float) : The depolarizing probability of the channel
+        """
+        return self._p
+
+    @depolarizing_probability.setter
+    def depolarizing_probability(self, probability):
+        """
+        Set the depolarizing probability of the channel
+
+        Args
+            probability (float) : The depolarizing probability of the channel
+        """
+        if not isinstance(probability, int) and not isinstance(probability, float):
+            raise ValueError("Depolarizing probability must be float or int")
+        elif probability < 0 or probability > 1:
+            raise ValueError("Depolarizing probability must lie in the interval [0, 1]")
+        else:
+            self._p = probability
+
+    def qubit_func(self, qubit):
+        """
+        Function to modify the qubit based on channel properties
+        In this case - Depolarizes the qubit. Backends without noise channels apply a
+        random Pauli gate with probability 3/4 of the depolarizing probability instead.
+        Required in all channel models
+
+        Returns
+            (object) : Modified qubit
+        """
+        if qubit is None:
+            return None
+        backend = qubit.host.backend
+        if hasattr(backend, 'depolarize'):
+            qubit.apply_noise('depolarize', self._p)
+        elif random.random() < 0.75 * self._p:
+            random.choice([qubit.X, qubit.Y, qubit.Z])()
+        return qubit
@@ -0,0 +1,136 @@
+import threading
+from collections import deque
+
+
+class ForwardingTable(object):
+    """
+    Next hop tables of a directed network graph for hop by hop routing.
+
+    The table of a source is calculated with a breadth first search, which
+    gives routes of the same length as the default shortest path routing.
+    When the graph changes, only the tables of the sources whose shortest path
+    tree is affected are dropped. They are calculated again when needed.
+    """
+
+    def __init__(self, graph):
+        """
+        Args:
+            graph (nx.DiGraph): The graph to route on.
+        """
+        self._graph = graph
+        # source -> (distance dict, parent dict, next hop dict)
+        self._tables = {}
+        self._built = False
+        self._lock = threading.Lock()
+
+    def next_hop(self, source, dest):
+        """
+        Gets the next hop on a shortest route from *source* to *dest*.
+
+        Args:
+            source (str): ID of the source host
+            dest (str): ID of the destination host
+        Returns:
+            (str): The ID of the next hop, or None if *dest* is not reachable.
+        """
+        with self._lock:
+            table = self._get_table(source)
+            if table is None:
+                return None
+            return table[2].get(dest)
+
+    def route(self, source, dest):
+        """
+        Gets a shortest route from *source* to *dest*.
+
+        Args:
+            source (str): ID of the source host
+            dest (str): ID of the destination host
+        Returns:
+            (list): The route from source to destination, or None if *dest* is
+            not reachable.
+        """
+        with self._lock:
+            table = self._get_table(source)
+            if table is None or dest not in table[1]:
+                return None
+            parent = table[1]
+            route = [dest]
+            while route[-1] != source:
+                route.append(parent[route[-1]])
+            route.reverse()
+            return route
+
+    def edge_added(self, u, v):
+        """
+        Updates the tables after the edge from *u* to *v* was added.
+
+        Args:
+            u (str): ID of the start of the edge
+            v (str): ID of the end of the edge
+        """
+        with self._lock:
+            for source, (dist, _, _) in list(self._tables.items()):
+                if u in dist and (v not in dist or dist[u] + 1 < dist[v]):
+                    del self._tables[source]
+
+    def edge_removed(self, u, v):
+        """
+        Updates the tables after the edge from *u* to *v* was removed.
+
+        Args:
+            u (str): ID of the start of the edge
+            v (str): ID of the end of the edge
+        """
+        with self._lock:
+            for source, (_, parent, _) in list(self._tables.items()):
+                if v != source and parent.get(v) == u:
+                    del self._tables[source]
+
+    def node_removed(self, node):
+        """
+        Updates the tables after *node* was removed.
+
+        Args:
+            node (str): ID of the removed node
+        """
+        with self._lock:
+            for source, (dist, _, _) in list(self._tables.items()):
+                if node in dist:
+                    del self._tables[source]
+
+    def clear(self):
+        """
+        Drops all tables.
+        """
+        with self._lock:
+            self._tables = {}
+            self._built = False
+
+    def _get_table(self, source):
+        if not self._built:
+            # Build the tables of all sources in one pass.
+            for node in self._graph.nodes:
+                if node not in self._tables:
+                    self._tables[node] = self._search(node)
+            self._built = True
+        table = self._tables.get(source)
+        if table is None and self._graph.has_node(source):
+            table = self._search(source)
+            self._tables[source] = table
+        return table
+
+    def _search(self, source):
+        dist = {source: 0}
+        parent = {source: None}
+        next_hop = {}
+        nodes = deque([source])
+        while nodes:
+            node = nodes.popleft()
+            for neighbour in self._graph.successors(node):
+                if neighbour not in dist:
+                    dist[neighbour] = dist[node] + 1
+                    parent[neighbour] = node
+                    next_hop[neighbour] = neighbour if node == source else next_hop[node]
+                    nodes.append(neighbour)
+        return dist, parent, next_hop
@@ -1,7 +1,42 @@
-import uuid
+import threading
+import weakref
 import numpy as np
 import scipy
 
+from qunetsim.objects.bell_pair import BellPair
+from qunetsim.objects.circuit import Circuit
+from qunetsim.utils.handles import new_handle, handle_to_id
+
+
+def _rotation(axis, phi):
+    c, s = np.cos(phi / 2), np.sin(phi / 2)
+    if axis == 'x':
+        return np.array([[c, -1j * s], [-1j * s, c]])
+    if axis == 'y':
+        return np.array([[c, -s], [s, c]])
+    return np.array([[np.exp(-0.5j * phi), 0], [0, np.exp(0.5j * phi)]])
+
+
+# The single qubit gate methods of the backends, as functions of the gate
+# arguments which return the unitary of the gate.
+SINGLE_QUBIT_GATES = {
+    'I': lambda: np.eye(2),
+    'X': lambda: np.array([[0, 1], [1, 0]]),
+    'Y': lambda: np.array([[0, -1j], [1j, 0]]),
+    'Z': lambda: np.array([[1, 0], [0, -1]]),
+    'H': lambda: np.array([[1, 1], [1, -1]]) / np.sqrt(2),
+    'K': lambda: 0.5 * np.array([[1 + 1j, 1 - 1j], [-1 + 1j, -1 - 1j]]),
+    'S': lambda: np.array([[1, 0], [0, 1j]]),
+    'T': lambda: np.array([[1, 0], [0, np.exp(0.25j * np.pi)]]),
+    'rx': lambda phi: _rotation('x', phi),
+    'ry': lambda phi: _rotation('y', phi),
+    'rz': lambda phi: _rotation('z', phi),
+    'custom_gate': lambda gate: gate,
+}
+
+# The x and z bits of the Pauli gates, up to a global phase.
+_PAULIS = {'I': (0, 0), 'X': (1, 0), 'Y': (1, 1), 'Z': (0, 1)}
+
 
 class Qubit(object):
     """
@@ -14,13 +49,22 @@ class Qubit(object):
     GHZ_QUBIT = "GHZ"
     W_QUBIT = "W"
 
+    # The qubits with pending lazy gates or Pauli frames.
+    _pending_qubits = weakref.WeakSet()
+    _pending_lock = threading.Lock()
+
     def __init__(self, host, qubit=None, q_id=None, blocked=False):
         self._blocked = blocked
         self._host = host
-        if q_id is not None:
-            self._id = str(q_id)
-        else:
-            self._id = str(uuid.uuid4())
+        # (gate, *args) of the single qubit gates which are not applied yet
+        self._pending_gates = []
+        # (x, z) bits of the Pauli correction which is not applied yet
+        self._frame = (0, 0)
+        # Guards the pending gates and the frame, which other threads flush
+        self._gate_lock = threading.RLock()
+        self._handle = new_handle()
+        # The ID given to the qubit, None if the ID is derived from the handle
+        self._id = str(q_id) if q_id is not None else None
         if qubit is not None:
             self._qubit = qubit
         else:
@@ -44,8 +88,31 @@ class Qubit(object):
         Returns:
             Id of the qubit.
         """
+        if self._id is None:
+            return handle_to_id(self._handle)
         return self._id
 
+    @property
+    def named(self):
+        """
+        Give if the qubit has an ID of its own. The ID of a qubit without one
+        is derived from its handle, and only created when it is read.
+
+        Returns:
+            (bool): If the ID of the qubit was given to it.
+        """
+        return self._id is not None
+
+    @property
+    def handle(self):
+        """
+        Give the integer handle of the qubit, which is unique in the process.
+
+        Returns:
+            (int): The handle of the qubit.
+        """
+        return self._handle
+
     @property
     def blocked(self):
         """
@@ -64,6 +131,8 @@ class Qubit(object):
         Returns:
             (backend.qubit) qubit: Return the physical qubit.
         """
+        if isinstance(self._qubit, BellPair):
+            self._qubit.materialize()
         return self._qubit
 
     @qubit.setter
@@ -113,6 +182,8 @@ class Qubit(object):
         Args:
             receiver_id (str): ID of Host the qubit should be send to.
         """
+        self.flush_gates()
+        Circuit.flush()
         self._host.backend.send_qubit_to(self, self._host.host_id, receiver_id)
 
     def fidelity(self, other_qubit):
@@ -125,9 +196,16 @@ class Qubit(object):
         Returns:
             (float) The quantum fidelity between this and the given qubit.
         """
-
-        self_density_mat = self.density_operator()
-        other_density_mat = other_qubit.density_operator()
+        for qubit in (self, other_qubit):
+            qubit.flush_frame()
+            qubit.flush_gates()
+        Circuit.flush()
+        backend = self._host.backend
+        if backend is other_qubit.host.backend and hasattr(backend, 'density_operators'):
+            self_density_mat, other_density_mat = backend.density_operators([self, other_qubit])
+        else:
+            self_density_mat = self.density_operator()
+            other_density_mat = other_qubit.density_operator()
         root_squared_self_density_mat = scipy.linalg.fractional_matrix_power(self_density_mat, .5)
         main_matrix = np.matmul(
             np.matmul(
@@ -147,49 +225,221 @@ class Qubit(object):
         """
         Releases a qubit from the system.
         """
+        if self._frame != (0, 0):
+            self._set_frame(0, 0)
+        self.flush_gates()
+        Circuit.flush()
+        if isinstance(self._qubit, BellPair) and self._qubit.measure(self, False) is not None:
+            # The other qubit of the pair is left in the same mixed state
+            return
         self._host.backend.release(self)
 
+    def apply_noise(self, channel, *args):
+        """
+        Applies the noise channel method *channel* of the backend with *args*.
+        The channel acts on the physical qubit, so the Pauli frame and the
+        pending gates of the qubit are applied first.
+
+        Args:
+            channel (str): The name of the noise channel method of the backend.
+            args: The further arguments of the channel method.
+        """
+        self.flush_frame()
+        self.flush_gates()
+        Circuit.flush()
+        getattr(self._host.backend, channel)(self, *args)
+
+    def flush_gates(self):
+        """
+        Applies the single qubit gates which are pending because the host applies
+        gates lazily. More than one pending gate are applied as their product,
+        which is skipped if it is the identity up to a global phase.
+        """
+        with self._gate_lock:
+            if not self._pending_gates:
+                return
+            ops, self._pending_gates = self._pending_gates, []
+            self._update_pending()
+            if len(ops) == 1:
+                self._dispatch(*ops[0])
+                return
+            gate = np.eye(2)
+            for op in ops:
+                gate = np.dot(SINGLE_QUBIT_GATES[op[0]](*op[1:]), gate)
+            if not np.allclose(gate, gate[0, 0] * np.eye(2)):
+                self._dispatch('custom_gate', gate)
+
+    def flush_frame(self):
+        """
+        Applies the Pauli corrections which are tracked in the Pauli frame of the
+        qubit to the qubit.
+        """
+        with self._gate_lock:
+            x, z = self._frame
+            if not x and not z:
+                return
+            self._set_frame(0, 0)
+            if x:
+                self._apply_physical('X')
+            if z:
+                self._apply_physical('Z')
+
+    @staticmethod
+    def flush_all_gates(backend=None):
+        """
+        Applies the pending single qubit gates and Pauli frames of all qubits.
+        Each qubit is flushed under its lock, so gates which other threads add
+        to it at the same time are neither lost nor reordered.
+
+        Args:
+            backend (object): Optional, only the qubits of this backend are
+                              flushed.
+        """
+        with Qubit._pending_lock:
+            qubits = list(Qubit._pending_qubits)
+        for qubit in qubits:
+            if backend is not None and qubit._host.backend is not backend:
+                continue
+            qubit.flush_frame()
+            qubit.flush_gates()
+
+    def _update_pending(self):
+        with Qubit._pending_lock:
+            if self._pending_gates or self._frame != (0, 0):
+                Qubit._pending_qubits.add(self)
+            else:
+                Qubit._pending_qubits.discard(self)
+
+    def _set_frame(self, x, z):
+        self._frame = (x, z)
+        self._update_pending()
+
+    def _propagate_frame(self, gate, qubits):
+        """
+        Moves the Pauli frame of the qubits of a Clifford gate behind the gate.
+
+        Args:
+            gate (str): The name of the gate method of the backend.
+            qubits (list): The other qubits of the gate.
+        Returns:
+            (bool): If the frame could be moved, otherwise it has to be applied.
+        """
+        if gate == 'H':
+            self._set_frame(self._frame[1], self._frame[0])
+            return True
+        if gate not in ('cnot', 'cphase'):
+            return False
+        (cx, cz), (tx, tz) = self._frame, qubits[0]._frame
+        if gate == 'cnot':
+            # X on the control spreads to the target, Z on the target to the control
+            self._set_frame(cx, cz ^ tz)
+            qubits[0]._set_frame(tx ^ cx, tz)
+        else:
+            # X on one qubit of a cphase adds a Z to the other one
+            self._set_frame(cx, cz ^ tx)
+            qubits[0]._set_frame(tx, tz ^ cx)
+        return True
+
+    def _apply(self, gate, *args):
+        """
+        Applies the gate method *gate* of the backend with *args*. If the host
+        tracks a Pauli frame, or the qubit has one from a teleportation, Pauli
+        gates are only recorded in the frame. Single qubit gates are kept pending
+        if the host applies gates lazily.
+
+        Args:
+            gate (str): The name of the gate method of the backend.
+            args: The further arguments of the gate method.
+        """
+        qubits = [arg for arg in args if isinstance(arg, Qubit)]
+        if gate in _PAULIS and (self._host.pauli_frame or self._frame != (0, 0)):
+            x, z = _PAULIS[gate]
+            with self._gate_lock:
+                self._set_frame(self._frame[0] ^ x, self._frame[1] ^ z)
+            return
+        if not (self._host.pauli_frame and self._propagate_frame(gate, qubits)):
+            self.flush_frame()
+            for qubit in qubits:
+                qubit.flush_frame()
+        self._apply_physical(gate, *args)
+
+    def _apply_physical(self, gate, *args):
+        with self._gate_lock:
+            if gate in _PAULIS and isinstance(self._qubit, BellPair) and not self._pending_gates \
+                    and Circuit.active() is None and self._qubit.apply_pauli(self, *_PAULIS[gate]):
+                return
+            if gate in SINGLE_QUBIT_GATES and self._host.lazy_gates:
+                self._pending_gates.append((gate,) + args)
+                self._update_pending()
+                return
+        # The other qubits are flushed one after another, never under the lock
+        # of this qubit.
+        self.flush_gates()
+        for arg in args:
+            if isinstance(arg, Qubit):
+                arg.flush_gates()
+        self._dispatch(gate, *args)
+
+    def _dispatch(self, gate, *args):
+        """
+        Calls the gate method *gate* of the backend with *args*, or records it
+        if a circuit of the current thread is active.
+
+        Args:
+            gate (str): The name of the gate method of the backend.
+            args: The further arguments of the gate method.
+        """
+        # Bell pairs are created in the backend before it is called
+        for qubit in (self,) + args:
+            if isinstance(qubit, Qubit) and isinstance(qubit._qubit, BellPair):
+                qubit._qubit.materialize()
+        circuit = Circuit.active()
+        if circuit is not None:
+            circuit.record(self._host.backend, (gate, self) + args)
+        else:
+            getattr(self._host.backend, gate)(self, *args)
+
     def I(self):
         """
         Perform Identity operation on the qubit.
         """
-        self._host.backend.I(self)
+        self._apply('I')
 
     def X(self):
         """
         Perform pauli x gate on qubit.
         """
-        self._host.backend.X(self)
+        self._apply('X')
 
     def Y(self):
         """
         Perform pauli y gate on qubit.
         """
-        self._host.backend.Y(self)
+        self._apply('Y')
 
     def Z(self):
         """
         Perform pauli z gate on qubit.
         """
-        self._host.backend.Z(self)
+        self._apply('Z')
 
     def T(self):
         """
         Perform a T gate on the qubit.
         """
-        self._host.backend.T(self)
+        self._apply('T')
 
     def K(self):
         """
         Perform a K gate on the qubit.
         """
-        self._host.backend.K(self)
+        self._apply('K')
 
     def H(self):
         """
         Perform a Hadamard gate on the qubit.
         """
-        self._host.backend.H(self)
+        self._apply('H')
 
     def rx(self, phi):
         """
@@ -198,7 +448,7 @@ class Qubit(object):
         Args:
             phi (float): Rotation in rad
         """
-        self._host.backend.rx(self, phi)
+        self._apply('rx', phi)
 
     def ry(self, phi):
         """
@@ -207,7 +457,7 @@ class Qubit(object):
         Args:
             phi (float): Rotation in rad
         """
-        self._host.backend.ry(self, phi)
+        self._apply('ry', phi)
 
     def rz(self, phi):
         """
@@ -216,7 +466,7 @@ class Qubit(object):
         Args:
             phi (float): Rotation in rad
         """
-        self._host.backend.rz(self, phi)
+        self._apply('rz', phi)
 
     def cnot(self, target):
         """
@@ -225,7 +475,7 @@ class Qubit(object):
         Args:
             target (Qubit): Qubit on which the cnot gate should be applied.
         """
-        self._host.backend.cnot(self, target)
+        self._apply('cnot', target)
 
     def cphase(self, target):
         """
@@ -234,7 +484,7 @@ class Qubit(object):
         Args:
             target (Qubit): Qubit on which the cphase gate should be applied.
         """
-        self._host.backend.cphase(self, target)
+        self._apply('cphase', target)
 
     def custom_gate(self, gate):
         """
@@ -251,7 +501,7 @@ class Qubit(object):
         if gate.shape != (2, 2):
             raise InputError
 
-        self._host.backend.custom_gate(self, gate)
+        self._apply('custom_gate', gate)
 
     def custom_controlled_gate(self, target, gate):
         """
@@ -269,7 +519,7 @@ class Qubit(object):
         if gate.shape != (2, 2):
             raise InputError
 
-        self._host.backend.custom_controlled_gate(self, target, gate)
+        self._apply('custom_controlled_gate', target, gate)
 
     def custom_two_qubit_control_gate(self, q1, q2, gate):
         """
@@ -287,7 +537,7 @@ class Qubit(object):
         if gate.shape != (4, 4):
             raise InputError
 
-        self._host.backend.custom_controlled_two_qubit_gate(self, q1, q2, gate)
+        self._apply('custom_controlled_two_qubit_gate', q1, q2, gate)
 
     def custom_two_qubit_gate(self, other_qubit, gate):
         """
@@ -304,7 +554,7 @@ class Qubit(object):
         if gate.shape != (4, 4):
             raise InputError
 
-        self._host.backend.custom_two_qubit_gate(self, other_qubit, gate)
+        self._apply('custom_two_qubit_gate', other_qubit, gate)
 
     def density_operator(self):
         """
@@ -314,8 +564,25 @@ class Qubit(object):
         Returns:
             np.ndarray: The density operator of the qubit.
         """
+        self.flush_frame()
+        self.flush_gates()
+        Circuit.flush()
         return self._host.backend.density_operator(self)
 
+    def statevector(self):
+        """
+        Returns the statevector of the qubit, or of all qubits it is entangled
+        with, as given by the backend. The pending gates of all qubits of the
+        backend are applied first. Only the EQSN and NumPy backends store
+        statevectors, the other backends raise an EnvironmentError.
+
+        Returns:
+            The statevector in the format of the backend.
+        """
+        Qubit.flush_all_gates(self._host.backend)
+        Circuit.flush()
+        return self._host.backend.statevector(self)
+
     def measure(self, non_destructive=False):
         """
         Measures the state of a qubit.
@@ -327,7 +594,21 @@ class Qubit(object):
         Returns:
             measured_value (int): 0 or 1, dependent on measurement outcome.
         """
-        return self._host.backend.measure(self, non_destructive)
+        self.flush_gates()
+        Circuit.flush()
+        measurement = None
+        if isinstance(self._qubit, BellPair):
+            measurement = self._qubit.measure(self, non_destructive)
+        if measurement is None:
+            measurement = self._host.backend.measure(self, non_destructive)
+        x, z = self._frame
+        if x or z:
+            # A Z correction does not change the outcome and is only a phase
+            # after the measurement, an X correction flips the outcome.
+            self._set_frame(x if non_destructive else 0, 0)
+            if x:
+                measurement = 1 - measurement
+        return measurement
 
 
 def is_unitary(m):
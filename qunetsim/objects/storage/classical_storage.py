@@ -1,5 +1,9 @@
 from qunetsim.backends.rw_lock import RWLock
+from qunetsim.objects.clock import Clock
 from qunetsim.utils.constants import Constants
+from collections import deque
+import bisect
+import itertools
 import queue
 
 
@@ -14,77 +18,349 @@ class ClassicalStorage(object):
     GET_ALL_MSGS_ANY_HOST = 4
     GET_WITH_SEQ_NUM_ANY_HOST = 5
 
-    def __init__(self):
+    def __init__(self, clock=None, max_messages_per_sender=None, max_age=None, compact_read=False):
+        """
+        Args:
+            clock (Clock): The clock against which waiting times are measured.
+                           Defaults to the wall clock.
+            max_messages_per_sender (int): If given, only the latest messages of
+                                           each sender are kept, older ones are
+                                           removed.
+            max_age (float): If given, messages are removed once they are stored
+                             for longer than *max_age* seconds.
+            compact_read (bool): If messages should be removed once they are
+                                 read with get_next_from_sender.
+        """
+        # sender -> dict position -> message with the retained messages of the
+        # sender, the position being the place of the message among all messages
+        # of the sender, which is its sequence number in the storage
         self._host_to_msg_dict = {}
+        # sender -> deque with the positions of the retained messages in order
+        self._host_to_position_dict = {}
+        # sender -> deque with the times the retained messages were added
+        self._host_to_time_dict = {}
+        # sender -> position the next message of the sender gets
+        self._host_to_next_position = {}
+        # sender -> position of the next unread message of the sender
         self._host_to_read_index = {}
+        # sender -> (list of (seq_num, -position), list of (position, message))
+        # with the messages sorted by the sequence number they were sent with.
+        # Removed messages are only dropped from it once they are the majority.
+        self._host_to_ordered_dict = {}
         self.last_msg_added_to_host = None
+        self._max_messages_per_sender = max_messages_per_sender
+        self._max_age = max_age
+        self._compact_read = compact_read
+        self._amount_messages_stored = 0
+        self._amount_messages_removed = 0
 
         # read write lock, for threaded access
         self._lock = RWLock()
+        self._clock = clock if clock is not None else Clock()
 
         # for tracking pending requests
-        # dictionary tracks the request made by a pending request.
+        # (sender, type) -> dict seq_num -> dict request_id -> Queue of the
+        # request, ordered by the time the requests were made. The sender is
+        # None for requests for any sender, the seq_num None if the request has
+        # none.
         self._pending_request_dict = {}
         # Determines a unique ID for a pending request.
-        self._request_id = 0
+        self._request_ids = itertools.count()
         # Amount of pending requests
         self._amount_pending_requests = 0
 
-    def _check_all_requests(self):
+    @property
+    def clock(self):
+        """
+        Get the clock against which waiting times are measured.
+
+        Returns:
+            (Clock): The clock of the storage.
+        """
+        return self._clock
+
+    @clock.setter
+    def clock(self, clock):
+        """
+        Set the clock against which waiting times are measured.
+
+        Args:
+            clock (Clock): The new clock of the storage.
+        """
+        self._clock = clock
+
+    @property
+    def max_messages_per_sender(self):
+        """
+        Get how many messages are kept per sender, None if there is no limit.
+
+        Returns:
+            (int): The maximum amount of messages per sender.
+        """
+        return self._max_messages_per_sender
+
+    @max_messages_per_sender.setter
+    def max_messages_per_sender(self, max_messages_per_sender):
+        """
+        Set how many messages are kept per sender, None for no limit.
+
+        Args:
+            max_messages_per_sender (int): The maximum amount of messages per sender.
+        """
+        self._lock.acquire_write()
+        self._max_messages_per_sender = max_messages_per_sender
+        for sender_id in list(self._host_to_msg_dict):
+            self._apply_retention(sender_id)
+        self._lock.release_write()
+
+    @property
+    def max_age(self):
         """
-        Checks if any of the pending requests is now fulfilled.
+        Get after how many seconds messages are removed, None if they are kept.
 
+        Returns:
+            (float): The maximum age of a message.
+        """
+        return self._max_age
+
+    @max_age.setter
+    def max_age(self, max_age):
+        """
+        Set after how many seconds messages are removed, None to keep them.
+
+        Args:
+            max_age (float): The maximum age of a message.
+        """
+        self._lock.acquire_write()
+        self._max_age = max_age
+        for sender_id in list(self._host_to_msg_dict):
+            self._apply_retention(sender_id)
+        self._lock.release_write()
+
+    @property
+    def compact_read(self):
+        """
+        Get if messages are removed once they are read with get_next_from_sender.
+
+        Returns:
+            (bool): If read messages are removed.
+        """
+        return self._compact_read
+
+    @compact_read.setter
+    def compact_read(self, compact_read):
+        """
+        Set if messages are removed once they are read with get_next_from_sender.
+
+        Args:
+            compact_read (bool): If read messages are removed.
+        """
+        self._lock.acquire_write()
+        self._compact_read = compact_read
+        for sender_id in list(self._host_to_msg_dict):
+            self._apply_retention(sender_id)
+        self._lock.release_write()
+
+    @property
+    def amount_messages_stored(self):
+        """
+        Get the amount of messages which are currently stored.
+
+        Returns:
+            (int): The amount of stored messages.
+        """
+        return self._amount_messages_stored
+
+    @property
+    def amount_messages_removed(self):
+        """
+        Get the amount of messages which were removed by the retention policy.
+
+        Returns:
+            (int): The amount of removed messages.
+        """
+        return self._amount_messages_removed
+
+    def amount_messages_stored_with_host(self, sender_id):
+        """
+        Get the amount of messages of a sender which are currently stored.
+
+        Args:
+            sender_id (str): The host id of the sender.
+        Returns:
+            (int): The amount of stored messages of the sender.
+        """
+        if sender_id not in self._host_to_msg_dict:
+            return 0
+        return len(self._host_to_msg_dict[sender_id])
+
+    def _apply_retention(self, sender_id):
+        """
+        Removes the oldest messages of a sender which are not retained anymore,
+        because there are too many, they are too old or already read.
+
+        Args:
+            sender_id (str): The host id of the sender.
+        """
+        messages = self._host_to_msg_dict[sender_id]
+        positions = self._host_to_position_dict[sender_id]
+        times = self._host_to_time_dict[sender_id]
+        removed = 0
+        if self._max_messages_per_sender is not None:
+            removed += max(0, len(positions) - self._max_messages_per_sender)
+        if self._compact_read:
+            read_index = self._host_to_read_index[sender_id]
+            while removed < len(positions) and positions[removed] < read_index:
+                removed += 1
+        if self._max_age is not None:
+            oldest = self._clock.time() - self._max_age
+            while removed < len(times) and times[removed] < oldest:
+                removed += 1
+        if not removed:
+            return
+        for _ in range(removed):
+            del messages[positions.popleft()]
+            times.popleft()
+        if positions:
+            first = positions[0]
+        else:
+            first = self._host_to_next_position[sender_id]
+        self._host_to_read_index[sender_id] = max(self._host_to_read_index[sender_id], first)
+        self._amount_messages_stored -= removed
+        self._amount_messages_removed += removed
+        self._compact_ordered(sender_id)
+
+    def _compact_ordered(self, sender_id):
+        """
+        Drops the removed messages from the ordered view of a sender once they
+        make up more than half of it.
+
+        Args:
+            sender_id (str): The host id of the sender.
+        """
+        keys, entries = self._host_to_ordered_dict[sender_id]
+        messages = self._host_to_msg_dict[sender_id]
+        if len(entries) <= 2 * len(messages):
+            return
+        kept = [i for i, (position, _) in enumerate(entries) if position in messages]
+        self._host_to_ordered_dict[sender_id] = ([keys[i] for i in kept], [entries[i] for i in kept])
+
+    def _check_requests(self, sender_id, position):
+        """
+        Checks if a pending request is fulfilled by a message which has just
+        arrived. Only the requests which can match the message are looked at,
+        and the oldest fulfilled one is handled.
+
+        Args:
+            sender_id (str): The sender of the message.
+            position (int): The sequence number of the message in the storage.
         Returns:
             If a request is fulfilled, the request is handled and the function
             returns the message of this request.
         """
-        for req_id, args in self._pending_request_dict.items():
-            ret = None
-            if args[2] == ClassicalStorage.GET_NEXT:
-                ret = self._get_next_from_sender(args[1])
-            elif args[2] == ClassicalStorage.GET_ALL:
-                ret = self._get_all_from_sender(args[1])
-            elif args[2] == ClassicalStorage.GET_WITH_SEQ_NUM:
-                ret = self._get_with_seq_num_from_sender(args[1], args[3])
-            elif args[2] == ClassicalStorage.GET_ALL_MSGS_ANY_HOST:
-                ret = self._get_all_from_sender(self.last_msg_added_to_host) \
-                    if self.last_msg_added_to_host is not None else None
-            elif args[2] == ClassicalStorage.GET_WITH_SEQ_NUM_ANY_HOST:
-                ret = self._get_with_seq_num_from_sender(self.last_msg_added_to_host, args[3]) \
-                    if self.last_msg_added_to_host is not None else None
+        if not self._amount_pending_requests:
+            return None
+        candidates = []
+        for key in ((sender_id, ClassicalStorage.GET_NEXT),
+                    (sender_id, ClassicalStorage.GET_ALL),
+                    (None, ClassicalStorage.GET_ALL_MSGS_ANY_HOST)):
+            waiting = self._pending_request_dict.get(key, {}).get(None)
+            if waiting:
+                candidates.append((next(iter(waiting)), key, None))
+        waiting = self._pending_request_dict.get((sender_id, ClassicalStorage.GET_WITH_SEQ_NUM), {}).get(position)
+        if waiting:
+            candidates.append((next(iter(waiting)), (sender_id, ClassicalStorage.GET_WITH_SEQ_NUM), position))
+        key = (None, ClassicalStorage.GET_WITH_SEQ_NUM_ANY_HOST)
+        for seq_num, waiting in self._pending_request_dict.get(key, {}).items():
+            candidates.append((next(iter(waiting)), key, seq_num))
+
+        for req_id, key, seq_num in sorted(candidates):
+            request_type = key[1]
+            if request_type == ClassicalStorage.GET_NEXT:
+                ret = self._get_next_from_sender(sender_id)
+            elif request_type in (ClassicalStorage.GET_ALL, ClassicalStorage.GET_ALL_MSGS_ANY_HOST):
+                ret = self._get_all_from_sender(sender_id)
+            elif request_type in (ClassicalStorage.GET_WITH_SEQ_NUM, ClassicalStorage.GET_WITH_SEQ_NUM_ANY_HOST):
+                ret = self._get_with_seq_num_from_sender(sender_id, seq_num)
             else:
                 raise ValueError("Internal Error, this request does not exist!")
 
             if ret is not None:
-                args[0].put(ret)
-                self._remove_request(req_id)
+                q = self._pending_request_dict[key][seq_num][req_id]
+                self._remove_request(key, seq_num, req_id)
+                q.put(ret)
                 return ret
+        return None
 
-    def _add_request(self, args):
+    def _add_request(self, q, sender_id, request_type, seq_num=None):
         """
         Adds a new request to the classical storage. If a new message arrives, it
         is checked if the request for the qubit is satisfied.
 
         Args:
-            args (list): [Queue, from_host_id, type, ...]
+            q (Queue): The queue the message is put into.
+            sender_id (str): The sender of the message, None for any sender.
+            request_type (int): The type of the request.
+            seq_num (int): The sequence number of the message, if the request
+                           has one.
         Returns:
             (int): ID of the request
         """
-        self._pending_request_dict[self._request_id] = args
-        self._request_id += 1
+        req_id = next(self._request_ids)
+        requests = self._pending_request_dict.setdefault((sender_id, request_type), {})
+        requests.setdefault(seq_num, {})[req_id] = q
         self._amount_pending_requests += 1
-        return self._request_id
+        return req_id
 
-    def _remove_request(self, req_id):
+    def _remove_request(self, key, seq_num, req_id):
         """
         Removes a pending request from the request dict.
 
         Args:
+            key (tuple): The sender and type of the request.
+            seq_num (int): The sequence number of the request.
             req_id (int): The id of the request to remove.
+        Returns:
+            (bool): False if the request was already handled.
         """
-        if req_id in self._pending_request_dict:
-            del self._pending_request_dict[req_id]
+        requests = self._pending_request_dict.get(key, {})
+        waiting = requests.get(seq_num)
+        if waiting is None or req_id not in waiting:
+            return False
+        del waiting[req_id]
+        if not waiting:
+            del requests[seq_num]
+            if not requests:
+                del self._pending_request_dict[key]
         self._amount_pending_requests -= 1
+        return True
+
+    def _wait_for_request(self, q, key, seq_num, req_id, wait):
+        """
+        Waits for the message of a pending request.
+
+        Args:
+            q (Queue): The queue of the request.
+            key (tuple): The sender and type of the request.
+            seq_num (int): The sequence number of the request.
+            req_id (int): The id of the request.
+            wait (float): The maximum waiting time, None to wait forever.
+        Returns:
+            The result of the request, None if it was not fulfilled in time.
+        """
+        ret = None
+        try:
+            ret = self._clock.get(q, wait)
+        except queue.Empty:
+            pass
+
+        if ret is None:
+            self._lock.acquire_write()
+            if not self._remove_request(key, seq_num, req_id):
+                # The message arrived after the wait time was over
+                ret = q.get_nowait()
+            self._lock.release_write()
+        return ret
 
     def empty(self):
         """
@@ -92,8 +368,13 @@ class ClassicalStorage(object):
         """
         self._lock.acquire_write()
         self._host_to_msg_dict = {}
+        self._host_to_position_dict = {}
+        self._host_to_time_dict = {}
+        self._host_to_next_position = {}
         self._host_to_read_index = {}
+        self._host_to_ordered_dict = {}
         self.last_msg_added_to_host = None
+        self._amount_messages_stored = 0
         self._lock.release_write()
 
     def _add_new_host_id(self, host_id):
@@ -103,8 +384,12 @@ class ClassicalStorage(object):
         Args:
             host_id (str): The host ID to store.
         """
-        self._host_to_msg_dict[host_id] = []
+        self._host_to_msg_dict[host_id] = {}
+        self._host_to_position_dict[host_id] = deque()
+        self._host_to_time_dict[host_id] = deque()
+        self._host_to_next_position[host_id] = 0
         self._host_to_read_index[host_id] = 0
+        self._host_to_ordered_dict[host_id] = ([], [])
 
     def remove_all_ack(self, from_sender=None):
         """
@@ -118,9 +403,17 @@ class ClassicalStorage(object):
         self._lock.acquire_write()
 
         def delete_all_ack_for_sender(sender_id):
-            for c, msg in enumerate(self._host_to_msg_dict[sender_id]):
-                if msg.content == Constants.ACK:
-                    del self._host_to_msg_dict[sender_id][c]
+            messages = self._host_to_msg_dict[sender_id]
+            positions = self._host_to_position_dict[sender_id]
+            times = self._host_to_time_dict[sender_id]
+            kept = [(p, t) for p, t in zip(positions, times) if messages[p].content != Constants.ACK]
+            for p in positions:
+                if messages[p].content == Constants.ACK:
+                    del messages[p]
+            self._amount_messages_stored -= len(positions) - len(kept)
+            self._host_to_position_dict[sender_id] = deque(p for p, _ in kept)
+            self._host_to_time_dict[sender_id] = deque(t for _, t in kept)
+            self._compact_ordered(sender_id)
 
         if from_sender is None:
             for sender in list(self._host_to_msg_dict):
@@ -136,14 +429,31 @@ class ClassicalStorage(object):
         """
         sender_id = message.sender
         self._lock.acquire_write()
-        if sender_id not in list(self._host_to_msg_dict):
+        if sender_id not in self._host_to_msg_dict:
             self._add_new_host_id(sender_id)
-        self._host_to_msg_dict[sender_id].append(message)
+        position = self._host_to_next_position[sender_id]
+        self._host_to_next_position[sender_id] += 1
+        self._host_to_msg_dict[sender_id][position] = message
+        self._host_to_position_dict[sender_id].append(position)
+        self._host_to_time_dict[sender_id].append(self._clock.time())
+
+        keys, entries = self._host_to_ordered_dict[sender_id]
+        key = (message.seq_num, -position)
+        # Messages mostly arrive in order, so they are appended at the end
+        if not keys or keys[-1] < key:
+            index = len(keys)
+        else:
+            index = bisect.bisect(keys, key)
+        keys.insert(index, key)
+        entries.insert(index, (position, message))
+
+        self._amount_messages_stored += 1
+        self._apply_retention(sender_id)
         self.last_msg_added_to_host = sender_id
-        self._check_all_requests()
+        self._check_requests(sender_id, position)
         self._lock.release_write()
 
-    def get_all_from_sender(self, sender_id, wait=0):
+    def get_all_from_sender(self, sender_id, wait=0, ordered=False):
         """
         Get all stored messages from a sender. If delete option is set,
         the returned messages are removed from the storage.
@@ -151,6 +461,9 @@ class ClassicalStorage(object):
         Args:
             sender_id (str): The host id of the host.
             wait (int): Default is 0. The maximum blocking time. -1 to block forever.
+            ordered (bool): If the messages should be sorted by their sequence
+                            number, the highest first, instead of the order
+                            they arrived in.
 
         Returns:
             List of messages of the sender. If there are none, an empty list is
@@ -161,31 +474,34 @@ class ClassicalStorage(object):
             wait = None
 
         self._lock.acquire_write()
-        msg = self._get_all_from_sender(sender_id)
+        msg = self._get_all_from_sender(sender_id, ordered)
         if msg is not None or wait == 0:
             self._lock.release_write()
             return msg if msg is not None else []
 
         q = queue.Queue()
-        request = [q, sender_id, ClassicalStorage.GET_ALL]
-        req_id = self._add_request(request)
+        key = (sender_id, ClassicalStorage.GET_ALL)
+        req_id = self._add_request(q, sender_id, ClassicalStorage.GET_ALL)
         self._lock.release_write()
 
-        try:
-            msg = q.get(timeout=wait)
-        except queue.Empty:
-            pass
-
+        msg = self._wait_for_request(q, key, None, req_id, wait)
         if msg is None:
+            return []
+        if ordered:
             self._lock.acquire_write()
-            self._remove_request(req_id)
+            msg = self._get_all_from_sender(sender_id, ordered)
             self._lock.release_write()
-            return []
         return msg
 
-    def _get_all_from_sender(self, sender_id):
-        if sender_id in list(self._host_to_msg_dict):
-            return self._host_to_msg_dict[sender_id]
+    def _get_all_from_sender(self, sender_id, ordered=False):
+        if sender_id in self._host_to_msg_dict:
+            if self._max_age is not None:
+                self._apply_retention(sender_id)
+            messages = self._host_to_msg_dict[sender_id]
+            if not ordered:
+                return list(messages.values())
+            entries = self._host_to_ordered_dict[sender_id][1]
+            return [msg for position, msg in reversed(entries) if position in messages]
         return None
 
     def get_next_from_sender(self, sender_id, wait=0):
@@ -211,28 +527,30 @@ class ClassicalStorage(object):
             return next_msg
 
         q = queue.Queue()
-        request = [q, sender_id, ClassicalStorage.GET_NEXT]
-        req_id = self._add_request(request)
+        key = (sender_id, ClassicalStorage.GET_NEXT)
+        req_id = self._add_request(q, sender_id, ClassicalStorage.GET_NEXT)
         self._lock.release_write()
 
-        try:
-            next_msg = q.get(timeout=wait)
-        except queue.Empty:
-            pass
-
-        if next_msg is None:
-            self._lock.acquire_write()
-            self._remove_request(req_id)
-            self._lock.release_write()
-        return next_msg
+        return self._wait_for_request(q, key, None, req_id, wait)
 
     def _get_next_from_sender(self, sender_id):
-        if sender_id not in list(self._host_to_msg_dict):
+        if sender_id not in self._host_to_msg_dict:
             return None
-        if len(self._host_to_msg_dict[sender_id]) <= self._host_to_read_index[sender_id]:
+        if self._max_age is not None:
+            self._apply_retention(sender_id)
+        messages = self._host_to_msg_dict[sender_id]
+        next_position = self._host_to_next_position[sender_id]
+        read_index = self._host_to_read_index[sender_id]
+        # Skip the positions of removed ACK messages
+        while read_index < next_position and read_index not in messages:
+            read_index += 1
+        self._host_to_read_index[sender_id] = read_index
+        if read_index == next_position:
             return None
-        msg = self._host_to_msg_dict[sender_id][self._host_to_read_index[sender_id]]
+        msg = messages[read_index]
         self._host_to_read_index[sender_id] += 1
+        if self._compact_read:
+            self._apply_retention(sender_id)
         return msg
 
     def get_with_seq_num_from_sender(self, sender_id, seq_num, wait=0):
@@ -258,36 +576,30 @@ class ClassicalStorage(object):
             return next_msg
 
         q = queue.Queue()
-        request = [q, sender_id, ClassicalStorage.GET_NEXT, seq_num]
-        req_id = self._add_request(request)
+        key = (sender_id, ClassicalStorage.GET_WITH_SEQ_NUM)
+        req_id = self._add_request(q, sender_id, ClassicalStorage.GET_WITH_SEQ_NUM, seq_num)
         self._lock.release_write()
 
-        try:
-            next_msg = q.get(timeout=wait)
-        except queue.Empty:
-            pass
-
-        if next_msg is None:
-            self._lock.acquire_write()
-            self._remove_request(req_id)
-            self._lock.release_write()
-        return next_msg
+        return self._wait_for_request(q, key, seq_num, req_id, wait)
 
     def _get_with_seq_num_from_sender(self, sender_id, seq_num):
-        if sender_id not in list(self._host_to_msg_dict):
+        if sender_id not in self._host_to_msg_dict:
             return None
-        if len(self._host_to_msg_dict[sender_id]) <= seq_num:
-            return None
-        msg = self._host_to_msg_dict[sender_id][seq_num]
-        return msg
-    
-    def get_all_from_any_sender(self,wait=0):
+        if self._max_age is not None:
+            self._apply_retention(sender_id)
+        # None if the message is not received yet or not retained anymore
+        return self._host_to_msg_dict[sender_id].get(seq_num)
+
+    def get_all_from_any_sender(self, wait=0, ordered=False):
         """
         Get all stored messages from any sender. If delete option is set,
         the returned messages are removed from the storage.
 
         Args:
             wait (int): Default is 0. The maximum blocking time. -1 to block forever.
+            ordered (bool): If the messages should be sorted by their sequence
+                            number, the highest first, instead of the order
+                            they arrived in.
 
         Returns:
             List of messages of the sender. If there are none, an empty list is
@@ -301,30 +613,26 @@ class ClassicalStorage(object):
         self._lock.acquire_write()
         msg = None
         if self.last_msg_added_to_host is not None:
-            msg = self.get_all_from_sender(self.last_msg_added_to_host)
+            msg = self._get_all_from_sender(self.last_msg_added_to_host, ordered)
 
-        if wait == 0:     
+        if wait == 0:
             self._lock.release_write()
             return msg if msg is not None else []
-        
+
         q = queue.Queue()
-        request = [q, None, ClassicalStorage.GET_ALL_MSGS_ANY_HOST]
-        req_id = self._add_request(request)
+        key = (None, ClassicalStorage.GET_ALL_MSGS_ANY_HOST)
+        req_id = self._add_request(q, None, ClassicalStorage.GET_ALL_MSGS_ANY_HOST)
         self._lock.release_write()
 
-        try:
-            msg = q.get(timeout=wait)
-        except queue.Empty:
-            pass
-
-        
+        msg = self._wait_for_request(q, key, None, req_id, wait)
         if msg is None:
+            return []
+        if ordered:
             self._lock.acquire_write()
-            self._remove_request(req_id)
+            msg = self._get_all_from_sender(msg[0].sender, ordered)
             self._lock.release_write()
-            return []
         return msg
-    
+
     def get_with_seq_num_from_any_sender(self, seq_num, wait=0):
         '''
         Returns:
@@ -334,31 +642,21 @@ class ClassicalStorage(object):
         if wait == -1:
             wait = None
 
-        
         self._lock.acquire_write()
         next_msg = None
         if self.last_msg_added_to_host is not None:
-            next_msg = self.get_with_seq_num_from_sender(self.last_msg_added_to_host,seq_num)
+            next_msg = self._get_with_seq_num_from_sender(self.last_msg_added_to_host, seq_num)
 
-        if wait == 0:           
+        if wait == 0:
             self._lock.release_write()
             return next_msg
 
         q = queue.Queue()
-        request = [q, None, ClassicalStorage.GET_WITH_SEQ_NUM_ANY_HOST, seq_num]
-        req_id = self._add_request(request)
+        key = (None, ClassicalStorage.GET_WITH_SEQ_NUM_ANY_HOST)
+        req_id = self._add_request(q, None, ClassicalStorage.GET_WITH_SEQ_NUM_ANY_HOST, seq_num)
         self._lock.release_write()
 
-        try:
-            next_msg = q.get(timeout=wait)
-        except queue.Empty:
-            pass
-
-        if next_msg is None:
-            self._lock.acquire_write()
-            self._remove_request(req_id)
-            self._lock.release_write()
-        return next_msg
+        return self._wait_for_request(q, key, seq_num, req_id, wait)
 
     def get_all(self):
         """
@@ -370,6 +668,8 @@ class ClassicalStorage(object):
         self._lock.acquire_write()
         ret = []
         for host_id in list(self._host_to_msg_dict):
-            ret += self._host_to_msg_dict[host_id]
+            if self._max_age is not None:
+                self._apply_retention(host_id)
+            ret += self._host_to_msg_dict[host_id].values()
         self._lock.release_write()
         return ret
@@ -0,0 +1,2 @@
+from .cutoff import Cutoff
+from .coherence import Coherence
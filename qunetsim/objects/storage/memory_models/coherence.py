@@ -0,0 +1,102 @@
+import math
+from qunetsim.objects.connections.channel_models import AmplitudeDamping, Dephasing
+
+
+def _check_time(name, value):
+    if value is None:
+        return
+    if not isinstance(value, int) and not isinstance(value, float):
+        raise ValueError("%s must be float or int" % name)
+    elif value <= 0:
+        raise ValueError("%s must be positive" % name)
+
+
+class Coherence(object):
+    """
+    The model for a quantum memory with the relaxation time T1 and the
+    dephasing time T2. Optionally, qubits which are stored for longer than a
+    cutoff time are released.
+    """
+
+    def __init__(self, t1=None, t2=None, cutoff=None):
+        _check_time("T1", t1)
+        _check_time("T2", t2)
+        _check_time("Cutoff time", cutoff)
+        if t1 is not None and t2 is not None and t2 > 2 * t1:
+            raise ValueError("T2 can not be larger than 2 * T1")
+        self._t1 = t1
+        self._t2 = t2
+        self._cutoff = cutoff
+
+    @property
+    def t1(self):
+        """
+        Relaxation time of the memory, None if the qubits do not relax
+
+        Returns
+            (float) : T1 in seconds
+        """
+        return self._t1
+
+    @property
+    def t2(self):
+        """
+        Dephasing time of the memory, None if the qubits do not dephase
+
+        Returns
+            (float) : T2 in seconds
+        """
+        return self._t2
+
+    @property
+    def cutoff(self):
+        """
+        Time after which a stored qubit is released, None if qubits are kept
+
+        Returns
+            (float) : The cutoff time in seconds
+        """
+        return self._cutoff
+
+    @cutoff.setter
+    def cutoff(self, cutoff):
+        """
+        Set the time after which a stored qubit is released
+
+        Args
+            cutoff (float) : The cutoff time in seconds, None to keep qubits
+        """
+        _check_time("Cutoff time", cutoff)
+        self._cutoff = cutoff
+
+    def qubit_func(self, qubit, storage_time):
+        """
+        Function to modify the qubit based on the time it was stored
+        In this case - Damps the amplitude of the qubit with the decay probability
+        1 - exp(-t/T1), and dephases it such that the coherence decays with
+        exp(-t/T2) in total. The noise is applied with the channel models, so
+        backends without noise channels apply their Pauli twirl.
+        Required in all memory models
+
+        Args
+            qubit (Qubit) : The qubit which is retrieved from the memory
+            storage_time (float) : The time the qubit was stored in seconds
+
+        Returns
+            (object) : Modified qubit
+        """
+        if qubit is None or storage_time <= 0:
+            return qubit
+        # Amplitude damping already decays the coherence with exp(-t/(2 T1)),
+        # only the remaining pure dephasing is applied on top.
+        dephasing_rate = 0
+        if self._t1 is not None:
+            gamma = 1 - math.exp(-storage_time / self._t1)
+            AmplitudeDamping(gamma).qubit_func(qubit)
+            dephasing_rate = -1 / (2 * self._t1)
+        if self._t2 is not None:
+            dephasing_rate += 1 / self._t2
+        if dephasing_rate > 0:
+            p = (1 - math.exp(-storage_time * dephasing_rate)) / 2
+            Dephasing(p).qubit_func(qubit)
+        return qubit
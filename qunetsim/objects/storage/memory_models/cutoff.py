@@ -0,0 +1,54 @@
+class Cutoff(object):
+    """
+    The model for a quantum memory which keeps qubits perfectly, but only for a
+    limited time. Qubits which are stored for longer than the cutoff time are
+    released.
+    """
+
+    def __init__(self, cutoff):
+        if not isinstance(cutoff, int) and not isinstance(cutoff, float):
+            raise ValueError("Cutoff time must be float or int")
+        elif cutoff <= 0:
+            raise ValueError("Cutoff time must be positive")
+        else:
+            self._cutoff = cutoff
+
+    @property
+    def cutoff(self):
+        """
+        Time after which a stored qubit is released
+
+        Returns
+            (float) : The cutoff time in seconds
+        """
+        return self._cutoff
+
+    @cutoff.setter
+    def cutoff(self, cutoff):
+        """
+        Set the time after which a stored qubit is released
+
+        Args
+            cutoff (float) : The cutoff time in seconds
+        """
+        if not isinstance(cutoff, int) and not isinstance(cutoff, float):
+            raise ValueError("Cutoff time must be float or int")
+        elif cutoff <= 0:
+            raise ValueError("Cutoff time must be positive")
+        else:
+            self._cutoff = cutoff
+
+    def qubit_func(self, qubit, storage_time):
+        """
+        Function to modify the qubit based on the time it was stored
+        In this case - The qubit is not modified.
+        Required in all memory models
+
+        Args
+            qubit (Qubit) : The qubit which is retrieved from the memory
+            storage_time (float) : The time the qubit was stored in seconds
+
+        Returns
+            (object) : Modified qubit
+        """
+        return qubit
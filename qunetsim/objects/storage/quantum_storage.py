@@ -1,6 +1,12 @@
 from qunetsim.backends.rw_lock import RWLock
+from qunetsim.objects.clock import Clock
 from qunetsim.objects.logger import Logger
+from qunetsim.objects.storage.timing_wheel import TimingWheel
+from qunetsim.utils.handles import id_to_handle
+from collections import OrderedDict
 import queue
+import itertools
+import threading
 
 
 class QuantumStorage(object):
@@ -12,13 +18,35 @@ class QuantumStorage(object):
     STORAGE_LIMIT_PER_HOST = 2
     STORAGE_LIMIT_INDIVIDUALLY_PER_HOST = 3
 
-    def __init__(self):
-        # _host_dict stores host_id -> array with qubits of the host.
+    # Into how many ticks of the timing wheel the cutoff time of the memory
+    # model is divided. Expired qubits are released at most one tick late.
+    EXPIRY_TICKS_PER_CUTOFF = 16
+
+    def __init__(self, clock=None, memory_model=None):
+        """
+        Args:
+            clock (Clock): The clock against which waiting times are measured.
+                           Defaults to the wall clock.
+            memory_model (object): The model of the quantum memory, which acts on
+                                   the stored qubits. Defaults to a perfect memory.
+        """
+        # The qubits are stored by their handle. String IDs are only looked at
+        # for the qubits which have an ID of their own, the other IDs are
+        # converted to the handle they are derived from.
+        # _host_dict stores host_id -> OrderedDict handle -> Qubit with all
+        # qubits of the host in the order they arrived.
         self._host_dict = {}
-        # _qubit_dict stores qubit_id -> dict Host_id -> Qubit objects with this id.
+        # _purpose_queues stores host_id -> dict purpose -> OrderedDict handle ->
+        # Qubit with the qubits of the host with this purpose in order.
+        self._purpose_queues = {}
+        # _qubit_dict stores host_id -> dict qubit_id -> handle of the Qubit
+        # with this id, for the qubits which have an ID of their own.
         self._qubit_dict = {}
-        # _purpose_dict stores qubit_id -> dict Host_id -> Purpose belonging to
-        # the Qubit with the same Host and ID.
+        # _names stores host_id -> dict handle -> qubit_id, the reverse of
+        # _qubit_dict.
+        self._names = {}
+        # _purpose_dict stores host_id -> dict handle -> Purpose belonging to
+        # the Qubit with the same Host and handle.
         self._purpose_dict = {}
         self._storage_mode = QuantumStorage.STORAGE_LIMIT_INDIVIDUALLY_PER_HOST
         self._storage_limits_per_host = {}
@@ -26,16 +54,40 @@ class QuantumStorage(object):
         self._default_storage_limit_per_host = -1
         self._storage_limit = -1
         self._amount_qubit_stored = 0
-        # read write lock, for threaded access
+        # read write lock, for adding the lock of a new host
         self.lock = RWLock()
+        # host_id -> read write lock, which guards the qubits of the host, so
+        # that the qubits of different hosts can be accessed at the same time
+        self._host_locks = {}
+        # guards the amounts of stored qubits, which are shared by all hosts
+        self._counter_lock = threading.Lock()
+        # _id_index stores qubit_id -> dict host_id -> True of the hosts which
+        # have a qubit with this id of its own stored, in the order they were
+        # stored. _handle_index does the same for the other qubits by handle.
+        self._id_index = {}
+        self._handle_index = {}
+        self._id_index_lock = threading.Lock()
+        self._clock = clock if clock is not None else Clock()
+
+        # host_id -> dict handle -> time the qubit was stored
+        self._stored_at = {}
+        self._memory_model = memory_model
+        # timing wheel with the expiry times of the stored qubits, keyed by
+        # (host_id, handle), if the memory model has a cutoff time
+        self._wheel = None
+        self._wheel_lock = threading.Lock()
+        # time the next expiry check is scheduled for
+        self._expiry_due = None
+        self._amount_qubits_expired = 0
 
         self.logger = Logger.get_instance()
 
         # for tracking pending requests
-        # dictionary tracks the request made by a pending request.
+        # host_id -> dict (q_id, purpose) -> dict request_id -> Queue of the
+        # request, ordered by the time the requests were made.
         self._pending_request_dict = {}
         # Determines a unique ID for a pending request.
-        self._request_id = 0
+        self._request_ids = itertools.count()
         # Amount of pending requests
         self._amount_pending_requests = 0
 
@@ -44,19 +96,39 @@ class QuantumStorage(object):
         out += "Quantum storage with the properties:\nstorage mode: %d\nstorage limit: %d\n" % (
             self._storage_mode, self._storage_limit)
         out += "Host dictionary is:\n"
-        out += "; ".join([str(key) + ":" + str([v.id for v in value])
-                          for key, value in self._host_dict.items()])
+        out += "; ".join([str(key) + ":" + str([v.id for v in list(value.values())])
+                          for key, value in list(self._host_dict.items())])
         out += "\n"
         out += "Qubit dictionary is:\n"
         out += "; ".join([str(key) + ":" + str(value)
-                          for key, value in self._qubit_dict.items()])
+                          for key, value in list(self._qubit_dict.items())])
         out += "\n"
         out += "Purpose dictionary is:\n"
         out += "; ".join([str(key) + ":" + str(value)
-                          for key, value in self._purpose_dict.items()])
+                          for key, value in list(self._purpose_dict.items())])
         out += "\n"
         return out
 
+    @property
+    def clock(self):
+        """
+        Get the clock against which waiting times are measured.
+
+        Returns:
+            (Clock): The clock of the storage.
+        """
+        return self._clock
+
+    @clock.setter
+    def clock(self, clock):
+        """
+        Set the clock against which waiting times are measured.
+
+        Args:
+            clock (Clock): The new clock of the storage.
+        """
+        self._clock = clock
+
     @property
     def storage_limit(self):
         return self._storage_limit
@@ -97,6 +169,137 @@ class QuantumStorage(object):
     def amount_qubits_stored_with_host(self, host_id):
         return self._amount_qubits_stored_per_host[host_id]
 
+    @property
+    def amount_qubits_expired(self):
+        """
+        Get the amount of qubits which were released because they were stored
+        longer than the cutoff time of the memory model.
+
+        Returns:
+            (int): The amount of expired qubits.
+        """
+        return self._amount_qubits_expired
+
+    @property
+    def memory_model(self):
+        """
+        Get the model of the quantum memory.
+
+        Returns:
+            (object): The memory model, None for a perfect memory.
+        """
+        return self._memory_model
+
+    @memory_model.setter
+    def memory_model(self, memory_model):
+        """
+        Set the model of the quantum memory. The model degrades qubits with its
+        *qubit_func* when they are taken from the storage, and qubits which are
+        stored for longer than its *cutoff* time are released. The cutoff time
+        also applies to the qubits which are already stored.
+
+        Args:
+            memory_model (object): The memory model, None for a perfect memory.
+        """
+        with self._wheel_lock:
+            self._memory_model = memory_model
+            self._wheel = None
+        cutoff = getattr(memory_model, 'cutoff', None)
+        if cutoff is None:
+            return
+        for host_id in list(self._host_dict):
+            lock = self._host_lock(host_id)
+            lock.acquire_write()
+            stored_at = self._stored_at[host_id]
+            for handle in self._host_dict[host_id]:
+                self._add_to_wheel(host_id, handle, stored_at[handle] + cutoff)
+            lock.release_write()
+        self._expire_qubits()
+        self._schedule_expiry()
+
+    def _add_to_wheel(self, host_id, handle, expiry):
+        """
+        Adds a stored qubit to the timing wheel, creates the wheel if there is
+        none yet.
+
+        Args:
+            host_id (str): The host the qubit is from.
+            handle (int): The handle of the qubit.
+            expiry (float): The time the qubit expires.
+        """
+        with self._wheel_lock:
+            if self._wheel is None:
+                tick = self._memory_model.cutoff / QuantumStorage.EXPIRY_TICKS_PER_CUTOFF
+                self._wheel = TimingWheel(tick)
+            self._wheel.add((host_id, handle), expiry)
+
+    def _schedule_expiry(self):
+        """
+        Schedules the next check for expired qubits one tick of the timing
+        wheel ahead, if qubits can expire and no check is scheduled yet.
+        """
+        if self._wheel is None:
+            return
+        with self._wheel_lock:
+            if not self._wheel:
+                return
+            now = self._clock.time()
+            if self._expiry_due is not None and self._expiry_due >= now:
+                return
+            self._expiry_due = now + self._wheel.tick
+            tick = self._wheel.tick
+        self._clock.call_later(tick, self._on_expiry_due)
+
+    def _on_expiry_due(self):
+        with self._wheel_lock:
+            self._expiry_due = None
+        self._expire_qubits()
+        self._schedule_expiry()
+
+    def _expire_qubits(self):
+        """
+        Releases the qubits which are stored for longer than the cutoff time of
+        the memory model.
+        """
+        if self._wheel is None:
+            return
+        with self._wheel_lock:
+            if not self._wheel:
+                return
+            expired = self._wheel.advance(self._clock.time())
+        for host_id, handle in expired:
+            lock = self._host_lock(host_id)
+            lock.acquire_write()
+            # The qubit can be taken from the storage in the meantime
+            qubit = self._host_dict[host_id].get(handle)
+            if qubit is not None:
+                self._remove_qubit(host_id, handle)
+                self._decrease_qubit_counter(host_id)
+                with self._counter_lock:
+                    self._amount_qubits_expired += 1
+                self.logger.log("Qubit with id %s from host %s expired in the storage" % (qubit.id, host_id))
+                qubit.release()
+            lock.release_write()
+
+    def _host_lock(self, host_id):
+        """
+        Get the lock which guards the qubits from a host, creates it if the
+        host has no lock yet.
+
+        Args:
+            host_id (str): The ID of the host.
+        Returns:
+            (RWLock): The lock of the host.
+        """
+        lock = self._host_locks.get(host_id)
+        if lock is None:
+            self.lock.acquire_write()
+            if host_id not in self._host_locks:
+                self._host_locks[host_id] = RWLock()
+            lock = self._host_locks[host_id]
+            self.lock.release_write()
+        return lock
+
     def set_storage_limit_with_host(self, new_limit, host_id):
         """
         Set a new storage limit for the storage. The implementations depends on
@@ -122,7 +325,7 @@ class QuantumStorage(object):
         """
         Reset the quantum storage.
         """
-        for host in self._host_dict:
+        for host in list(self._host_dict):
             self.reset_qubits_from_host(host)
 
     def release_storage(self):
@@ -130,10 +333,13 @@ class QuantumStorage(object):
         Releases all qubits in this storage. The storage is not
         usable anymore after this function has been called.
         """
+        with self._wheel_lock:
+            self._wheel = None
         self.lock.acquire_write()
-        for q in self._qubit_dict.values():
-            for ele in q.values():
-                ele.release()
+        for host_id in list(self._host_dict):
+            self._host_lock(host_id).acquire_write()
+            for q in self._host_dict[host_id].values():
+                q.release()
         # do not release write, storage not usable anymore
 
     def check_qubit_from_host_exists(self, from_host_id, purpose=None):
@@ -147,16 +353,18 @@ class QuantumStorage(object):
         Returns:
             (bool): True, if such a qubit is in the storage, false if not.
         """
-        self.lock.acquire_write()
+        self._expire_qubits()
+        lock = self._host_lock(from_host_id)
+        lock.acquire_write()
         if from_host_id not in self._host_dict:
-            self.lock.release_write()
+            lock.release_write()
             return False
-        for q in self._host_dict[from_host_id]:
-            if self._check_qubit_in_system(q, from_host_id, purpose):
-                self.lock.release_write()
-                return True
-        self.lock.release_write()
-        return False
+        if purpose is None:
+            exists = bool(self._host_dict[from_host_id])
+        else:
+            exists = bool(self._purpose_queues[from_host_id].get(purpose))
+        lock.release_write()
+        return exists
 
     def get_qubit_by_id(self, q_id):
         """
@@ -167,9 +375,18 @@ class QuantumStorage(object):
         Returns:
             (Qubit): The qubit with the id *q_id* or None if it does not exist
         """
-        if q_id in self._qubit_dict:
-            return list(self._qubit_dict[q_id].values())[0]
-        return None
+        with self._id_index_lock:
+            hosts = self._id_index.get(q_id)
+            if hosts:
+                host_id = next(iter(hosts))
+                handle = self._qubit_dict[host_id].get(q_id)
+            else:
+                handle = id_to_handle(q_id)
+                hosts = self._handle_index.get(handle)
+                if not hosts:
+                    return None
+                host_id = next(iter(hosts))
+        return self._host_dict[host_id].get(handle)
 
     def change_qubit_id(self, from_host_id, new_id, old_id=None):
         """
@@ -185,23 +402,21 @@ class QuantumStorage(object):
             (str): The new ID
         """
         new_id = str(new_id)
-        self.lock.acquire_write()
+        lock = self._host_lock(from_host_id)
+        lock.acquire_write()
         if old_id is not None:
             old_id = str(old_id)
-            qubit, purpose = self._pop_qubit_with_id_and_host_from_qubit_dict(
-                old_id, from_host_id)
-            if qubit is not None:
-                qubit.id = new_id
-                self._add_qubit_to_qubit_dict(qubit, purpose, from_host_id)
+            if from_host_id in self._host_dict:
+                handle = self._find_handle(from_host_id, old_id)
+                if handle is not None:
+                    self._rename_qubit(from_host_id, handle, new_id)
         else:
             if from_host_id in self._host_dict and self._host_dict[from_host_id]:
-                qubit = self._host_dict[from_host_id][0]
-                old_id = qubit.id
-                _, purpose = self._pop_qubit_with_id_and_host_from_qubit_dict(
-                    old_id, from_host_id)
-                qubit.id = new_id
-                self._add_qubit_to_qubit_dict(qubit, purpose, from_host_id)
-        self.lock.release_write()
+                qubits = self._host_dict[from_host_id]
+                handle = next(iter(qubits))
+                old_id = qubits[handle].id
+                self._rename_qubit(from_host_id, handle, new_id)
+        lock.release_write()
         return old_id
 
     def add_qubit_from_host(self, qubit, purpose, from_host_id):
@@ -215,24 +430,27 @@ class QuantumStorage(object):
             purpose (str): Purpose of the Qubit, for example EPR or data.
         """
 
-        self.lock.acquire_write()
+        self._expire_qubits()
+        lock = self._host_lock(from_host_id)
+        lock.acquire_write()
         if self._check_qubit_in_system(qubit, from_host_id, purpose=purpose):
             self.logger.log("Qubit with id %s, purpose %s and from host %s"
                             " already in storage" % (qubit.id, purpose, from_host_id))
+            lock.release_write()
             raise ValueError("Qubit with these parameters already in storage!")
         if from_host_id not in self._host_dict:
             self._add_new_host(from_host_id)
         if not self._increase_qubit_counter(from_host_id):
             qubit.release()
-            self.lock.release_write()
+            lock.release_write()
             return
 
-        self._host_dict[from_host_id].append(qubit)
         self._add_qubit_to_qubit_dict(qubit, purpose, from_host_id)
 
         # Check if a Qubit of one of the callbacks has arrived
-        self._check_all_requests()
-        self.lock.release_write()
+        self._check_requests(from_host_id, qubit, purpose)
+        lock.release_write()
+        self._schedule_expiry()
 
     def get_all_qubits_from_host(self, from_host_id, purpose=None, remove=False):
         """
@@ -248,23 +466,23 @@ class QuantumStorage(object):
             (list): The list of qubits
         """
 
+        self._expire_qubits()
         if from_host_id in self._host_dict:
             out = []
-            self.lock.acquire_write()
-            flag = False
-            for q in self._host_dict[from_host_id]:
-                if self._check_qubit_in_system(q, from_host_id, purpose):
-                    if not remove:
-                        out.append(q)
-                else:
-                    flag = True
-                    if remove:
-                        break
-            if not flag and remove:
-                num_qubits = len(self._host_dict[from_host_id])
-                for _ in range(num_qubits):
+            lock = self._host_lock(from_host_id)
+            lock.acquire_write()
+            qubits = self._host_dict[from_host_id]
+            if purpose is None:
+                matching = qubits
+            else:
+                matching = self._purpose_queues[from_host_id].get(purpose, {})
+            if not remove:
+                out = list(matching.values())
+            elif len(matching) == len(qubits):
+                # qubits are only removed if all of them have the purpose
+                for _ in range(len(qubits)):
                     out.append(self._get_qubit_from_host(from_host_id, purpose=purpose))
-            self.lock.release_write()
+            lock.release_write()
             return out
         return []
 
@@ -276,51 +494,91 @@ class QuantumStorage(object):
             from_host_id (str): The host who the qubits are from
             purpose (int):
         """
-        self.lock.acquire_write()
+        lock = self._host_lock(from_host_id)
+        lock.acquire_write()
         if from_host_id in self._host_dict:
-            for q in self._host_dict[from_host_id]:
-                if self._check_qubit_in_system(q, from_host_id, purpose):
-                    self._get_qubit_from_host(from_host_id, purpose=purpose)
-        self.lock.release_write()
+            while self._get_qubit_from_host(from_host_id, purpose=purpose) is not None:
+                pass
+        lock.release_write()
 
-    def _check_all_requests(self):
+    def _check_requests(self, from_host_id, qubit, purpose):
         """
-        Checks if any of the pending requests is now fulfilled.
+        Checks if a pending request is fulfilled by a qubit which has just
+        arrived. Only the requests which can match the qubit are looked at, and
+        the oldest of them is handled.
 
+        Args:
+            from_host_id (str): The host the qubit is from.
+            qubit (Qubit): The qubit which has arrived.
+            purpose (str): The purpose of the qubit.
         Returns:
             If a request is fulfilled, the request is handled and the function
             returns the qubit of this request.
         """
-        for req_id, args in self._pending_request_dict.items():
-            ret = self._get_qubit_from_host(args[1], args[2], args[3])
-            if ret is not None:
-                args[0].put(ret)
-                self._remove_request(req_id)
-                return ret
+        requests = self._pending_request_dict.get(from_host_id)
+        if not requests:
+            return None
+        keys = [(None, purpose), (None, None)]
+        # The ID of the qubit is only needed for requests of a specific qubit
+        if any(key[0] is not None for key in requests):
+            q_id = qubit.id
+            keys += [(q_id, purpose), (q_id, None)]
+        oldest = None
+        for key in keys:
+            waiting = requests.get(key)
+            if waiting:
+                req_id = next(iter(waiting))
+                if oldest is None or req_id < oldest[1]:
+                    oldest = (key, req_id)
+        if oldest is None:
+            return None
+        key, req_id = oldest
+        ret = self._get_qubit_from_host(from_host_id, key[0], key[1])
+        if ret is not None:
+            q = requests[key][req_id]
+            self._remove_request(from_host_id, key, req_id)
+            q.put(ret)
+        return ret
 
-    def _add_request(self, args):
+    def _add_request(self, q, from_host_id, q_id, purpose):
         """
         Adds a new request to the quantum storage. If a new qubit arrives, it
         is checked if the request for the qubit is satisfied.
 
         Args:
-            args (list): [Queue, from_host_id, q_id, purpose]
+            q (Queue): The queue the qubit is put into.
+            from_host_id (str): The host the qubit should be from.
+            q_id (str): The ID of the qubit, None for any qubit.
+            purpose (str): The purpose of the qubit, None for any purpose.
+        Returns:
+            (int): The id of the request.
         """
-        self._pending_request_dict[self._request_id] = args
-        self._request_id += 1
+        req_id = next(self._request_ids)
+        requests = self._pending_request_dict.setdefault(from_host_id, {})
+        requests.setdefault((q_id, purpose), {})[req_id] = q
         self._amount_pending_requests += 1
-        return self._request_id
+        return req_id
 
-    def _remove_request(self, req_id):
+    def _remove_request(self, from_host_id, key, req_id):
         """
         Removes a pending request from the request dict.
 
         Args:
+            from_host_id (str): The host the qubit of the request is from.
+            key (tuple): The ID and purpose of the qubit of the request.
             req_id (int): The id of the request to remove.
+        Returns:
+            (bool): False if the request was already handled.
         """
-        if req_id in self._pending_request_dict:
-            del self._pending_request_dict[req_id]
+        requests = self._pending_request_dict.get(from_host_id, {})
+        waiting = requests.get(key)
+        if waiting is None or req_id not in waiting:
+            return False
+        del waiting[req_id]
+        if not waiting:
+            del requests[key]
         self._amount_pending_requests -= 1
+        return True
 
     def get_qubit_from_host(self, from_host_id, q_id=None, purpose=None, wait=0):
         """
@@ -344,101 +602,180 @@ class QuantumStorage(object):
         if wait == -1:
             wait = None
 
-        self.lock.acquire_write()
+        self._expire_qubits()
+        lock = self._host_lock(from_host_id)
+        lock.acquire_write()
         ret = self._get_qubit_from_host(from_host_id, q_id, purpose)
         if ret is not None or wait == 0:
-            self.lock.release_write()
+            lock.release_write()
             return ret
         q = queue.Queue()
-        args = [q, from_host_id, q_id, purpose]
-        req_id = self._add_request(args)
-        self.lock.release_write()
+        req_id = self._add_request(q, from_host_id, q_id, purpose)
+        lock.release_write()
         ret = None
         try:
-            ret = q.get(timeout=wait)
+            ret = self._clock.get(q, wait)
         except queue.Empty:
             pass
         if ret is None:
-            self.lock.acquire_write()
-            self._remove_request(req_id)
-            self.lock.release_write()
+            lock.acquire_write()
+            if not self._remove_request(from_host_id, (q_id, purpose), req_id):
+                # The qubit arrived after the wait time was over
+                ret = q.get_nowait()
+            lock.release_write()
         return ret
 
     def _get_qubit_from_host(self, from_host_id, q_id=None, purpose=None):
-        if q_id is not None:
-            qubit = self._pop_qubit_with_id_and_host_from_qubit_dict(
-                q_id, from_host_id, purpose=purpose)
-            if qubit is not None:
-                qubit, purp = qubit
-                if from_host_id not in self._host_dict or \
-                        qubit not in self._host_dict[from_host_id]:
-                    # Qubit with the ID exists, but does not belong to the host requested
-                    self._add_qubit_to_qubit_dict(qubit, purp, from_host_id)
-                    return None
-                self._host_dict[from_host_id].remove(qubit)
-                self._decrease_qubit_counter(from_host_id)
-            return qubit
-
         if from_host_id not in self._host_dict:
             return None
 
-        if self._host_dict[from_host_id]:
-            # check purposes of all qubits
-            for _ in range(len(self._host_dict[from_host_id])):
-                qubit = self._host_dict[from_host_id].pop(0)
-                out = self._pop_qubit_with_id_and_host_from_qubit_dict(
-                    qubit.id, from_host_id, purpose=purpose)
-                if out is not None:
-                    self._decrease_qubit_counter(from_host_id)
-                    return out[0]
-                self._host_dict[from_host_id].append(qubit)
-        return None
-
-    def _pop_qubit_with_id_and_host_from_qubit_dict(self, q_id, from_host_id, purpose=None):
-        def _pop_purpose_from_purpose_dict():
-            nonlocal q_id, from_host_id
-
-            if q_id not in self._purpose_dict:
+        if q_id is not None:
+            handle = self._find_handle(from_host_id, q_id)
+            if handle is None:
+                return None
+            if purpose is not None and purpose != self._purpose_dict[from_host_id][handle]:
                 return None
-            pur = self._purpose_dict[q_id].pop(from_host_id, None)
-            if pur is not None:
-                if not self._purpose_dict[q_id]:
-                    del self._purpose_dict[q_id]
-                return pur
+        else:
+            if purpose is None:
+                qubits = self._host_dict[from_host_id]
+            else:
+                qubits = self._purpose_queues[from_host_id].get(purpose)
+            if not qubits:
+                return None
+            handle = next(iter(qubits))
+
+        storage_time = self._clock.time() - self._stored_at[from_host_id][handle]
+        qubit = self._remove_qubit(from_host_id, handle)
+        self._decrease_qubit_counter(from_host_id)
+        if self._memory_model is not None:
+            self._memory_model.qubit_func(qubit, storage_time)
+        return qubit
+
+    def _find_handle(self, from_host_id, q_id):
+        """
+        Get the handle of the stored qubit with the id *q_id* from a host.
+
+        Args:
+            from_host_id (str): The host the qubit is from.
+            q_id (str): The ID of the qubit.
+        Returns:
+            (int): The handle of the qubit, None if it is not stored.
+        """
+        handle = self._qubit_dict[from_host_id].get(q_id)
+        if handle is not None:
+            return handle
+        handle = id_to_handle(q_id)
+        # A qubit with an ID of its own does not have the ID of its handle
+        if handle not in self._purpose_dict[from_host_id] or handle in self._names[from_host_id]:
             return None
+        return handle
 
-        purp = _pop_purpose_from_purpose_dict()
-        if purp is not None:
-            if purpose is None or purpose == purp:
-                qubit = self._qubit_dict[q_id].pop(from_host_id, None)
-                if qubit is not None:
-                    if not self._qubit_dict[q_id]:
-                        del self._qubit_dict[q_id]
-                return qubit, purp
-            else:
-                if q_id not in self._purpose_dict:
-                    self._purpose_dict[q_id] = {}
-                self._purpose_dict[q_id][from_host_id] = purp
-        return None
+    def _remove_qubit(self, from_host_id, handle):
+        """
+        Removes the qubit with the handle *handle* from all containers of the
+        host.
 
-    def _add_qubit_to_qubit_dict(self, qubit, purpose, from_host_id):
-        def _add_purpose_to_purpose_dict(q_id):
-            nonlocal purpose, from_host_id
-            if q_id not in self._purpose_dict:
-                self._purpose_dict[q_id] = {}
-            self._purpose_dict[q_id][from_host_id] = purpose
+        Args:
+            from_host_id (str): The host the qubit is from.
+            handle (int): The handle of the qubit.
+        Returns:
+            (Qubit): The removed qubit.
+        """
+        purpose = self._purpose_dict[from_host_id].pop(handle)
+        qubit = self._host_dict[from_host_id].pop(handle)
+        del self._stored_at[from_host_id][handle]
+        if self._wheel is not None:
+            with self._wheel_lock:
+                if self._wheel is not None:
+                    self._wheel.remove((from_host_id, handle))
+        purpose_queue = self._purpose_queues[from_host_id][purpose]
+        del purpose_queue[handle]
+        if not purpose_queue:
+            del self._purpose_queues[from_host_id][purpose]
+        self._remove_id(from_host_id, handle)
+        return qubit
+
+    def _rename_qubit(self, from_host_id, handle, new_id):
+        """
+        Changes the id of a stored qubit, the qubit keeps its place in the
+        order of the qubits of the host.
+
+        Args:
+            from_host_id (str): The host the qubit is from.
+            handle (int): The handle of the qubit.
+            new_id (str): The new ID of the qubit.
+        """
+        self._remove_id(from_host_id, handle)
+        qubit = self._host_dict[from_host_id][handle]
+        qubit.id = new_id
+        self._add_id(from_host_id, qubit)
 
-        if qubit.id not in self._qubit_dict:
-            self._qubit_dict[qubit.id] = {}
-        self._qubit_dict[qubit.id][from_host_id] = qubit
-        _add_purpose_to_purpose_dict(qubit.id)
+    def _add_id(self, from_host_id, qubit):
+        """
+        Adds the ID of a stored qubit to the indices. The ID is only read if
+        the qubit has one of its own.
+
+        Args:
+            from_host_id (str): The host the qubit is from.
+            qubit (Qubit): The qubit.
+        """
+        handle = qubit.handle
+        if qubit.named:
+            q_id = qubit.id
+            self._qubit_dict[from_host_id][q_id] = handle
+            self._names[from_host_id][handle] = q_id
+            index, key = self._id_index, q_id
+        else:
+            index, key = self._handle_index, handle
+        with self._id_index_lock:
+            index.setdefault(key, {})[from_host_id] = True
+
+    def _remove_id(self, from_host_id, handle):
+        """
+        Removes the ID of a stored qubit from the indices.
+
+        Args:
+            from_host_id (str): The host the qubit is from.
+            handle (int): The handle of the qubit.
+        """
+        q_id = self._names[from_host_id].pop(handle, None)
+        if q_id is not None:
+            self._qubit_dict[from_host_id].pop(q_id, None)
+            index, key = self._id_index, q_id
+        else:
+            index, key = self._handle_index, handle
+        with self._id_index_lock:
+            hosts = index[key]
+            del hosts[from_host_id]
+            if not hosts:
+                del index[key]
+
+    def _add_qubit_to_qubit_dict(self, qubit, purpose, from_host_id):
+        handle = qubit.handle
+        self._host_dict[from_host_id][handle] = qubit
+        purpose_queues = self._purpose_queues[from_host_id]
+        if purpose not in purpose_queues:
+            purpose_queues[purpose] = OrderedDict()
+        purpose_queues[purpose][handle] = qubit
+        self._purpose_dict[from_host_id][handle] = purpose
+        self._add_id(from_host_id, qubit)
+        now = self._clock.time()
+        self._stored_at[from_host_id][handle] = now
+        cutoff = getattr(self._memory_model, 'cutoff', None)
+        if cutoff is not None:
+            self._add_to_wheel(from_host_id, handle, now + cutoff)
 
     def _add_new_host(self, host_id):
         if host_id not in self._host_dict:
-            self._host_dict[host_id] = []
+            self._qubit_dict[host_id] = {}
+            self._names[host_id] = {}
+            self._purpose_dict[host_id] = {}
+            self._purpose_queues[host_id] = {}
+            self._stored_at[host_id] = {}
             if host_id not in self._storage_limits_per_host:
                 self._storage_limits_per_host[host_id] = self._default_storage_limit_per_host
             self._amount_qubits_stored_per_host[host_id] = 0
+            self._host_dict[host_id] = OrderedDict()
 
     def _check_qubit_in_system(self, qubit, from_host_id, purpose=None):
         """
@@ -452,9 +789,15 @@ class QuantumStorage(object):
         Returns:
             (bool): If the qubit is in the system.
         """
-        if qubit.id in self._qubit_dict and \
-                from_host_id in self._qubit_dict[qubit.id]:
-            if purpose is None or (purpose == self._purpose_dict[qubit.id][from_host_id]):
+        purposes = self._purpose_dict.get(from_host_id)
+        if purposes is None:
+            return False
+        if qubit.named:
+            handle = self._find_handle(from_host_id, qubit.id)
+        else:
+            handle = qubit.handle if qubit.handle in purposes else None
+        if handle is not None:
+            if purpose is None or purpose == purposes[handle]:
                 return True
         return False
 
@@ -505,11 +848,12 @@ class QuantumStorage(object):
         Returns:
             True, if the counter could be increased, False if not.
         """
-        if not self._check_memory_limits(host_id):
-            return False
-        self._amount_qubits_stored_per_host[host_id] += 1
-        self._amount_qubit_stored += 1
-        return True
+        with self._counter_lock:
+            if not self._check_memory_limits(host_id):
+                return False
+            self._amount_qubits_stored_per_host[host_id] += 1
+            self._amount_qubit_stored += 1
+            return True
 
     def _reset_qubit_counter(self, host_id):
         """
@@ -520,12 +864,13 @@ class QuantumStorage(object):
         Returns:
             (bool): True, if the counter could be decreased, False if not.
         """
-        if self._amount_qubits_stored_per_host[host_id] <= 0 or \
-                self._amount_qubit_stored <= 0:
-            return False
-        num_qubits = self._amount_qubits_stored_per_host[host_id]
-        self._amount_qubits_stored_per_host[host_id] = 0
-        self._amount_qubit_stored -= num_qubits
+        with self._counter_lock:
+            if self._amount_qubits_stored_per_host[host_id] <= 0 or \
+                    self._amount_qubit_stored <= 0:
+                return False
+            num_qubits = self._amount_qubits_stored_per_host[host_id]
+            self._amount_qubits_stored_per_host[host_id] = 0
+            self._amount_qubit_stored -= num_qubits
 
     def _decrease_qubit_counter(self, host_id):
         """
@@ -538,8 +883,9 @@ class QuantumStorage(object):
         Returns:
             (bool): True, if the counter could be decreased, False if not.
         """
-        if self._amount_qubits_stored_per_host[host_id] <= 0 or \
-                self._amount_qubit_stored <= 0:
-            return False
-        self._amount_qubits_stored_per_host[host_id] -= 1
-        self._amount_qubit_stored -= 1
+        with self._counter_lock:
+            if self._amount_qubits_stored_per_host[host_id] <= 0 or \
+                    self._amount_qubit_stored <= 0:
+                return False
+            self._amount_qubits_stored_per_host[host_id] -= 1
+            self._amount_qubit_stored -= 1
@@ -0,0 +1,109 @@
+class TimingWheel(object):
+    """
+    A hashed timing wheel which tracks when entries expire. The time is divided
+    into ticks and each tick is hashed into one of a fixed amount of slots, so
+    adding and removing an entry is O(1) and advancing the wheel only looks at
+    the slots of the ticks which passed.
+    """
+
+    def __init__(self, tick, num_slots=256):
+        """
+        Args:
+            tick (float): The length of a tick in seconds.
+            num_slots (int): The amount of slots of the wheel.
+        """
+        if tick <= 0:
+            raise ValueError("The tick of the timing wheel must be positive")
+        self._tick = tick
+        self._slots = [{} for _ in range(num_slots)]
+        # key -> slot the entry is in
+        self._entries = {}
+        # the tick up to which the wheel has advanced, before the first advance
+        # the earliest tick of an entry
+        self._current_tick = None
+        self._advanced = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def tick(self):
+        """
+        Get the length of a tick of the wheel.
+
+        Returns:
+            (float): The length of a tick in seconds.
+        """
+        return self._tick
+
+    def add(self, key, expiry):
+        """
+        Adds an entry which expires at the time *expiry*. An entry with the
+        same key is replaced.
+
+        Args:
+            key (object): The key of the entry.
+            expiry (float): The time the entry expires.
+        """
+        self.remove(key)
+        expiry_tick = int(expiry // self._tick)
+        if not self._advanced:
+            if self._current_tick is None or expiry_tick < self._current_tick:
+                self._current_tick = expiry_tick
+        else:
+            # Entries which are already expired go into the slot visited next
+            expiry_tick = max(expiry_tick, self._current_tick)
+        slot = self._slots[expiry_tick % len(self._slots)]
+        slot[key] = expiry
+        self._entries[key] = slot
+
+    def remove(self, key):
+        """
+        Removes an entry before it expires.
+
+        Args:
+            key (object): The key of the entry.
+        Returns:
+            (bool): True if the entry was in the wheel.
+        """
+        slot = self._entries.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def advance(self, now):
+        """
+        Advances the wheel to the time *now* and removes the entries which are
+        expired.
+
+        Args:
+            now (float): The current time.
+        Returns:
+            (list): The keys of the expired entries, in the order they expired.
+        """
+        now_tick = int(now // self._tick)
+        if self._current_tick is None:
+            self._current_tick = now_tick
+        self._advanced = True
+        if not self._entries:
+            self._current_tick = now_tick
+            return []
+        # If more ticks passed than there are slots, each slot is visited once
+        first_tick = max(self._current_tick, now_tick - len(self._slots) + 1)
+        expired = []
+        for t in range(first_tick, now_tick + 1):
+            slot = self._slots[t % len(self._slots)]
+            if not slot:
+                continue
+            keys = [key for key, expiry in slot.items() if expiry <= now]
+            for key in keys:
+                expired.append((slot.pop(key), key))
+                del self._entries[key]
+        # The slot of the current tick is visited again with the next advance
+        self._current_tick = now_tick
+        expired.sort(key=lambda entry: entry[0])
+        return [key for _, key in expired]
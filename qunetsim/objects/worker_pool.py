@@ -0,0 +1,149 @@
+import threading
+from queue import Queue
+
+from qunetsim.objects.clock import Clock
+from qunetsim.objects.logger import Logger
+
+
+class WorkerPool(object):
+    """
+    A bounded pool of daemon threads which run submitted tasks in the order of
+    submission. Workers are started when tasks are waiting and no worker is idle,
+    up to the maximum amount of workers.
+    """
+
+    def __init__(self, max_workers=8, clock=None):
+        """
+        Args:
+            max_workers (int): The maximum amount of worker threads.
+            clock (Clock): The clock the workers run on. Defaults to the wall clock.
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers should be at least 1')
+        self._max_workers = max_workers
+        self._clock = clock if clock is not None else Clock()
+        self._tasks = Queue()
+        self._workers = 0
+        self._busy = 0
+        self._queued = 0
+        self._peak_queue_depth = 0
+        self._completed = 0
+        self._lock = threading.Lock()
+
+    @property
+    def max_workers(self):
+        """
+        Get the maximum amount of worker threads.
+
+        Returns:
+            (int): The maximum amount of workers.
+        """
+        return self._max_workers
+
+    @max_workers.setter
+    def max_workers(self, max_workers):
+        """
+        Set the maximum amount of worker threads. If there are more workers,
+        they stop once the pool is idle.
+
+        Args:
+            max_workers (int): The maximum amount of workers.
+        """
+        if max_workers < 1:
+            raise ValueError('max_workers should be at least 1')
+        self._max_workers = max_workers
+
+    @property
+    def clock(self):
+        """
+        Get the clock the workers run on.
+
+        Returns:
+            (Clock): The clock of the pool.
+        """
+        return self._clock
+
+    @clock.setter
+    def clock(self, clock):
+        """
+        Set the clock new workers run on.
+
+        Args:
+            clock (Clock): The new clock.
+        """
+        self._clock = clock
+
+    @property
+    def metrics(self):
+        """
+        Get the load of the pool.
+
+        Returns:
+            (dict): The amount of waiting tasks ('queue_depth'), the highest amount
+            of waiting tasks so far ('peak_queue_depth'), the amount of workers
+            ('workers') and busy workers ('busy_workers'), the fraction of the
+            maximum amount of workers which is busy ('saturation') and the amount
+            of finished tasks ('completed').
+        """
+        with self._lock:
+            return {'queue_depth': self._queued,
+                    'peak_queue_depth': self._peak_queue_depth,
+                    'workers': self._workers,
+                    'busy_workers': self._busy,
+                    'max_workers': self._max_workers,
+                    'saturation': self._busy / self._max_workers,
+                    'completed': self._completed}
+
+    def submit(self, fn, args=()):
+        """
+        Runs *fn* with the arguments *args* on a worker of the pool.
+
+        Args:
+            fn (function): The task to run.
+            args (tuple): The arguments of the task.
+        """
+        with self._lock:
+            self._queued += 1
+            self._peak_queue_depth = max(self._peak_queue_depth, self._queued)
+            start_worker = self._workers - self._busy < self._queued \
+                and self._workers < self._max_workers
+            if start_worker:
+                self._workers += 1
+        self._tasks.put((fn, args))
+        if start_worker:
+            self._clock.start_thread(self._work)
+
+    def shutdown(self):
+        """
+        Stops all workers after the tasks which are already submitted.
+        Submitting a new task starts new workers.
+        """
+        with self._lock:
+            workers = self._workers
+            self._workers = 0
+        for _ in range(workers):
+            self._tasks.put(None)
+
+    def _work(self):
+        """
+        Runs the tasks of the pool.
+        """
+        clock = self._clock
+        while True:
+            task = clock.get(self._tasks)
+            if task is None:
+                return
+            with self._lock:
+                self._queued -= 1
+                self._busy += 1
+            fn, args = task
+            try:
+                fn(*args)
+            except Exception as e:
+                Logger.get_instance().error('Error in worker: ' + str(e))
+            with self._lock:
+                self._busy -= 1
+                self._completed += 1
+                if self._workers > self._max_workers:
+                    self._workers -= 1
+                    return
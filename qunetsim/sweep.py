@@ -0,0 +1,179 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import time
+import traceback
+
+import numpy as np
+
+from qunetsim.components import Network
+
+# Time in seconds a trial process gets to exit after it delivered its row,
+# before it is terminated.
+JOIN_TIMEOUT = 10
+
+
+def grid_points(grid):
+    """
+    Expands a parameter grid into the list of its parameter combinations.
+
+    Args:
+        grid (dict or list): Either a dictionary which maps each parameter name
+                             to a list of values, from which all combinations are
+                             built, or a list of parameter dictionaries.
+    Returns:
+        (list): A list of parameter dictionaries.
+    """
+    if isinstance(grid, dict):
+        names = list(grid.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*[grid[n] for n in names])]
+    return [dict(point) for point in grid]
+
+
+def _run_trial(protocol, trial, params, seed, results):
+    """
+    Runs one trial in a worker process and puts its row into the result queue.
+    """
+    if hasattr(os, 'setsid'):
+        # Own process group, so that the processes started by the backend can be
+        # terminated together with the trial.
+        os.setsid()
+    random.seed(seed)
+    np.random.seed(seed % 2 ** 32)
+    start = time.time()
+    row = {'trial': trial, 'seed': seed}
+    row.update(params)
+    try:
+        result = protocol(**params)
+        if isinstance(result, dict):
+            row.update(result)
+        else:
+            row['result'] = result
+        row['error'] = None
+    except Exception:
+        row['error'] = traceback.format_exc()
+    finally:
+        try:
+            Network.get_instance().stop(stop_hosts=True)
+        except Exception:
+            pass
+    row['time'] = time.time() - start
+    results.put(row)
+
+
+def run_sweep(protocol, grid, processes=None, timeout=None, seed=None, repetitions=1, start_method=None):
+    """
+    Runs a simulation for each point of a parameter grid. Each trial runs in its own
+    process, so that the network, the hosts and the backend of a trial do not share
+    state with the other trials. The rows of the trials are yielded as soon as the
+    trials finish, therefore not necessarily in the order of the trials.
+
+    Args:
+        protocol (function): The simulation. Is called with the parameters of a
+                             trial as keyword arguments and should return a value
+                             or a dictionary of values. It has to be picklable if
+                             the processes are not forked.
+        grid (dict or list): The parameter grid, see *grid_points*.
+        processes (int): The maximum amount of trials running at once. Defaults to
+                         the amount of CPUs.
+        timeout (float): The maximum time in seconds of a trial, after which its
+                         process is terminated. None for no limit.
+        seed (int): The seed of the first trial, the following trials use the
+                    following integers. If None, a random seed is chosen.
+        repetitions (int): How often each point of the grid is simulated.
+        start_method (str): The multiprocessing start method, defaults to the
+                            platform default.
+    Returns:
+        (generator): Rows, dictionaries with the keys 'trial', 'seed', the
+        parameters, the result (the keys of the returned dictionary or
+        'result'), 'error' and 'time'. A trial whose process does not exit after
+        it delivered its row is terminated, and its row gets an error.
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes < 1:
+        raise ValueError('processes should be at least 1')
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+
+    context = multiprocessing.get_context(start_method)
+    results = context.Queue()
+    trials = [(i, params, seed + i) for i, params in
+              enumerate(p for p in grid_points(grid) for _ in range(repetitions))]
+    trials.reverse()
+    # trial -> (process, start time, params, seed)
+    running = {}
+
+    def failed_row(trial, params, trial_seed, error, duration):
+        row = {'trial': trial, 'seed': trial_seed}
+        row.update(params)
+        row['error'] = error
+        row['time'] = duration
+        return row
+
+    def drain(block):
+        rows = []
+        try:
+            if block:
+                rows.append(results.get(timeout=0.05))
+            while True:
+                rows.append(results.get_nowait())
+        except queue.Empty:
+            pass
+        return rows
+
+    try:
+        while trials or running:
+            while trials and len(running) < processes:
+                trial, params, trial_seed = trials.pop()
+                process = context.Process(target=_run_trial,
+                                          args=(protocol, trial, params, trial_seed, results))
+                process.start()
+                running[trial] = (process, time.time(), params, trial_seed)
+
+            rows = drain(True)
+            dead = set(trial for trial, entry in running.items() if not entry[0].is_alive())
+            if dead:
+                # The rows of processes which exited are in the queue by now
+                rows += drain(False)
+            for row in rows:
+                entry = running.pop(row['trial'], None)
+                if entry is None:
+                    continue
+                entry[0].join(JOIN_TIMEOUT)
+                if entry[0].is_alive():
+                    _terminate(entry[0])
+                    if row['error'] is None:
+                        row['error'] = 'process did not exit after the trial'
+                yield row
+
+            now = time.time()
+            for trial, (process, start, params, trial_seed) in list(running.items()):
+                if trial in dead:
+                    del running[trial]
+                    if process.exitcode != 0:
+                        error = 'process exited with code %d' % process.exitcode
+                    else:
+                        error = 'process exited without a result'
+                    yield failed_row(trial, params, trial_seed, error, now - start)
+                elif timeout is not None and now - start > timeout:
+                    _terminate(process)
+                    del running[trial]
+                    yield failed_row(trial, params, trial_seed, 'timeout', now - start)
+    finally:
+        for process, _, _, _ in running.values():
+            _terminate(process)
+
+
+def _terminate(process):
+    """
+    Terminates the process of a trial and the processes it started.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, OSError):
+        process.terminate()
+    process.join()
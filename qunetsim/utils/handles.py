@@ -0,0 +1,57 @@
+import itertools
+
+# next() of an itertools.count is atomic in CPython, handles can be allocated
+# from every thread without a lock.
+_handles = itertools.count(1)
+
+
+def new_handle():
+    """
+    Allocates a new handle for a qubit, or a qubit of a backend.
+
+    Returns:
+        (int): A handle which is unique in the process.
+    """
+    return next(_handles)
+
+
+def handle_to_id(handle):
+    """
+    Get the string ID of a qubit with the handle *handle*, which is shown to
+    users and sent in packets.
+
+    Args:
+        handle (int): The handle of the qubit.
+    Returns:
+        (str): The ID of the qubit.
+    """
+    return '#%d' % handle
+
+
+def id_to_handle(q_id):
+    """
+    Get the handle of the qubit with the string ID *q_id*, if the ID is
+    derived from a handle.
+
+    Args:
+        q_id (str): The ID of the qubit.
+    Returns:
+        (int): The handle of the qubit, None if the ID is not derived from one.
+    """
+    if not isinstance(q_id, str) or not q_id[1:].isdigit() or q_id[0] != '#':
+        return None
+    handle = int(q_id[1:])
+    # IDs like '#01' are not derived from a handle
+    if handle_to_id(handle) != q_id:
+        return None
+    return handle
+
+
+def new_id():
+    """
+    Allocates a new string ID for a qubit.
+
+    Returns:
+        (str): An ID which is unique in the process.
+    """
+    return handle_to_id(new_handle())